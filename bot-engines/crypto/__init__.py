@@ -1,8 +1,39 @@
-from .engine import Strategy, TradingBot, Exchange
-from .strategies.basic import BasicStrategy
-from .strategies.signal import SignalStrategy, MACD, RSI, STOCHRSI, AROON_OSCILLATOR, MFI, CCI, CMO, MACD_HIST, WILLR
-from .hitbtc.hitbtc import HitBTCExchange
-from .bitmex.bitmex import BitMEXExchange
-from .helpers import print_json
-from .structs import Currency, Order, Market
+import importlib
+import sys
+import types
 
+# public name -> module defining it. Nothing is imported until a name is first used, so a bot only pays for the
+# exchange, strategy and indicators its config names (no aiohttp for a blocking bot, no requests_mock outside mock
+# mode, no NumPy for BasicStrategy).
+REGISTRY = {
+    'Strategy': '.engine', 'TradingBot': '.engine', 'Exchange': '.engine', 'AsyncExchange': '.engine',
+    'Supervisor': '.supervisor', 'create_bot': '.supervisor', 'startup_times': '.supervisor',
+    'AsyncTradingBot': '.aiobot',
+    'BasicStrategy': '.strategies.basic', 'AsyncBasicStrategy': '.strategies.basic',
+    'HitBTCExchange': '.hitbtc.hitbtc', 'AsyncHitBTCExchange': '.hitbtc.aio',
+    'BitMEXExchange': '.bitmex.bitmex', 'AsyncBitMEXExchange': '.bitmex.aio',
+    'print_json': '.helpers',
+    'Currency': '.structs', 'Order': '.structs', 'Market': '.structs',
+}
+REGISTRY.update(dict.fromkeys(['SignalStrategy', 'AsyncSignalStrategy', 'MACD', 'RSI', 'STOCHRSI', 'AROON_OSCILLATOR',
+                               'MFI', 'CCI', 'CMO', 'MACD_HIST', 'WILLR'], '.strategies.signal'))
+
+__all__ = sorted(REGISTRY)
+
+
+class LazyModule(types.ModuleType):
+    # resolves the registry's names on first use. A module level __getattr__ would do (PEP 562) but needs Python 3.7,
+    # the Docker image runs 3.6
+    def __getattr__(self, name):
+        module = REGISTRY.get(name)
+        if module is None:
+            raise AttributeError("module 'crypto' has no attribute '{}'".format(name))
+        value = getattr(importlib.import_module(module, __name__), name)
+        setattr(self, name, value)  # later lookups don't come back here
+        return value
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(REGISTRY))
+
+
+sys.modules[__name__].__class__ = LazyModule
@@ -0,0 +1,199 @@
+import asyncio
+import configparser
+import json
+import logging
+import os
+import signal
+import threading
+import time
+import sys
+from crypto.engine import BotMixin, INTERVALS, interval_key
+from crypto.helpers import str_to_class
+from crypto.metrics import registry as metrics
+from crypto.profiling import Profiler
+from crypto.telemetry import Publisher
+
+
+class AsyncTradingBot(BotMixin):
+    """
+    TradingBot driven by one asyncio event loop over an AsyncExchange and an async strategy. The control messages,
+    the strategy and every group of report types run on their own intervals as tasks on the loop, and every market's
+    strategy step and report fetch is a task of its own, so how many requests are in flight is bounded by the
+    exchange's connection pool and rate limit instead of by threads. Control messages are read from stdin as for
+    TradingBot; with input_timeout=None stdin is not read at all.
+    """
+    def __init__(self, name, exchange, strategy, publisher=None, minutes_to_timeout=60, intervals=None,
+                 report_deadline=1.5, input_timeout=10, metrics_interval=30, profile_dir='profiles'):
+        self.name = name
+        self.exchange = exchange
+        self.strategy = strategy
+        self.minutes_to_timeout = minutes_to_timeout
+        self.intervals = dict(INTERVALS, **(intervals or {}))
+        self.report_deadline = report_deadline
+        self.input_timeout = input_timeout
+        self.metrics_interval = metrics_interval
+        self.metrics_pushed = time.time()
+        self.profiler = Profiler(name, profile_dir)
+        self.report_account = True
+        self.markets = {}
+        self.markets_on = {}
+        self.pending_reports = {}  # (type, market) -> task still running from an earlier report()
+        self.last_report = {}
+        self.last_input = time.time()
+        self.end_time = None
+        self.scheduler = None
+        self.msg_queue = None
+        self.turn_off = None
+        self.loop = None
+        self.publisher = publisher or Publisher('http://localhost:{}/update'.format(os.environ.get('PORT', 3000)),
+                                                self.name)
+
+    @classmethod
+    def from_config(cls, name):
+        # the blocking bot's config section; Wrapper and Strategy name the blocking classes, their Async* counterparts
+        # are used
+        config = configparser.ConfigParser(allow_no_value=True)
+        config.read(os.path.join(os.path.dirname(__file__), 'config.ini'))
+        section = config[name]
+        symbols = section['Symbols'].split(',')
+        exchange = str_to_class('Async' + section['Wrapper'])(section['BaseUrl'], section['Key'], section['Secret'],
+                                                             symbols)
+        market_configs = {s: section[s].split(',') for s in symbols}
+        strategy_class = str_to_class('Async' + section['Strategy'])
+        if section['Strategy'] == 'SignalStrategy':
+            indicators = {ind: str_to_class(ind) for ind in section['indicators'].split(',')}
+            strategy = strategy_class(exchange, market_configs, indicators)
+        else:
+            strategy = strategy_class(exchange, market_configs)
+        intervals = {task: section.getfloat(interval_key(task), fallback=seconds)
+                     for task, seconds in INTERVALS.items()}
+        return cls(name, exchange, strategy, minutes_to_timeout=int(section['MinutesToTimeout']), intervals=intervals,
+                   report_deadline=section.getfloat('ReportDeadline', fallback=1.5),
+                   metrics_interval=section.getfloat('MetricsInterval', fallback=30),
+                   profile_dir=section.get('ProfileDir', fallback='profiles'))
+
+    def run(self):
+        logging.info('Turning on')
+        asyncio.get_event_loop().run_until_complete(self.main())
+        raise SystemExit
+
+    async def main(self, end_time=None):
+        self.loop = asyncio.get_event_loop()
+        self.msg_queue = asyncio.Queue()
+        self.turn_off = asyncio.Event()
+        await self.exchange.load_markets()
+        self.markets = {m.counter + '_' + m.base: m for m in self.exchange.markets.values()}
+        self.markets_on = {m: True for m in self.markets.keys()}
+        try:
+            self.loop.add_signal_handler(signal.SIGINT, self.turn_off.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # not the main thread
+        if self.input_timeout:
+            self.start_reader()
+        self.end_time = end_time or time.time() + 60 * self.minutes_to_timeout
+        self.scheduler = self.schedule()
+        self.scheduler.add('timeout', self.check_timeout, self.intervals['messages'])
+        try:
+            await self.scheduler.run_async(self.turn_off)
+        except Exception as e:
+            self.push(e, 'error')
+            raise e
+        finally:
+            logging.info("Cancelling trades")
+            await self.exchange.cancel(all=True)
+            if hasattr(self.exchange, 'close_positions'):
+                await self.exchange.close_positions()
+            self.push([], 'active_orders')
+            for task in self.pending_reports.values():
+                task.cancel()
+            await self.exchange.close()
+
+    async def check_timeout(self):
+        if time.time() > self.end_time:
+            logging.info("Timeout")
+            self.turn_off.set()
+        elif self.input_timeout and time.time() - self.last_input > self.input_timeout:
+            logging.info("Input timed out, turning off bot")
+            self.turn_off.set()
+
+    async def process_messages(self):
+        while not self.msg_queue.empty():
+            await self.process_msg(self.msg_queue.get_nowait())
+
+    async def process_msg(self, msg):
+        if msg['type'] == 'markets':
+            for k, v in msg['data'].items():
+                if self.markets_on[k] and v == 'off':  # cancel trades if turning off market
+                    logging.info("Turning off market {}, cancelling trades".format(k))
+                    await self.exchange.cancel(market=self.markets[k])
+                self.markets_on[k] = (v == 'on')
+        elif msg['type'] == 'pause':
+            for m in self.markets_on.keys():
+                self.markets_on[m] = False
+            logging.info("Pausing all markets. Cancelling all active trades")
+            await self.exchange.cancel(all=True)
+        elif msg['type'] == 'profile':
+            self.profile(msg['data'])
+
+    async def execute_strategy(self):
+        with metrics.timer('bot_stage_seconds', stage='strategy'):
+            markets = [m for m, is_on in self.markets_on.items() if is_on]
+            results = await asyncio.gather(*[self.trade(m) for m in markets])
+            return [order for res in results if res for order in res]
+
+    async def trade(self, m):
+        with metrics.timer('strategy_trade_seconds', market=m):
+            return await self.strategy.trade(self.markets[m])
+
+    async def report(self, types=None):
+        with metrics.timer('bot_stage_seconds', stage='report'):
+            jobs = {k: job for k, job in self.report_jobs().items() if types is None or k[0] in types}
+            for key, job in jobs.items():
+                if key not in self.pending_reports:  # don't pile up requests behind a slow one
+                    self.pending_reports[key] = self.loop.create_task(self.fetch(key, job))
+            if jobs:
+                await asyncio.wait([self.pending_reports[k] for k in jobs], timeout=self.report_deadline)
+            return self.publish_report(jobs)
+
+    @staticmethod
+    async def fetch(key, job):
+        # report jobs return coroutines, except the strategy's signals which are computed right away; either way it
+        # happens inside the task, so an error is logged by publish_report instead of stopping the loop
+        with metrics.timer('report_fetch_seconds', type=key[0]):
+            result = job()
+            if asyncio.iscoroutine(result):
+                result = await result
+            return result
+
+    def close(self):
+        # called by the entry scripts on exit, after the event loop has stopped
+        async def cancel_all():
+            await self.exchange.cancel(all=True)  # cancel orders one more time just to be sure
+            await self.exchange.close()
+        if self.profiler.running:
+            self.profile('stop')
+        asyncio.get_event_loop().run_until_complete(cancel_all())
+        self.push([], 'active_orders')
+        self.publisher.close()
+
+    def start_reader(self):
+        # stdin is read on a daemon thread and handed to the loop line by line
+        def read():
+            for line in sys.stdin:
+                self.loop.call_soon_threadsafe(self.on_input, line)
+        reader = threading.Thread(target=read, name='stdin')
+        reader.daemon = True
+        reader.start()
+
+    def on_input(self, line):
+        # commands from backend e.g. {"type": "markets", "data": {"ETH_BTC": "off"}}
+        self.last_input = time.time()
+        try:
+            msg = json.loads(line)
+            if msg['type'] == 'ping':  # if heartbeat, immediately reply
+                msg['type'] = 'pong'
+                print(json.dumps(msg), flush=True)
+            else:
+                self.msg_queue.put_nowait(msg)
+        except json.JSONDecodeError as e:
+            self.push(e, "error")
@@ -0,0 +1,117 @@
+import asyncio
+import base64
+import json
+import time
+from urllib.parse import urlencode, urlparse
+import aiohttp
+from crypto.transport import DEFAULT_TIMEOUT, HostStats
+
+
+class AsyncResponse(object):
+    # the parts of a response the adapters use, read while the connection was still held
+    def __init__(self, status_code, headers, body):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class AsyncTransport(object):
+    """
+    asyncio counterpart of Transport. One aiohttp session, and so one keep-alive connection pool, is shared by every
+    coroutine on the event loop, so hundreds of requests can be in flight without a thread each. Timeouts, the
+    optional rate limiter and the per host statistics work as in Transport.
+
+    `auth` is a (user, password) pair for basic authentication or an object with a headers(verb, url, data) method
+    that signs each request.
+    """
+    def __init__(self, auth=None, timeout=DEFAULT_TIMEOUT, pool_size=100, rate_limiter=None):
+        self.auth = auth
+        self.timeout = aiohttp.ClientTimeout(sock_connect=timeout[0], sock_read=timeout[1])
+        self.pool_size = pool_size
+        self.rate_limiter = rate_limiter
+        self._session = None
+        self._stats = {}
+
+    @property
+    def session(self):
+        # created lazily so the session belongs to the loop that runs the requests
+        if self._session is None or self._session.closed:
+            trace = aiohttp.TraceConfig()
+            trace.on_connection_create_end.append(self._on_new_connection)
+            headers = {}
+            if isinstance(self.auth, tuple):
+                credentials = base64.b64encode('{}:{}'.format(*self.auth).encode()).decode()
+                headers['Authorization'] = 'Basic ' + credentials
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.pool_size),
+                                                  timeout=self.timeout, headers=headers, trace_configs=[trace])
+        return self._session
+
+    async def request(self, method, url, params=None, data=None, auth=None, headers=None):
+        # like requests, `data` dicts are form encoded into the body (also for GET and DELETE) and None values dropped
+        headers = dict(headers or {})
+        if params:
+            url = url + '?' + urlencode({k: v for k, v in params.items() if v is not None})
+        body = urlencode({k: v for k, v in data.items() if v is not None}) if isinstance(data, dict) else data
+        if body:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        signer = auth or self.auth
+        if signer is not None and hasattr(signer, 'headers'):
+            headers.update(signer.headers(method, url, body or ''))
+
+        stats = self._host_stats(urlparse(url).netloc)
+        if self.rate_limiter:
+            wait = self.rate_limiter.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        start = time.time()
+        try:
+            async with self.session.request(method, url, data=body, headers=headers,
+                                            trace_request_ctx={'stats': stats}) as r:
+                response = AsyncResponse(r.status, r.headers, await r.read())
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            stats.errors += 1
+            raise
+        finally:
+            stats.requests += 1
+            stats.elapsed += time.time() - start
+        if self.rate_limiter:
+            self.rate_limiter.update(response)
+        return response
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def put(self, url, **kwargs):
+        return await self.request('PUT', url, **kwargs)
+
+    async def patch(self, url, **kwargs):
+        return await self.request('PATCH', url, **kwargs)
+
+    async def delete(self, url, **kwargs):
+        return await self.request('DELETE', url, **kwargs)
+
+    def stats(self):
+        return {host: s.as_dict() for host, s in self._stats.items()}
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _host_stats(self, host):
+        stats = self._stats.get(host)
+        if stats is None:
+            stats = self._stats.setdefault(host, HostStats(host))
+        return stats
+
+    async def _on_new_connection(self, session, context, params):
+        # called when a request had to open a TCP/TLS connection instead of reusing a pooled one
+        stats = (context.trace_request_ctx or {}).get('stats')
+        if stats is not None:
+            stats.new_connections += 1
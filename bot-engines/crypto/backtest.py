@@ -0,0 +1,263 @@
+import csv
+import itertools
+import logging
+import numpy as np
+from crypto.engine import Exchange
+from crypto.structs import Order, Trade, Ticker, Balance, OrderBook, Entry, Candle
+from crypto.timeparse import NS, to_ns
+
+
+class History(object):
+    """Columnar candle history of one market: bar open times (epoch seconds) and OHLCV arrays."""
+    def __init__(self, market, times, open, high, low, close, volume, period=60):
+        self.market = market
+        self.times = np.asarray(times, dtype=float)
+        self.open = np.asarray(open, dtype=float)
+        self.high = np.asarray(high, dtype=float)
+        self.low = np.asarray(low, dtype=float)
+        self.close = np.asarray(close, dtype=float)
+        self.volume = np.asarray(volume, dtype=float)
+        self.period = period
+
+    def __len__(self):
+        return len(self.times)
+
+    @classmethod
+    def from_csv(cls, path, market, period=60):
+        # columns: time (epoch seconds), open, high, low, close, volume
+        with open(path) as f:
+            rows = [r for r in csv.reader(f) if r and not r[0].startswith('time')]
+        columns = np.array(rows, dtype=float).T
+        return cls(market, *columns, period=period)
+
+
+class Completed(object):
+    # an already finished future
+    def __init__(self, result=None, exception=None):
+        self._result = result
+        self._exception = exception
+
+    def done(self):
+        return True
+
+    def result(self, timeout=None):
+        if self._exception:
+            raise self._exception
+        return self._result
+
+
+class InlineExecutor(object):
+    # runs submitted work immediately; strategies use it instead of threads during a backtest
+    def submit(self, fn, *args, **kwargs):
+        try:
+            return Completed(fn(*args, **kwargs))
+        except Exception as e:
+            return Completed(exception=e)
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class SimulatedExchange(Exchange):
+    """
+    Exchange that replays candle histories. Market orders and marketable limit orders fill immediately at the
+    simulated best price paying the taker fee, resting limit orders fill at their price paying the maker fee once a
+    later bar trades through them. Positions may go short; cash is kept per currency.
+    """
+    def __init__(self, histories, balances=None, spread=0.0005, book_depth=1, book_size=1e9):
+        self.histories = {h.market.symbol: h for h in histories}
+        super().__init__('backtest://', None, None, list(self.histories.keys()), mock=False)
+        self.markets = {s: h.market for s, h in self.histories.items()}
+        self.spread = spread
+        self.book_depth = book_depth
+        self.book_size = book_size
+        self.cash = dict(balances or {})
+        self.positions = {s: 0.0 for s in self.symbols}
+        self.open_orders = {}  # order id -> Order
+        self.fills = {s: [] for s in self.symbols}
+        self.fees = 0.0
+        self.cursor = 0  # index of the last completed bar
+        self.bars = {}  # symbol -> (time, open, high, low, close, volume) of that bar as plain floats
+        self.quotes = {}  # symbol -> (bid, ask) around that bar's close
+        self.tickers = {}  # symbol -> Ticker of that bar, built on first use
+        self.maker_fees = {s: float(m.make_fee) for s, m in self.markets.items()}
+        self.taker_fees = {s: float(m.take_fee) for s, m in self.markets.items()}
+        self.now = 0.0
+        self.now_ns = 0
+        self._ids = itertools.count(1)
+
+    # Clock
+    def time(self):
+        return self.now
+
+    def advance(self, i):
+        # bar i has closed: move the clock to just after its end and match resting orders against it
+        self.cursor = i
+        # numpy scalars are slow to index and to compute with, everything after this reads the bar as floats
+        half = self.spread / 2
+        for s, h in self.histories.items():
+            bar = self.bars[s] = (h.times.item(i), h.open.item(i), h.high.item(i), h.low.item(i), h.close.item(i),
+                                  h.volume.item(i))
+            self.quotes[s] = (bar[4] * (1 - half), bar[4] * (1 + half))
+        self.tickers.clear()
+        h = next(iter(self.histories.values()))
+        self.now = self.bars[h.market.symbol][0] + h.period + 1
+        self.now_ns = self._ns(self.now)
+        if self.open_orders:
+            for order in list(self.open_orders.values()):
+                symbol = order.market.symbol
+                _, _, high, low, _, _ = self.bars[symbol]
+                if (order.side == 'buy' and low < order.rate) or (order.side == 'sell' and high > order.rate):
+                    self._fill(order, order.rate, self.maker_fees[symbol])
+
+    def mark(self):
+        # value of cash and positions in each market's base currency at the current close
+        equity = dict(self.cash)
+        for s, qty in self.positions.items():
+            m = self.markets[s]
+            equity[m.base] = equity.get(m.base, 0.0) + qty * self.bars[s][4]
+        return equity
+
+    # Interface
+    def bid(self, market, rate, quantity):
+        return self._place(market, 'buy', rate, quantity)
+
+    def ask(self, market, rate, quantity):
+        return self._place(market, 'sell', rate, quantity)
+
+    def cancel(self, order_id=None, market=None, all=False):
+        if all:
+            cancelled = list(self.open_orders.values())
+        elif market:
+            cancelled = [o for o in self.open_orders.values() if o.market.symbol == market.symbol]
+        elif order_id:
+            cancelled = [self.open_orders[order_id]] if order_id in self.open_orders else []
+        else:
+            raise Exception('Specify order_id, market, or all')
+        for o in cancelled:
+            del self.open_orders[o.order_id]
+        return cancelled
+
+    def orders(self, market=None):
+        return [o for o in self.open_orders.values() if market is None or o.market.symbol == market.symbol]
+
+    def balance(self):
+        reserved = {}
+        for o in self.open_orders.values():
+            if o.side == 'buy':
+                reserved[o.market.base] = reserved.get(o.market.base, 0.0) + o.rate * o.quantity
+        return {c: Balance(v - reserved.get(c, 0.0), reserved.get(c, 0.0)) for c, v in self.cash.items()}
+
+    def position(self, market):
+        return self.positions[market.symbol]
+
+    def order_book(self, market):
+        bid, ask = self.quotes[market.symbol]
+        if self.book_depth == 1:
+            return OrderBook([Entry(ask, self.book_size)], [Entry(bid, self.book_size)])
+        tick = bid * self.spread
+        asks = [Entry(ask + k * tick, self.book_size) for k in range(self.book_depth)]
+        bids = [Entry(bid - k * tick, self.book_size) for k in range(self.book_depth)]
+        return OrderBook(asks, bids)
+
+    def ticker(self, market=None):
+        ticker = self.tickers.get(market.symbol)
+        if ticker is None:
+            t, _, high, low, close, volume = self.bars[market.symbol]
+            bid, ask = self.quotes[market.symbol]
+            ticker = self.tickers[market.symbol] = Ticker(market, ask, bid, low, high, close, volume, volume * close,
+                                                          self._ns(t))
+        return ticker
+
+    def trades(self, market):
+        return self.fills[market.symbol][-100:]
+
+    def candles(self, market, start=None, limit=100):
+        h = self.histories[market.symbol]
+        first = max(self.cursor + 1 - limit, 0)
+        if start is not None:
+            first = max(first, int(np.searchsorted(h.times, to_ns(start) / NS, side='right')))
+        last = self.cursor + 1
+        columns = (h.open[first:last].tolist(), h.high[first:last].tolist(), h.low[first:last].tolist(),
+                   h.close[first:last].tolist(), h.volume[first:last].tolist(), h.times[first:last].tolist())
+        return [Candle(market, o, hi, lo, c, v, self._ns(t)) for o, hi, lo, c, v, t in zip(*columns)]
+
+    def to_market(self, symbol):
+        return self.markets[symbol]
+
+    # Simulation
+    def _place(self, market, side, rate, quantity):
+        order = Order(next(self._ids), market, side, rate or 0, quantity, self.now_ns)
+        bid, ask = self.quotes[market.symbol]
+        if rate is None or (side == 'buy' and rate >= ask) or (side == 'sell' and rate <= bid):
+            self._fill(order, ask if side == 'buy' else bid, self.taker_fees[market.symbol])
+        else:
+            self.open_orders[order.order_id] = order
+        return order
+
+    def _fill(self, order, price, fee_rate):
+        m = order.market
+        signed = order.quantity if order.side == 'buy' else -order.quantity
+        fee = abs(signed) * price * fee_rate
+        self.positions[m.symbol] += signed
+        self.cash[m.base] = self.cash.get(m.base, 0.0) - signed * price - fee
+        self.fees += fee
+        self.open_orders.pop(order.order_id, None)
+        self.fills[m.symbol].append(Trade(order.order_id, order.order_id, m, order.side, price, order.quantity,
+                                          self.now_ns))
+
+    @staticmethod
+    def _ns(timestamp):
+        # epoch seconds to the records' epoch nanoseconds
+        return int(round(timestamp * 1e6)) * 1000
+
+
+class BacktestResult(object):
+    def __init__(self, times, equity, fills, fees, currency):
+        self.times = times
+        self.equity = equity
+        self.fills = fills
+        self.fees = fees
+        self.currency = currency
+
+    def summary(self):
+        peak = np.maximum.accumulate(self.equity)
+        drawdown = (peak - self.equity).max() if len(self.equity) else 0.0
+        return {
+            'currency': self.currency,
+            'start_equity': float(self.equity[0]) if len(self.equity) else 0.0,
+            'end_equity': float(self.equity[-1]) if len(self.equity) else 0.0,
+            'pnl': float(self.equity[-1] - self.equity[0]) if len(self.equity) else 0.0,
+            'max_drawdown': float(drawdown),
+            'fees': self.fees,
+            'fills': sum(len(f) for f in self.fills.values()),
+        }
+
+
+class Backtest(object):
+    """Drives a strategy's unmodified trade(market) over a SimulatedExchange one bar at a time."""
+    def __init__(self, exchange, strategy, warmup=100, currency='BTC'):
+        self.exchange = exchange
+        self.strategy = strategy
+        self.strategy.executor = InlineExecutor()
+        self.warmup = warmup
+        self.currency = currency
+
+    def run(self, start=0, end=None):
+        h = next(iter(self.exchange.histories.values()))
+        end = len(h) if end is None else end
+        first = max(start, self.warmup - 1)
+        equity = np.empty(max(end - first, 0))
+        markets = list(self.exchange.markets.values())
+        logger = logging.getLogger()
+        level = logger.level
+        logger.setLevel(logging.WARNING)  # strategies log every decision, far too much for accelerated time
+        try:
+            for k, i in enumerate(range(first, end)):
+                self.exchange.advance(i)
+                for m in markets:
+                    self.strategy.trade(m)
+                equity[k] = self.exchange.mark().get(self.currency, 0.0)
+        finally:
+            logger.setLevel(level)
+        return BacktestResult(h.times[first:end], equity, self.exchange.fills, self.exchange.fees, self.currency)
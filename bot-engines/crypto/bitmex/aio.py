@@ -0,0 +1,235 @@
+from crypto.engine import AsyncExchange
+from crypto.aiotransport import AsyncTransport
+from crypto.ratelimit import RateLimiter
+from crypto.structs import Balance
+from crypto.bitmex.auth import APIKeyAuthWithExpires
+from crypto.bitmex.bitmex import BitMEXExchange
+from crypto.metrics import api_call
+import asyncio
+import logging
+import json
+
+
+class AsyncBitMEXExchange(AsyncExchange):
+    """BitMEXExchange on asyncio. Responses are converted by the same functions the blocking adapter uses."""
+    def __init__(self, base_url, key, secret, symbols, cache_dir=None):
+        super().__init__(base_url, key, secret, symbols, cache_dir)
+        self.auth = APIKeyAuthWithExpires(key, secret)
+        self.rate_limiter = RateLimiter()
+        self.session = AsyncTransport(auth=self.auth, rate_limiter=self.rate_limiter)
+
+    async def _all_markets(self):
+        status, data = await self._active_instruments()
+        if status == 200:
+            return {d['symbol']: self._to_market(d, d['symbol']) for d in data}
+        else:
+            raise Exception(data['error']['message'])
+
+    async def close(self):
+        await self.session.close()
+
+    # Interface
+    async def bid(self, market, rate, quantity):
+        try:
+            status, data = await self._order(**self._order_request(market, "Buy", rate, quantity))
+            return self._to_order(self._result(status, data))
+        except Exception as e:
+            logging.exception("Error in bid function")
+
+    async def ask(self, market, rate, quantity):
+        try:
+            status, data = await self._order(**self._order_request(market, "Sell", rate, quantity))
+            return self._to_order(self._result(status, data))
+        except Exception as e:
+            logging.exception("Error in ask function")
+
+    async def cancel(self, order_id=None, market=None, all=False):
+        try:
+            call, args = self._cancel_request(order_id, market, all)
+            status, data = await call(**args)
+            return list(map(self._to_order, self._result(status, data)))
+        except Exception as e:
+            logging.exception("Error in cancel function")
+
+    async def amend(self, order, rate, quantity=None):
+        try:
+            status, data = await self._amend(order.order_id, price=rate, orderQty=quantity)
+            return self._to_order(self._result(status, data))
+        except Exception as e:
+            logging.exception("Error in amend function")
+
+    async def balance(self):
+        try:
+            status, data = await self._wallet()
+            if status == 200:
+                total = [d for d in data if d['transactType'] == 'Total'][-1]
+                currency = total['currency'].upper()
+                if currency == 'XBT':
+                    currency = 'BTC'
+                return {currency: Balance(total['walletBalance'] / 100000000, 0)}
+            else:
+                raise Exception(data['error']['message'])
+        except Exception as e:
+            logging.exception("Error in balance function")
+
+    async def orders(self, market=None):
+        try:
+            symbol = market.symbol if market else ''
+            status, data = await self._active_orders(symbol)
+            if status == 200:
+                return list(map(self._to_order, data))
+            else:
+                raise Exception(data['error']['message'])
+        except Exception as e:
+            logging.exception("Error in orders function")
+
+    async def order_book(self, market, depth=10):
+        try:
+            status, data = await self._order_book(market.symbol, depth=depth)
+            if status == 200:
+                return self._to_order_book(data)
+            else:
+                raise Exception(data['error']['message'])
+        except Exception as e:
+            logging.exception("Error in order_book function")
+
+    async def ticker(self, market=None):
+        try:
+            status, data = await self._instrument(market.symbol if market else None)
+            if status == 200:
+                if market:
+                    return self._to_ticker(data[0], market)
+                else:
+                    return [self._to_ticker(d) for d in data if d['symbol'] in self.markets]
+            else:
+                raise Exception(data['error']['message'])
+        except Exception as e:
+            logging.exception("Error in ticker function")
+
+    async def trades(self, market):
+        try:
+            status, data = await self._filled_orders(market.symbol)
+            if status == 200:
+                return [self._to_trade(d, market) for d in data]
+            else:
+                raise Exception(data['error']['message'])
+        except Exception as e:
+            logging.exception("Error in trades function")
+
+    async def candles(self, market, start=None, limit=100):
+        try:
+            status, data = await self._trades_bucketed(market.symbol, count=limit, startTime=start)
+            if status == 200:
+                return [self._to_candle(d) for d in data[::-1]]
+            else:
+                raise Exception(data['error']['message'])
+        except Exception as e:
+            logging.exception("Error in candles function")
+
+    async def position(self, market):
+        try:
+            status, data = await self._positions(market.symbol)
+            if status == 200:
+                if len(data) < 1:
+                    return 0
+                return data[0]['currentQty']
+            else:
+                raise Exception(data['error']['message'])
+        except Exception as e:
+            logging.exception("Error in position function")
+
+    async def close_positions(self):
+        try:
+            await asyncio.gather(*[self._close_position(m.symbol) for m in self.markets.values()])
+        except Exception as e:
+            logging.exception("Error in close position function")
+
+    # Requests and responses
+    _order_request = BitMEXExchange._order_request
+    _cancel_request = BitMEXExchange._cancel_request
+    _result = BitMEXExchange._result
+
+    # Data conversion
+    _to_market = BitMEXExchange._to_market
+    _to_order = BitMEXExchange._to_order
+    _to_trade = BitMEXExchange._to_trade
+    _to_ticker = BitMEXExchange._to_ticker
+    _to_candle = BitMEXExchange._to_candle
+    _to_order_book = BitMEXExchange._to_order_book
+
+    # API Methods
+    @api_call
+    async def _wallet(self):
+        r = await self.session.get(self.base_url + "/user/walletSummary/")
+        return r.status_code, r.json()
+
+    @api_call
+    async def _instrument(self, symbol=None):
+        r = await self.session.get(self.base_url + "/instrument/", data={'symbol': symbol})
+        return r.status_code, r.json()
+
+    @api_call
+    async def _active_instruments(self):
+        r = await self.session.get(self.base_url + "/instrument/active")
+        return r.status_code, r.json()
+
+    @api_call
+    async def _order(self, symbol, side, orderQty, price, timeInForce=None, ordType=None):
+        payload = {k: v for (k, v) in locals().items() if v is not None and v != self}
+        if side not in ["Buy", "Sell"]:
+            raise Exception("Invalid side")
+        r = await self.session.post(self.base_url + '/order', data=payload)
+        return r.status_code, r.json()
+
+    @api_call
+    async def _amend(self, orderID, price=None, orderQty=None):
+        payload = {k: v for (k, v) in locals().items() if v is not None and v != self}
+        r = await self.session.put(self.base_url + '/order', data=payload)
+        return r.status_code, r.json()
+
+    @api_call
+    async def _cancel(self, orderID):
+        r = await self.session.delete(self.base_url + '/order', data={'orderID': orderID})
+        return r.status_code, r.json()
+
+    @api_call
+    async def _cancel_all(self, symbol=None):
+        r = await self.session.delete(self.base_url + '/order/all', data={'symbol': symbol})
+        return r.status_code, r.json()
+
+    @api_call
+    async def _order_book(self, symbol=None, depth=10):
+        r = await self.session.get(self.base_url + "/orderBook/L2", data={'symbol': symbol, 'depth': depth})
+        return r.status_code, r.json()
+
+    @api_call
+    async def _active_orders(self, symbol=None):
+        payload = {'symbol': symbol or None, 'filter': json.dumps({"open": "true"})}
+        r = await self.session.get(self.base_url + "/order/", data=payload)
+        return r.status_code, r.json()
+
+    @api_call
+    async def _filled_orders(self, symbol=None, count=100, reverse=True):
+        payload = {k: v for (k, v) in locals().items() if v is not None and v != self}
+        payload['filter'] = json.dumps({"ordStatus": "Filled"})
+        r = await self.session.get(self.base_url + "/order/", data=payload)
+        return r.status_code, r.json()[::-1]
+
+    @api_call
+    async def _trades_bucketed(self, symbol=None, binSize='1m', count=None, reverse=True, startTime=None):
+        payload = {k: v for (k, v) in locals().items() if v is not None and v != self}
+        payload['reverse'] = "true" if payload['reverse'] else "false"
+        payload['partial'] = "false"
+        r = await self.session.get(self.base_url + "/trade/bucketed", data=payload)
+        return r.status_code, r.json()
+
+    @api_call
+    async def _positions(self, symbol):
+        r = await self.session.get(self.base_url + "/position/", data={'filter': json.dumps({"symbol": symbol})})
+        return r.status_code, r.json()
+
+    @api_call
+    async def _close_position(self, symbol):
+        payload = {"symbol": symbol, "ordType": "Market", "execInst": "Close"}
+        r = await self.session.post(self.base_url + "/order/", data=payload)
+        return r.status_code, r.json()
@@ -20,12 +20,18 @@ class APIKeyAuthWithExpires(object):
         For more details, see https://www.bitmex.com/app/apiKeys
         """
         # modify and return the request
-        expires = int(round(time.time()) + 5)  # 5s grace period in case of clock skew
-        r.headers['api-expires'] = str(expires)
-        r.headers['api-key'] = self.apiKey
-        r.headers['api-signature'] = self.generate_signature(self.apiSecret, r.method, r.url, expires, r.body or '')
+        r.headers.update(self.headers(r.method, r.url, r.body or ''))
         return r
 
+    def headers(self, verb, url, data=''):
+        """Authentication headers for a request, for clients that are not based on requests."""
+        expires = int(round(time.time()) + 5)  # 5s grace period in case of clock skew
+        return {
+            'api-expires': str(expires),
+            'api-key': self.apiKey,
+            'api-signature': self.generate_signature(self.apiSecret, verb, url, expires, data),
+        }
+
     # From BitMEX API Documentation: https://www.bitmex.com/app/apiKeysUsage
     # Generates an API signature.
     # A signature is HMAC_SHA256(secret, verb + path + expires + data), hex encoded.
@@ -1,69 +1,109 @@
 from crypto.engine import Exchange
-import requests
+from crypto.transport import Transport
+from crypto.ratelimit import RateLimiter
 from crypto.structs import Order, Trade, Market, Ticker, Balance, OrderBook, Entry, Candle
-import dateutil.parser
+from crypto.timeparse import parse_ns
 import logging
 import configparser
 import json
 from crypto.bitmex.auth import APIKeyAuthWithExpires
+from crypto.bitmex.stream import BitMEXStream
+from crypto.metadata import MarketCache
 from crypto.helpers import print_json
-import time
+from crypto.metrics import api_call
 
 
 class BitMEXExchange(Exchange):
-    def __init__(self, base_url, key, secret, symbols, mock=False):
+    BULK_SIZE = 100  # orders per bulk request
+
+    def __init__(self, base_url, key, secret, symbols, mock=False, cache_dir=None):
         super().__init__(base_url, key, secret, symbols, mock)
         self.auth = APIKeyAuthWithExpires(key, secret)
+        self.rate_limiter = RateLimiter()
+        self.session = Transport(rate_limiter=self.rate_limiter)
         self.symbols = symbols
+        if mock:
+            from crypto.bitmex.mock import mock_adapter, mocker  # requests_mock is only loaded in mock mode
+            self.session.mount('mock', mock_adapter)
+            self.symbols = [s for s in symbols if s in mocker.specs] or list(mocker.specs)
         self.markets = {}
-        self.markets = {s: self.to_market(s) for s in symbols}
+        self.metadata = MarketCache(self.base_url, self._all_markets, cache_dir=cache_dir)
+        self.markets = self.metadata.load(self.symbols, lambda markets: self.markets.update(markets))
+        self.markets.update((s, self.to_market(s)) for s in self.symbols if s not in self.markets)
+        self.stream = None
+
+    def start_stream(self, url):
+        # serve order books from the orderBookL2_25 websocket table, REST stays the fallback
+        self.stream = BitMEXStream(url, self.symbols)
+        self.stream.start()
 
     # Interface
     def bid(self, market, rate, quantity):
         try:
-            if rate is None:
-                ord_type = 'Market'
-            else:
-                ord_type = None
-            status, data = self._order(market.symbol, side="Buy", price=rate, orderQty=quantity, ordType=ord_type)
-            if status == 200:
-                return self._to_order(data)
-            else:
-                raise Exception(data['error']['message'])
+            status, data = self._order(**self._order_request(market, "Buy", rate, quantity))
+            return self._to_order(self._result(status, data))
         except Exception as e:
             logging.exception("Error in bid function")
 
     def ask(self, market, rate, quantity):
         try:
-            if rate is None:
-                ord_type = 'Market'
-            else:
-                ord_type = None
-            status, data = self._order(market.symbol, side="Sell", price=rate, orderQty=quantity, ordType=ord_type)
-            if status == 200:
-                return self._to_order(data)
-            else:
-                raise Exception(data['error']['message'])
+            status, data = self._order(**self._order_request(market, "Sell", rate, quantity))
+            return self._to_order(self._result(status, data))
         except Exception as e:
             logging.exception("Error in ask function")
 
     def cancel(self, order_id=None, market=None, all=False):
         try:
-            if all:
-                status, data = self._cancel_all()
-                orders = list(map(self._to_order, data))
-            elif market:
-                status, data = self._cancel_all(market.symbol)
-                orders = list(map(self._to_order, data))
-            elif order_id:
-                status, data = self._cancel(order_id)
-                orders = list(map(self._to_order, data))
-            else:
-                raise Exception('Specify order_id, market, or all')
-            return orders
+            call, args = self._cancel_request(order_id, market, all)
+            status, data = call(**args)
+            return list(map(self._to_order, self._result(status, data)))
         except Exception as e:
             logging.exception("Error in cancel function")
 
+    def place_many(self, orders):
+        results = []
+        for start in range(0, len(orders), self.BULK_SIZE):
+            chunk = orders[start:start + self.BULK_SIZE]
+            try:
+                status, data = self._order_bulk([self._bulk_order(*order) for order in chunk])
+                if status == 200:
+                    results.extend(map(self._placed, data))
+                else:
+                    raise Exception(data['error']['message'])
+            except Exception as e:
+                logging.exception("Error in place_many function")
+                results.extend([None] * len(chunk))
+        return results
+
+    def cancel_many(self, order_ids):
+        results = []
+        for start in range(0, len(order_ids), self.BULK_SIZE):
+            chunk = order_ids[start:start + self.BULK_SIZE]
+            try:
+                status, data = self._cancel(orderID=json.dumps(chunk))
+                if status == 200:
+                    cancelled = {d['orderID']: d for d in data if not d.get('error')}
+                    for d in data:
+                        if d.get('error'):
+                            logging.warning("Cancel of order #{} failed: {}".format(d.get('orderID'), d['error']))
+                    results.extend(self._to_order(cancelled[i]) if i in cancelled else None for i in chunk)
+                else:
+                    raise Exception(data['error']['message'])
+            except Exception as e:
+                logging.exception("Error in cancel_many function")
+                results.extend([None] * len(chunk))
+        return results
+
+    def amend(self, order, rate, quantity=None):
+        try:
+            status, data = self._amend(order.order_id, price=rate, orderQty=quantity)
+            if status == 200:
+                return self._to_order(data)
+            else:
+                raise Exception(data['error']['message'])
+        except Exception as e:
+            logging.exception("Error in amend function")
+
     def balance(self):
         try:
             status, data = self._wallet()
@@ -90,14 +130,15 @@ class BitMEXExchange(Exchange):
         except Exception as e:
             logging.exception("Error in orders function")
 
-    def order_book(self, market):
+    def order_book(self, market, depth=10):
         try:
-            status, data = self._order_book(market.symbol)
+            if self.stream:
+                orderbook = self.stream.order_book(market.symbol, depth)
+                if orderbook:
+                    return orderbook
+            status, data = self._order_book(market.symbol, depth=depth)
             if status == 200:
-                asks = [Entry(d['price'], d['size']) for d in data if d['side'] == 'Sell']
-                bids = [Entry(d['price'], d['size']) for d in data if d['side'] == 'Buy']
-                orderbook = OrderBook(asks, bids)
-                return orderbook
+                return self._to_order_book(data)
             else:
                 raise Exception(data['error']['message'])
         except Exception as e:
@@ -158,29 +199,77 @@ class BitMEXExchange(Exchange):
         except Exception as e:
             logging.exception("Error in close position function")
 
+    # Requests and responses, shared with AsyncBitMEXExchange
+    def _order_request(self, market, side, rate, quantity):
+        # _order arguments of a limit order, or of a market order when rate is None
+        return dict(symbol=market.symbol, side=side, price=rate, orderQty=quantity,
+                    ordType='Market' if rate is None else None)
+
+    def _cancel_request(self, order_id=None, market=None, all=False):
+        # the API method and its arguments cancelling the orders cancel() was asked for
+        if all:
+            return self._cancel_all, {}
+        elif market:
+            return self._cancel_all, {'symbol': market.symbol}
+        elif order_id:
+            return self._cancel, {'orderID': order_id}
+        else:
+            raise Exception('Specify order_id, market, or all')
+
+    def _result(self, status, data):
+        # data of a successful response, the API's error message raised otherwise
+        if status == 200:
+            return data
+        else:
+            raise Exception(data['error']['message'])
+
     # Data conversion
     def to_market(self, symbol):
         m = self.markets.get(symbol, None)
         if not m:
             status, data = self._instrument(symbol)
             if status == 200:
-                counter = data[0]['positionCurrency']
-                if counter.upper() == 'XBT':
-                    counter = 'BTC'
-                base = data[0]['underlying']
-                if base.upper() == 'XBT':
-                    base = 'BTC'
-                m = Market(counter=counter, base=base, symbol=symbol,
-                           increment=data[0]['lotSize'], make_fee=data[0]['makerFee'], take_fee=data[0]['takerFee'])
+                m = self._to_market(data[0], symbol)
             else:
                 raise Exception(data['error']['message'])
         return m
 
+    def _all_markets(self):
+        status, data = self._active_instruments()
+        if status == 200:
+            return {d['symbol']: self._to_market(d, d['symbol']) for d in data}
+        else:
+            raise Exception(data['error']['message'])
+
+    def _to_market(self, data, symbol):
+        counter = data['positionCurrency']
+        if counter.upper() == 'XBT':
+            counter = 'BTC'
+        base = data['underlying']
+        if base.upper() == 'XBT':
+            base = 'BTC'
+        return Market(counter=counter, base=base, symbol=symbol,
+                      increment=data['lotSize'], make_fee=data['makerFee'], take_fee=data['takerFee'])
+
+    def _bulk_order(self, market, side, rate, quantity):
+        order = {'symbol': market.symbol, 'side': side.title(), 'orderQty': quantity}
+        if rate is None:
+            order['ordType'] = 'Market'
+        else:
+            order['price'] = rate
+        return order
+
+    def _placed(self, data):
+        if data.get('ordStatus') == 'Rejected':
+            logging.warning("Order in {} rejected: {}".format(data.get('symbol'), data.get('ordRejReason')))
+            return None
+        return self._to_order(data)
+
     def _to_order(self, data):
         market = self.markets.get(data['symbol'], None)
         if not market:
             market = self.to_market(data['symbol'])
-        created = dateutil.parser.parse(data['timestamp'])
+        created = parse_ns(data['timestamp'])
         order = Order(order_id=data['orderID'], market=market, side=data['side'].lower(),
                       rate=data['price'], quantity=data['orderQty'], time=created)
         return order
@@ -189,7 +278,7 @@ class BitMEXExchange(Exchange):
         market = self.markets.get(data['symbol'], None)
         if not market:
             market = self.to_market(data['symbol'])
-        time = dateutil.parser.parse(data['timestamp'])
+        time = parse_ns(data['timestamp'])
         trade = Trade(trade_id=data['orderID'], order_id=data['orderID'], market=market,
                       side=data['side'], rate=data['price'], quantity=data['orderQty'], time=time)
         return trade
@@ -197,30 +286,43 @@ class BitMEXExchange(Exchange):
     def _to_ticker(self, data, market=None):
         if not market:
             market = self.to_market(data['symbol'])
-        time = data['timestamp']
+        time = parse_ns(data['timestamp'])
         ticker = Ticker(market=market, ask=data['askPrice'], bid=data['bidPrice'], low=data['lowPrice'], high=data['highPrice'],
                         last=data['lastPrice'], base_volume=0, quote_volume=data['turnover'], time=time)
         return ticker
 
     def _to_candle(self, data):
         market = self.to_market(data['symbol'])
-        time = dateutil.parser.parse(data['timestamp'])
+        time = parse_ns(data['timestamp'])
         candle = Candle(market=market, open=data['open'], high=data['high'], low=data['low'],
                        close=data['close'], volume=data['volume'], time=time)
         return candle
 
+    def _to_order_book(self, data):
+        # L2 levels come sorted by price descending, asks are reversed so both sides start at the best level
+        asks = [Entry(d['price'], d['size']) for d in data if d['side'] == 'Sell'][::-1]
+        bids = [Entry(d['price'], d['size']) for d in data if d['side'] == 'Buy']
+        orderbook = OrderBook(asks=asks, bids=bids)
+        return orderbook
+
     # API Methods
+    @api_call
     def _wallet(self):
-        r = requests.get(self.base_url + "/user/walletSummary/", auth=self.auth)
-        self._control_rate(r)
+        r = self.session.get(self.base_url + "/user/walletSummary/", auth=self.auth)
         return r.status_code, r.json()
 
+    @api_call
     def _instrument(self, symbol=None):
         payload = {k: v for (k, v) in locals().items() if v is not None and v != self}
-        r = requests.get(self.base_url + "/instrument/", data=payload, auth=self.auth)
-        self._control_rate(r)
+        r = self.session.get(self.base_url + "/instrument/", data=payload, auth=self.auth)
         return r.status_code, r.json()
 
+    @api_call
+    def _active_instruments(self):
+        r = self.session.get(self.base_url + "/instrument/active", auth=self.auth)
+        return r.status_code, r.json()
+
+    @api_call
     def _order(self, symbol, side, orderQty, price, timeInForce=None, ordType=None, stopPx=None):
         payload = {k: v for (k, v) in locals().items() if v is not None and v != self}
         if side not in ["Buy", "Sell"]:
@@ -232,51 +334,62 @@ class BitMEXExchange(Exchange):
             raise Exception('Invalid type')
         if not stopPx and payload.get('type', '').startswith('Stop'):
             raise Exception("Stop price required for stop types")
-        response = requests.post(self.base_url + '/order', data=payload, auth=self.auth)
-        self._control_rate(response)
+        response = self.session.post(self.base_url + '/order', data=payload, auth=self.auth)
+        return response.status_code, response.json()
+
+    @api_call
+    def _order_bulk(self, orders):
+        response = self.session.post(self.base_url + '/order/bulk', data={'orders': json.dumps(orders)}, auth=self.auth)
+        return response.status_code, response.json()
+
+    @api_call
+    def _amend(self, orderID, price=None, orderQty=None):
+        payload = {k: v for (k, v) in locals().items() if v is not None and v != self}
+        response = self.session.put(self.base_url + '/order', data=payload, auth=self.auth)
         return response.status_code, response.json()
 
+    @api_call
     def _cancel(self, orderID=None, clOrdID=None):
         payload = {k: v for (k, v) in locals().items() if v is not None and v != self}
         if not len(payload.keys()):
             raise Exception("Order id or client order id required")
-        response = requests.delete(self.base_url + '/order', data=payload, auth=self.auth)
-        self._control_rate(response)
+        response = self.session.delete(self.base_url + '/order', data=payload, auth=self.auth)
         return response.status_code, response.json()
 
+    @api_call
     def _cancel_all(self, symbol=None):
         payload = {k: v for (k, v) in locals().items() if v is not None and v != self}
-        response = requests.delete(self.base_url + '/order/all', data=payload, auth=self.auth)
-        self._control_rate(response)
+        response = self.session.delete(self.base_url + '/order/all', data=payload, auth=self.auth)
         return response.status_code, response.json()
 
+    @api_call
     def _order_book(self, symbol=None, depth=10):
         payload = {k: v for (k, v) in locals().items() if v is not None and v != self}
         payload['filter'] = json.dumps({"ordStatus": "Filled"})
-        r = requests.get(self.base_url + "/orderBook/L2", data=payload, auth=self.auth)
-        self._control_rate(r)
+        r = self.session.get(self.base_url + "/orderBook/L2", data=payload, auth=self.auth)
         return r.status_code, r.json()
 
+    @api_call
     def _active_orders(self, symbol=None):
         payload = {k: v for (k, v) in locals().items() if v is not None and v != self}
         payload['filter'] = json.dumps({"open": "true"})
-        r = requests.get(self.base_url + "/order/", data=payload, auth=self.auth)
-        self._control_rate(r)
+        r = self.session.get(self.base_url + "/order/", data=payload, auth=self.auth)
         return r.status_code, r.json()
 
+    @api_call
     def _filled_orders(self, symbol=None, count=100, reverse=True):
         payload = {k: v for (k, v) in locals().items() if v is not None and v != self}
         payload['filter'] = json.dumps({"ordStatus": "Filled"})
-        r = requests.get(self.base_url + "/order/", data=payload, auth=self.auth)
-        self._control_rate(r)
+        r = self.session.get(self.base_url + "/order/", data=payload, auth=self.auth)
         return r.status_code, r.json()[::-1]
 
+    @api_call
     def _trades(self, symbol=None):
         payload = {k: v for (k, v) in locals().items() if v is not None and v != self}
-        r = requests.get(self.base_url + "/trade/", data=payload, auth=self.auth)
-        self._control_rate(r)
+        r = self.session.get(self.base_url + "/trade/", data=payload, auth=self.auth)
         return r.status_code, r.json()
 
+    @api_call
     def _trades_bucketed(self, symbol=None, binSize='1m', count=None, start=None, reverse=True, partial=False,
                          startTime=None, endTime=None):
         payload = {k: v for (k, v) in locals().items() if v is not None and v != self}
@@ -284,34 +397,24 @@ class BitMEXExchange(Exchange):
         payload['partial'] = "true" if payload['partial'] else "false"
         if binSize not in ['1m', '5m', '1h', '1d']:
             raise Exception('Invalid binSize')
-        r = requests.get(self.base_url + "/trade/bucketed", data=payload)
-        self._control_rate(r)
+        r = self.session.get(self.base_url + "/trade/bucketed", data=payload)
         return r.status_code, r.json()
 
+    @api_call
     def _positions(self, symbol):
         payload = {}
         payload['filter'] = json.dumps({"symbol": symbol})
-        r = requests.get(self.base_url + "/position/", data=payload, auth=self.auth)
-        self._control_rate(r)
+        r = self.session.get(self.base_url + "/position/", data=payload, auth=self.auth)
         return r.status_code, r.json()
 
+    @api_call
     def _close_position(self, symbol):
         payload = {"symbol": symbol,
                    "ordType": "Market",
                    "execInst": "Close"}
-        r = requests.post(self.base_url + "/order/", data=payload, auth=self.auth)
-        self._control_rate(r)
+        r = self.session.post(self.base_url + "/order/", data=payload, auth=self.auth)
         return r.status_code, r.json()
 
-    def _control_rate(self, res):
-        try:
-            if int(res.headers['x-ratelimit-remaining']) < 50:
-                time.sleep(20)
-            else:
-                time.sleep(.2)
-        except:
-            time.sleep(5)
-
 #
 # if __name__ == "__main__":
     # config = configparser.ConfigParser(allow_no_value=True)
@@ -0,0 +1,259 @@
+import requests_mock
+import re
+import os
+import json
+import random
+import uuid
+from urllib.parse import parse_qs
+from crypto.matching import MatchingEngine, Spec, Rejected, Latency, iso
+
+SATOSHIS = 100000000
+
+
+class Mocker(object):
+    """
+    BitMEX API v1 on top of the matching engine: inverse contracts settled in XBT, with positions and realised PnL.
+    Accounts are keyed by the api-key header. Every instrument or order book request moves its market one step.
+    """
+    SYMBOLS = ['XBTUSD']
+    SPECS = [Spec('XBTUSD', 'XBT', 'USD', 9000.0, lot=1, tick=0.5, size=1000, maker_fee=-0.00025, taker_fee=0.00075,
+                  spread=0.0002, inverse=True)]
+    BALANCES = {'XBT': 1.0}
+    STATUS = {'new': 'New', 'partiallyFilled': 'PartiallyFilled', 'filled': 'Filled', 'canceled': 'Canceled'}
+
+    def __init__(self, seed=0, specs=None, balances=None):
+        self.latency = Latency()
+        self.reset(seed, specs or Mocker.SPECS, balances or Mocker.BALANCES)
+
+    def reset(self, seed=None, specs=None, balances=None):
+        # start over, optionally with other markets or starting balances (e.g. the synthetic markets of a load test)
+        if specs is not None or balances is not None:
+            self.specs = {s.symbol: s for s in specs or self.specs.values()}
+            self.engine = MatchingEngine(self.specs.values(), seed or 0, balances or self.engine.initial)
+        self.engine.reset(seed)
+        self.ids = random.Random(self.engine.seed)
+
+    @staticmethod
+    def params(request):
+        params = {k: v[0] for k, v in parse_qs(request.body or '').items()}
+        for key in ('filter', 'orders'):
+            if key in params:
+                params[key] = json.loads(params[key])
+        return params
+
+    @staticmethod
+    def account(request):
+        return request.headers.get('api-key', 'anonymous')
+
+    @staticmethod
+    def error(context, message):
+        context.status_code = 404 if message == 'Order not found' else 400
+        return json.dumps({"error": {"message": message, "name": "HTTPError"}})
+
+    def order_id(self):
+        return str(uuid.UUID(int=self.ids.getrandbits(128)))
+
+    # Market data
+    def instruments(self, request, context):
+        return json.dumps([self.to_instrument(s) for s in self.specs])
+
+    def instrument(self, request, context):
+        symbol = self.params(request).get('symbol')
+        if symbol not in self.specs:
+            return json.dumps([])
+        self.engine.step(symbol)
+        return json.dumps([self.to_instrument(symbol)])
+
+    def orderbook(self, request, context):
+        params = self.params(request)
+        symbol = params.get('symbol')
+        if symbol not in self.specs:
+            return self.error(context, 'Unknown symbol')
+        self.engine.step(symbol)
+        tick = self.specs[symbol].tick
+        asks, bids = self.engine.book(symbol, int(params.get('depth') or 25))
+        return json.dumps([{"symbol": symbol, "id": int(round(price / tick)), "side": side, "size": size,
+                            "price": price} for side, levels in (('Sell', asks[::-1]), ('Buy', bids))
+                           for price, size in levels])
+
+    def market_trades(self, request, context):
+        symbol = self.params(request).get('symbol')
+        return json.dumps([{"timestamp": iso(time), "symbol": symbol, "side": side.title(), "size": quantity,
+                            "price": price, "trdMatchID": str(uuid.UUID(int=i))}
+                           for i, side, price, quantity, time in self.engine.tape(symbol)])
+
+    def candles(self, request, context):
+        params = self.params(request)
+        candles = self.engine.candles(params['symbol'], int(params.get('count') or 100))
+        if params.get('reverse', 'true') == 'true':
+            candles = candles[::-1]
+        return json.dumps([{"timestamp": iso(t + 60), "symbol": params['symbol'], "open": o, "high": h, "low": l,
+                            "close": c, "volume": v} for t, o, h, l, c, v in candles])
+
+    # Trading
+    def wallet(self, request, context):
+        available, reserved = self.engine.balances(self.account(request)).get('XBT', (0.0, 0.0))
+        return json.dumps([{"account": 0, "currency": "XBt", "transactType": "Total",
+                            "walletBalance": int(round((available + reserved) * SATOSHIS))}])
+
+    def positions(self, request, context):
+        symbol = self.params(request)['filter']['symbol']
+        contracts, entry, realised = self.engine.position(self.account(request), symbol)
+        return json.dumps([{"symbol": symbol, "currency": "XBt", "currentQty": contracts, "avgEntryPrice": entry,
+                            "realisedPnl": int(round(realised * SATOSHIS)), "isOpen": contracts != 0}])
+
+    def orders(self, request, context):
+        params = self.params(request)
+        account, symbol = self.account(request), params.get('symbol') or None
+        if params.get('filter', {}).get('ordStatus') == 'Filled':
+            symbols = [symbol] if symbol else list(self.specs)
+            orders = [o for s in symbols for o in self.engine.closed_orders(account, s) if o.status == 'filled']
+            orders = sorted(orders, key=lambda o: o.updated)[-int(params.get('count') or 100):]
+            if params.get('reverse') == 'True':
+                orders = orders[::-1]
+        else:
+            orders = self.engine.open_orders(account, symbol)
+        return json.dumps([self.to_order(o) for o in orders])
+
+    def order(self, request, context):
+        params = self.params(request)
+        account = self.account(request)
+        try:
+            if params.get('execInst') == 'Close':
+                return json.dumps(self.to_order(self.close_position(account, params['symbol'])))
+            return json.dumps(self.to_order(self.place(account, params)))
+        except Rejected as e:
+            return self.error(context, str(e))
+
+    def bulk(self, request, context):
+        account = self.account(request)
+        results = []
+        for params in self.params(request)['orders']:
+            try:
+                results.append(self.to_order(self.place(account, params)))
+            except Rejected as e:
+                results.append({"orderID": None, "symbol": params.get('symbol'), "side": params.get('side'),
+                                "ordStatus": "Rejected", "ordRejReason": str(e)})
+        return json.dumps(results)
+
+    def amend(self, request, context):
+        params = self.params(request)
+        try:
+            order = self.engine.replace(self.account(request), client_id=params['orderID'],
+                                        price=params.get('price'), quantity=params.get('orderQty'),
+                                        new_client_id=params['orderID'])
+            return json.dumps(self.to_order(order))
+        except Rejected as e:
+            return self.error(context, str(e))
+
+    def cancel(self, request, context):
+        order_ids = self.params(request).get('orderID', '')
+        order_ids = json.loads(order_ids) if order_ids.startswith('[') else [order_ids]
+        results = []
+        for order_id in order_ids:
+            try:
+                results.append(self.to_order(self.engine.cancel(self.account(request), client_id=order_id)))
+            except Rejected as e:
+                results.append({"orderID": order_id, "error": "Not Found"})
+        return json.dumps(results)
+
+    def cancel_all(self, request, context):
+        symbol = self.params(request).get('symbol')
+        return json.dumps([self.to_order(o) for o in self.engine.cancel_all(self.account(request), symbol)])
+
+    def place(self, account, params):
+        if params.get('side') not in ('Buy', 'Sell'):
+            raise Rejected('Invalid side')
+        price = None if params.get('ordType') == 'Market' else params.get('price')
+        return self.engine.place(account, params['symbol'], params['side'].lower(), params['orderQty'], price,
+                                 params.get('clOrdID') or self.order_id())
+
+    def close_position(self, account, symbol):
+        contracts = self.engine.position(account, symbol)[0]
+        if not contracts:
+            raise Rejected('No position to close')
+        side = 'sell' if contracts > 0 else 'buy'
+        return self.engine.place(account, symbol, side, abs(contracts), None, self.order_id())
+
+    # Responses
+    def to_instrument(self, symbol):
+        spec = self.specs[symbol]
+        t = self.engine.ticker(symbol)
+        return {
+            "symbol": symbol,
+            "state": "Open",
+            "positionCurrency": spec.quote,
+            "underlying": spec.base,
+            "quoteCurrency": spec.quote,
+            "settlCurrency": "XBt",
+            "lotSize": spec.lot,
+            "tickSize": spec.tick,
+            "makerFee": spec.maker_fee,
+            "takerFee": spec.taker_fee,
+            "askPrice": t['ask'],
+            "bidPrice": t['bid'],
+            "lastPrice": t['last'],
+            "lowPrice": t['low'],
+            "highPrice": t['high'],
+            "volume": t['volume'],
+            "turnover": int(round(sum(q / p for _, _, p, q, _ in self.engine.tape(symbol)) * SATOSHIS)),
+            "timestamp": iso(t['time'])
+        }
+
+    def to_order(self, order):
+        return {
+            "orderID": order.client_id,
+            "symbol": order.symbol,
+            "side": order.side.title(),
+            "orderQty": order.quantity,
+            "price": order.price,
+            "ordType": order.type.title(),
+            "ordStatus": self.STATUS[order.status],
+            "leavesQty": order.remaining if order.status in ('new', 'partiallyFilled') else 0,
+            "cumQty": order.filled,
+            "timestamp": iso(order.updated),
+            "transactTime": iso(order.created)
+        }
+
+
+mock_adapter = requests_mock.Adapter()
+mocker = Mocker(int(os.environ.get('MOCK_SEED', 0)))
+
+matcher = re.compile('/instrument/active')
+mock_adapter.register_uri('GET', matcher, text=mocker.latency.wrap(mocker.instruments))
+
+matcher = re.compile('/instrument/$')
+mock_adapter.register_uri('GET', matcher, text=mocker.latency.wrap(mocker.instrument))
+
+matcher = re.compile('/orderBook/L2')
+mock_adapter.register_uri('GET', matcher, text=mocker.latency.wrap(mocker.orderbook))
+
+matcher = re.compile('/trade/$')
+mock_adapter.register_uri('GET', matcher, text=mocker.latency.wrap(mocker.market_trades))
+
+matcher = re.compile('/trade/bucketed')
+mock_adapter.register_uri('GET', matcher, text=mocker.latency.wrap(mocker.candles))
+
+matcher = re.compile('/user/walletSummary')
+mock_adapter.register_uri('GET', matcher, text=mocker.latency.wrap(mocker.wallet))
+
+matcher = re.compile('/position/$')
+mock_adapter.register_uri('GET', matcher, text=mocker.latency.wrap(mocker.positions))
+
+matcher = re.compile('/order/$')
+mock_adapter.register_uri('GET', matcher, text=mocker.latency.wrap(mocker.orders))
+
+matcher = re.compile('/order/?$')
+mock_adapter.register_uri('POST', matcher, text=mocker.latency.wrap(mocker.order))
+
+matcher = re.compile('/order/bulk$')
+mock_adapter.register_uri('POST', matcher, text=mocker.latency.wrap(mocker.bulk))
+
+matcher = re.compile('/order$')
+mock_adapter.register_uri('PUT', matcher, text=mocker.latency.wrap(mocker.amend))
+
+matcher = re.compile('/order$')
+mock_adapter.register_uri('DELETE', matcher, text=mocker.latency.wrap(mocker.cancel))
+
+matcher = re.compile('/order/all$')
+mock_adapter.register_uri('DELETE', matcher, text=mocker.latency.wrap(mocker.cancel_all))
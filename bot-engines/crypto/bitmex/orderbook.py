@@ -0,0 +1,60 @@
+import threading
+from crypto.book import LevelBook
+
+
+class L2Book(LevelBook):
+    """
+    BitMEX orderBookL2 book. Levels are indexed by their L2 id so the insert/update/delete deltas of the
+    websocket table are applied without rebuilding the book.
+    """
+    def __init__(self, symbol):
+        super().__init__()
+        self.symbol = symbol
+        self.ids = {}  # L2 id -> (side, price)
+        self.live = False  # True once the book is fed by orderBookL2 deltas
+        self.lock = threading.Lock()
+
+    def _side(self, side):
+        return self.asks if side == 'Sell' else self.bids
+
+    def apply(self, action, data):
+        with self.lock:
+            self._apply(action, data)
+
+    def _apply(self, action, data):
+        if action == 'partial':
+            self.clear()
+            self.ids = {}
+        for d in data:
+            if action in ('partial', 'insert'):
+                self.ids[d['id']] = (d['side'], d['price'])
+                self._side(d['side']).set(d['price'], d['size'])
+            elif action == 'update':
+                level = self.ids.get(d['id'])
+                if level:
+                    side, price = level
+                    self._side(side).set(price, d['size'])
+            elif action == 'delete':
+                level = self.ids.pop(d['id'], None)
+                if level:
+                    side, price = level
+                    self._side(side).remove(price)
+            else:
+                raise Exception('Unknown action {}'.format(action))
+
+    def best_ask(self):
+        with self.lock:
+            return self.asks.best()
+
+    def best_bid(self):
+        with self.lock:
+            return self.bids.best()
+
+    def depth(self, depth=10):
+        # top levels as (price, size) pairs, only the requested levels are materialized
+        with self.lock:
+            return list(self.asks.levels(depth)), list(self.bids.levels(depth))
+
+    def snapshot(self, depth=10):
+        with self.lock:
+            return super().snapshot(depth)
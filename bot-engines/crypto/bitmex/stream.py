@@ -0,0 +1,105 @@
+import json
+import logging
+import threading
+import time
+import websocket
+from crypto.bitmex.orderbook import L2Book
+
+
+class BitMEXStream(object):
+    """
+    Keeps the order books of a set of symbols up to date from the orderBookL2_25 table of the BitMEX websocket feed:
+    a partial per symbol, then insert/update/delete deltas applied to an L2Book. order_book() gives None whenever a
+    symbol is not in sync (not connected yet, stale) and the caller should fall back to the REST API.
+    """
+    TABLE = 'orderBookL2_25'
+
+    def __init__(self, url, symbols, max_age=30, reconnect_delay=1):
+        self.url = url
+        self.symbols = symbols
+        self.max_age = max_age  # seconds without any message before a symbol counts as stale
+        self.reconnect_delay = reconnect_delay
+        self.books = {s: L2Book(s) for s in symbols}
+        self.updated = {s: 0 for s in symbols}
+        self.ws = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='bitmex-stream')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.ws:
+            self.ws.close()
+        if self._thread:
+            self._thread.join(5)
+
+    def wait_ready(self, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if all(self.books[s].live for s in self.symbols):
+                return True
+            time.sleep(.01)
+        return False
+
+    # Readers
+    def order_book(self, symbol, depth=10):
+        book = self.books.get(symbol)
+        if book is None or not book.live or time.time() - self.updated[symbol] >= self.max_age:
+            return None
+        return book.snapshot(depth)
+
+    # Connection
+    def _run(self):
+        while not self._stop.is_set():
+            self.ws = websocket.WebSocketApp(self.url, on_open=self._on_open, on_message=self._on_message,
+                                             on_error=self._on_error)
+            self.ws.run_forever()
+            self._reset()
+            if not self._stop.is_set():
+                logging.info("BitMEX stream disconnected, reconnecting")
+                time.sleep(self.reconnect_delay)
+
+    def _on_open(self, ws):
+        ws.send(json.dumps({'op': 'subscribe', 'args': ['{}:{}'.format(self.TABLE, s) for s in self.symbols]}))
+
+    def _on_message(self, ws, message):
+        try:
+            self.handle(message)
+        except Exception as e:
+            logging.exception("Error handling stream message")
+
+    def _on_error(self, ws, error):
+        logging.warning("BitMEX stream error: {}".format(error))
+
+    def _reset(self):
+        for s in self.symbols:
+            self.books[s].live = False
+            self.books[s].apply('partial', [])
+            self.updated[s] = 0
+
+    # Message handling
+    def handle(self, message):
+        msg = json.loads(message)
+        if msg.get('table') != self.TABLE:
+            if 'error' in msg:
+                logging.warning("BitMEX stream request failed: {}".format(msg['error']))
+            return  # welcome message or subscription acknowledgement
+        by_symbol = {}
+        for d in msg['data']:
+            by_symbol.setdefault(d['symbol'], []).append(d)
+        if msg['action'] == 'partial' and msg.get('filter', {}).get('symbol'):
+            by_symbol.setdefault(msg['filter']['symbol'], [])  # an empty book is still in sync
+        for symbol, data in by_symbol.items():
+            book = self.books.get(symbol)
+            if book is None:
+                continue
+            if msg['action'] == 'partial':
+                book.live = True
+            elif not book.live:
+                continue  # deltas before the partial
+            book.apply(msg['action'], data)
+            self.updated[symbol] = time.time()
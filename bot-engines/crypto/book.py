@@ -0,0 +1,71 @@
+import heapq
+from crypto.structs import Entry, OrderBook
+
+
+class BookSide(object):
+    """
+    One side of a price-level order book. Sizes are looked up by price, a heap of sign * price keeps the best level
+    on top so updates cost O(log n). Removed levels are dropped from the heap lazily once they reach the top.
+    """
+    def __init__(self, descending=False):
+        self.sign = -1 if descending else 1
+        self.heap = []  # sign * price, may hold removed prices
+        self.sizes = {}  # price -> size
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def set(self, price, size):
+        if size <= 0:
+            return self.remove(price)
+        if price not in self.sizes:
+            heapq.heappush(self.heap, self.sign * price)
+        self.sizes[price] = size
+
+    def remove(self, price):
+        if self.sizes.pop(price, None) is not None and len(self.heap) > 2 * len(self.sizes) + 64:
+            self.heap = [self.sign * p for p in self.sizes]
+            heapq.heapify(self.heap)
+
+    def clear(self):
+        self.heap = []
+        self.sizes = {}
+
+    def best_price(self):
+        while self.heap and self.sign * self.heap[0] not in self.sizes:
+            heapq.heappop(self.heap)
+        return self.sign * self.heap[0] if self.heap else None
+
+    def best(self):
+        price = self.best_price()
+        if price is None:
+            return None
+        return price, self.sizes[price]
+
+    def levels(self, depth=None):
+        # (price, size) pairs best-first; with a depth only that many levels are sorted out of the side
+        prices = self.sizes.keys()
+        if depth is None:
+            ordered = sorted(prices, reverse=self.sign < 0)
+        elif self.sign < 0:
+            ordered = heapq.nlargest(depth, prices)
+        else:
+            ordered = heapq.nsmallest(depth, prices)
+        for price in ordered:
+            yield price, self.sizes[price]
+
+    def top(self, depth=10):
+        return [Entry(price, size) for price, size in self.levels(depth)]
+
+
+class LevelBook(object):
+    def __init__(self):
+        self.asks = BookSide()
+        self.bids = BookSide(descending=True)
+
+    def clear(self):
+        self.asks.clear()
+        self.bids.clear()
+
+    def snapshot(self, depth=10):
+        return OrderBook(self.asks.top(depth), self.bids.top(depth))
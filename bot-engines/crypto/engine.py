@@ -1,8 +1,13 @@
+import asyncio
 import configparser
 import abc
-from .helpers import str_to_class, serialize_obj, print_json
+from .helpers import str_to_class, print_json
+from .metadata import MarketCache
+from .metrics import registry as metrics
+from .profiling import Profiler
+from .scheduler import Scheduler
+from .telemetry import Publisher
 import json
-import random
 from queue import Queue
 import time
 import threading
@@ -11,12 +16,133 @@ import logging
 import signal
 import sys
 import csv
-import requests
+import concurrent.futures
 
 
+# seconds between runs of the bot's tasks; orders and books change every few seconds, balance and fills rarely.
+# Config keys are <Task>Interval, e.g. BalanceInterval = 60
+INTERVALS = {
+    'messages': 0.25,
+    'strategy': 2,
+    'active_orders': 2,
+    'orderbooks': 2,
+    'positions': 10,
+    'trades': 15,
+    'balance': 30,
+    'signals': 60,
+}
 
-class TradingBot(object):
-    def __init__(self, name, exchange=None, strategy=None, config_path=None, mock=None):
+
+def interval_key(task):
+    return ''.join(part.title() for part in task.split('_')) + 'Interval'
+
+
+class BotMixin(object):
+    """
+    What TradingBot and AsyncTradingBot share: the task schedule, the report job list, publishing a report, metrics,
+    profiling and pushing to the publisher. The bot provides process_messages, execute_strategy and report, blocking
+    or as coroutines, and the attributes they use.
+    """
+    def schedule(self):
+        # control messages and the strategy, then the report types grouped by interval so report types with the same
+        # cadence are fetched concurrently in one report(); a strategy trading on candles sets align to run (and
+        # publish its signals) just after every candle closes. For AsyncTradingBot the tasks are coroutine functions
+        scheduler = Scheduler()
+        align = getattr(self.strategy, 'align', None)
+        offset = getattr(self.strategy, 'offset', 0.0)
+        scheduler.add('messages', self.process_messages, self.intervals['messages'])
+        if self.strategy is not None:
+            scheduler.add('strategy', self.execute_strategy,
+                          getattr(self.strategy, 'interval', None) or self.intervals['strategy'], align, offset)
+        groups = {}
+        for type in sorted({t for t, _ in self.report_jobs()}, key=lambda t: (self.intervals[t], t)):
+            aligned = align if type == 'signals' else None
+            groups.setdefault((self.intervals[type], aligned), []).append(type)
+        for (interval, aligned), types in groups.items():
+            scheduler.add('report:' + ','.join(types), lambda types=types: self.report(types), interval, aligned,
+                          offset if aligned else 0.0)
+        return scheduler
+
+    def profile(self, data):
+        # start/stop CPU and memory profiling, e.g. {"type": "profile", "data": "start"}; results go to files and a
+        # summary is pushed as 'profile'
+        try:
+            self.push(self.profiler.handle(data), 'profile')
+        except Exception as e:
+            logging.exception("Error in profile command")
+            self.push(e, 'error')
+
+    def report_jobs(self):
+        # (type, market) -> function fetching that part of the report
+        jobs = {}
+        if self.report_account:
+            jobs[('balance', None)] = self.exchange.balance
+            jobs[('active_orders', None)] = self.exchange.orders
+        for k, v in self.markets.items():
+            jobs[('orderbooks', k)] = lambda m=v: self.exchange.order_book(m)
+            jobs[('trades', k)] = lambda m=v: self.exchange.trades(m)
+            if hasattr(self.exchange, 'position'):
+                jobs[('positions', k)] = lambda m=v: self.exchange.position(m)
+            if hasattr(self.strategy, 'signals'):
+                jobs[('signals', k)] = lambda m=v: self.strategy.signals(m)
+        return jobs
+
+    def publish_report(self, jobs):
+        # take the finished fetches out of pending_reports and push the latest value of every report type
+        skipped = []
+        for key in jobs.keys():
+            future = self.pending_reports[key]
+            if not future.done():
+                skipped.append(key)
+                continue
+            del self.pending_reports[key]
+            try:
+                self.last_report[key] = future.result()
+            except Exception as e:
+                logging.exception("Error fetching {} for {}".format(*key))
+                skipped.append(key)
+        for t, m in skipped:
+            metrics.inc('report_skipped_total', type=t)
+        skipped = ['{}/{}'.format(t, m) if m else t for t, m in skipped]
+        if skipped:
+            logging.info("Report skipped {}".format(', '.join(skipped)))
+
+        fetched = {t for t, _ in jobs.keys()}
+        for type in ['balance', 'active_orders']:
+            if type in fetched and (type, None) in self.last_report:
+                self.push(self.last_report[(type, None)], type)
+        status = {
+            'strategy': str(self.strategy),
+            'markets': dict(self.markets_on),
+            'skipped': skipped
+        }
+        self.push(status, 'status')
+        for type in [t for t in ['orderbooks', 'trades', 'positions', 'signals'] if t in fetched]:
+            data = {k: self.last_report[(type, k)] for k in self.markets.keys() if (type, k) in self.last_report}
+            if data:
+                self.push(data, type)
+        if time.time() - self.metrics_pushed >= self.metrics_interval:
+            self.push(self.metrics(), 'metrics')
+            self.metrics_pushed = time.time()
+        return skipped
+
+    def metrics(self):
+        # latency histograms and counters of this process, the 'metrics' push type and the /metrics endpoint
+        return metrics.snapshot()
+
+    def push(self, data, type='Test'):
+        # non-blocking, the publisher thread sends the message
+        self.publisher.publish(data, type)
+
+
+class TradingBot(BotMixin):
+    def __init__(self, name, exchange=None, strategy=None, config_path=None, mock=None, symbols=None, publisher=None,
+                 report_account=True, intervals=None):
+        self.minutes_to_timeout = 60
+        self.intervals = dict(INTERVALS)
+        self.report_deadline = 1.5  # seconds report() waits for market data before publishing what it has
+        self.metrics_interval = 30  # seconds between 'metrics' pushes
+        profile_dir = 'profiles'
         if config_path:
             try:
                 config = configparser.ConfigParser(allow_no_value=True)
@@ -25,33 +151,52 @@ class TradingBot(object):
                 if mock is None:
                     mock = config[name].getboolean('Mock', fallback=True)
                 wrapper_class = str_to_class(config[name]['Wrapper'])
-                strategy_class = str_to_class(config[name]['Strategy'])
                 self.minutes_to_timeout = int(config[name]['MinutesToTimeout'])
-                symbols = config[name]['Symbols'].split(',')
+                self.report_deadline = config[name].getfloat('ReportDeadline', fallback=self.report_deadline)
+                self.metrics_interval = config[name].getfloat('MetricsInterval', fallback=self.metrics_interval)
+                profile_dir = config[name].get('ProfileDir', fallback=profile_dir)
+                for task, seconds in INTERVALS.items():
+                    self.intervals[task] = config[name].getfloat(interval_key(task), fallback=seconds)
+                symbols = symbols or config[name]['Symbols'].split(',')
                 exchange = wrapper_class(config[name]['BaseUrl'], config[name]['Key'], config[name]['Secret'],
                                          symbols, mock)
-                market_configs = {s: config[name][s].split(',') for s in symbols}
-                if config[name]['Strategy'] == 'SignalStrategy':
-                    indicators = {ind: str_to_class(ind) for ind in config[name]['indicators'].split(',')}
-                    strategy = strategy_class(exchange, market_configs, indicators)
-                else:
-                    strategy = strategy_class(exchange, market_configs)
+                if config[name].get('StreamUrl') and hasattr(exchange, 'start_stream'):
+                    exchange.start_stream(config[name]['StreamUrl'])
+                strategy = self.config_strategy(config[name], exchange, symbols)
             except Exception as e:
                 logging.exception("Error reading config file")
                 sys.exit(0)
+        self.intervals.update(intervals or {})
         self.name = name
         self.exchange = exchange
         self.strategy = strategy
+        self.scheduler = None
+        self.profiler = Profiler(name, profile_dir)
 
         self.markets = {m.counter + '_' + m.base: m for m in list(map(self.exchange.to_market, self.exchange.symbols))}
         self.markets_on = {m: True for m in self.markets.keys()}
 
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=16)
+        self.pending_reports = {}  # (type, market) -> future still running from an earlier report()
+        self.last_report = {}  # (type, market) -> last value fetched
         self.msg_queue = Queue(maxsize=10)
         self.turn_off = threading.Event()
         self.work_thread = None
         self.end_time = time.time() + (60 * self.minutes_to_timeout)
+        self.report_account = report_account  # whether report() fetches the account wide balance and orders
+        self.metrics_pushed = time.time()
+        self.publisher = publisher or Publisher('http://localhost:{}/update'.format(os.environ.get('PORT', 3000)),
+                                                self.name)
         signal.signal(signal.SIGINT, self.sig_handler)
 
+    def config_strategy(self, section, exchange, symbols):
+        strategy_class = str_to_class(section['Strategy'])
+        market_configs = {s: section[s].split(',') for s in symbols}
+        if section['Strategy'] == 'SignalStrategy':
+            indicators = {ind: str_to_class(ind) for ind in section['indicators'].split(',')}
+            return strategy_class(exchange, market_configs, indicators)
+        return strategy_class(exchange, market_configs)
+
     def run(self):
         logging.info('Turning on')
         self.work_thread = threading.Thread(target=self.work)
@@ -66,27 +211,24 @@ class TradingBot(object):
         raise SystemExit
 
     def work(self):
-        while True:
-            if self.turn_off.is_set():
-                logging.info("Cancelling trades")
-                self.exchange.cancel(all=True)
-                if hasattr(self.exchange, 'close_positions'):
-                    self.exchange.close_positions()
-                self.push([], 'active_orders')
-                return
-            try:
-                if not self.msg_queue.empty():
-                    msg = self.msg_queue.get()
-                    self.process_msg(msg)
-                self.execute_strategy()
-                self.report()
-            except Exception as e:
-                self.push(e, 'error')
-                logging.info("Cancelling orders")
-                self.exchange.cancel(all=True)
-                raise e
-            finally:
-                time.sleep(2)
+        self.scheduler = self.schedule()
+        try:
+            self.scheduler.run(self.turn_off)
+        except Exception as e:
+            self.push(e, 'error')
+            logging.info("Cancelling orders")
+            self.exchange.cancel(all=True)
+            raise e
+        logging.info("Cancelling trades")
+        self.exchange.cancel(all=True)
+        if hasattr(self.exchange, 'close_positions'):
+            self.exchange.close_positions()
+        self.push([], 'active_orders')
+        self.executor.shutdown(wait=False)
+
+    def process_messages(self):
+        while not self.msg_queue.empty():
+            self.process_msg(self.msg_queue.get())
 
     def process_msg(self, msg):
         if msg['type'] == 'markets':
@@ -100,36 +242,35 @@ class TradingBot(object):
                 self.markets_on[m] = False
             logging.info("Pausing all markets. Cancelling all active trades")
             self.exchange.cancel(all=True)
+        elif msg['type'] == 'profile':
+            self.profile(msg['data'])
 
     def execute_strategy(self):
-        new_orders = []
-        for m in [market for market, is_on in self.markets_on.items() if is_on]:
-            res = self.strategy.trade(self.markets[m])
-            if res:
-                new_orders.extend(res)
-        return new_orders
-
-    def report(self):
-        # send market data to backend via stdout
-        balance = self.exchange.balance()
-        self.push(balance, 'balance')
-        active_orders = self.exchange.orders()
-        self.push(active_orders, 'active_orders')
-        status = {
-            'strategy': str(self.strategy),
-            'markets': self.markets_on
-        }
-        self.push(status, 'status')
-        orderbooks = {k: self.exchange.order_book(v) for k,v in self.markets.items()}
-        self.push(orderbooks, 'orderbooks')
-        trades = {k: self.exchange.trades(v) for k,v in self.markets.items()}
-        self.push(trades, 'trades')
-        if hasattr(self.exchange, 'position'):
-            positions = {k: self.exchange.position(v) for k,v in self.markets.items()}
-            self.push(positions, 'positions')
-        if hasattr(self.strategy, 'signals'):
-            signals = {k: self.strategy.signals(v) for k,v in self.markets.items()}
-            self.push(signals, 'signals')
+        with metrics.timer('bot_stage_seconds', stage='strategy'):
+            new_orders = []
+            for m in [market for market, is_on in self.markets_on.items() if is_on]:
+                with metrics.timer('strategy_trade_seconds', market=m):
+                    res = self.strategy.trade(self.markets[m])
+                if res:
+                    new_orders.extend(res)
+            return new_orders
+
+    def report(self, types=None):
+        # send market data to backend; every fetch runs concurrently on the bot's executor and whatever has not
+        # finished by the deadline is skipped this round (its last known value is published instead). types limits
+        # the report to some report types, by default everything is fetched; only those fetches are waited for
+        with metrics.timer('bot_stage_seconds', stage='report'):
+            jobs = {k: job for k, job in self.report_jobs().items() if types is None or k[0] in types}
+            for key, job in jobs.items():
+                if key not in self.pending_reports:  # don't pile up requests behind a slow one
+                    self.pending_reports[key] = self.executor.submit(self.fetch, key, job)
+            concurrent.futures.wait([self.pending_reports[k] for k in jobs], timeout=self.report_deadline)
+            return self.publish_report(jobs)
+
+    @staticmethod
+    def fetch(key, job):
+        with metrics.timer('report_fetch_seconds', type=key[0]):
+            return job()
 
     def pull(self):
         # pull commands from backend via stdin e.g. {"type": "markets", "data": {"ETH_BTC": "off"}}
@@ -145,15 +286,13 @@ class TradingBot(object):
         except json.JSONDecodeError as e:
             self.push(e, "error")
 
-    def push(self, data, type='Test'):
-        payload = {
-            'exchange': self.name,
-            'type': type,
-            'data': data,
-            'nonce': ''.join([str(random.randint(0, 9)) for _ in range(10)])
-        }
-        msg = json.dumps(payload, default=serialize_obj)
-        requests.post('http://localhost:{}/update'.format(os.environ['PORT']), data=msg, headers={'content-type': 'application/json'})
+    def close(self):
+        # called by the entry scripts on exit
+        if self.profiler.running:
+            self.profile('stop')
+        self.exchange.cancel(all=True)  # cancel orders one more time just to be sure
+        self.push([], 'active_orders')
+        self.publisher.close()
 
     def input_with_timeout(self, timeout):
         # set signal handler
@@ -196,6 +335,31 @@ class Exchange(abc.ABC):
     def cancel(self, order_id=None, market=None, all=False):
         pass
 
+    def amend(self, order, rate, quantity=None):
+        # move an open order to a new price (and quantity); exchanges without an amend endpoint cancel and place again
+        if not self.cancel(order_id=order.order_id):
+            # usually filled since it was last seen, the normal end of a quote; placing anyway would double the position
+            logging.info("Order {} is no longer open, not placing its replacement".format(order.order_id))
+            return None
+        place = self.bid if order.side == 'buy' else self.ask
+        return place(order.market, rate, quantity or order.quantity)
+
+    def place_many(self, orders):
+        # orders are (market, side, rate, quantity) tuples; returns the placed Order, or None where it failed, for each
+        return [self.place(*order) for order in orders]
+
+    def cancel_many(self, order_ids):
+        # returns the cancelled Order, or None where it failed, for each id
+        return [self.cancel_one(order_id) for order_id in order_ids]
+
+    def place(self, market, side, rate, quantity):
+        place = self.bid if side == 'buy' else self.ask
+        return place(market, rate, quantity)
+
+    def cancel_one(self, order_id):
+        cancelled = self.cancel(order_id=order_id)
+        return cancelled[0] if cancelled else None
+
     @abc.abstractmethod
     def orders(self, market=None):
         pass
@@ -216,10 +380,128 @@ class Exchange(abc.ABC):
     def candles(self, market):
         pass
 
+    def time(self):
+        # the exchange's clock; simulated exchanges replace it so strategies can run in accelerated time
+        return time.time()
+
+
+class AsyncExchange(abc.ABC):
+    """
+    asyncio counterpart of Exchange: the same interface and return values, as coroutines. Markets are loaded once by
+    load_markets() so converting responses never needs a blocking request.
+    """
+    @abc.abstractmethod
+    def __init__(self, base_url, key, secret, symbols, cache_dir=None):
+        self.base_url = base_url
+        self.key = key
+        self.secret = secret
+        self.symbols = symbols
+        self.markets = {}
+        self.metadata = MarketCache(base_url, cache_dir=cache_dir)
+        self.refresher = None
+
+    async def load_markets(self):
+        # from the metadata cache when it has every symbol, otherwise with one bulk request; a stale cache is used
+        # while it is refreshed in the background
+        markets, stale = self.metadata.cached(self.symbols)
+        if markets is None:
+            markets = self.metadata.select(await self.refresh_markets(), self.symbols)
+        elif stale:
+            self.refresher = asyncio.ensure_future(self.refresh_markets(log_errors=True))
+        self.markets = markets
+        return self.markets
+
+    async def refresh_markets(self, log_errors=False):
+        try:
+            markets = self.metadata.store(await self._all_markets())
+            self.markets.update(self.metadata.select(markets, self.symbols))
+            return markets
+        except Exception as e:
+            if not log_errors:
+                raise e
+            logging.exception("Error refreshing market metadata")
+
+    @abc.abstractmethod
+    async def _all_markets(self):
+        # {symbol: Market} of every market on the exchange
+        pass
+
+    @abc.abstractmethod
+    async def bid(self, market, rate, quantity):
+        pass
+
+    @abc.abstractmethod
+    async def ask(self, market, rate, quantity):
+        pass
+
+    @abc.abstractmethod
+    async def cancel(self, order_id=None, market=None, all=False):
+        pass
+
+    async def amend(self, order, rate, quantity=None):
+        # like Exchange.amend: cancel and place again unless the adapter has an amend endpoint
+        if not await self.cancel(order_id=order.order_id):
+            logging.info("Order {} is no longer open, not placing its replacement".format(order.order_id))
+            return None
+        place = self.bid if order.side == 'buy' else self.ask
+        return await place(order.market, rate, quantity or order.quantity)
+
+    async def place_many(self, orders):
+        return await asyncio.gather(*[self.place(*order) for order in orders])
+
+    async def cancel_many(self, order_ids):
+        return await asyncio.gather(*[self.cancel_one(order_id) for order_id in order_ids])
+
+    async def place(self, market, side, rate, quantity):
+        place = self.bid if side == 'buy' else self.ask
+        return await place(market, rate, quantity)
+
+    async def cancel_one(self, order_id):
+        cancelled = await self.cancel(order_id=order_id)
+        return cancelled[0] if cancelled else None
+
+    @abc.abstractmethod
+    async def orders(self, market=None):
+        pass
+
+    @abc.abstractmethod
+    async def balance(self):
+        pass
+
+    @abc.abstractmethod
+    async def order_book(self, market):
+        pass
+
+    @abc.abstractmethod
+    async def ticker(self, market=None):
+        pass
+
+    @abc.abstractmethod
+    async def candles(self, market):
+        pass
+
+    @abc.abstractmethod
+    async def close(self):
+        pass
+
+    def to_market(self, symbol):
+        m = self.markets.get(symbol)
+        if not m:
+            raise Exception('Unknown market {}, markets are loaded by load_markets()'.format(symbol))
+        return m
+
+    def time(self):
+        return time.time()
+
 
 class Strategy(object):
+    interval = None  # seconds between trade() calls, None for the bot's StrategyInterval
+    align = None  # run trade() on multiples of align seconds (plus offset), e.g. 60 for strategies on 1m candles
+    offset = 0.0
+
     def __init__(self, exchange, params):
         self.exchange = exchange
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
 
     @abc.abstractmethod
     def trade(self, market):
@@ -20,7 +20,7 @@ def serialize_obj(obj):
     elif isinstance(obj, Market):
         return obj.counter.upper() + "_" + obj.base.upper()
     elif isinstance(obj, (Balance, Order, Ticker, Entry, OrderBook, Trade, Candle)):
-        return obj.__dict__
+        return obj.as_dict()
     elif isinstance(obj, (json.JSONDecodeError, Exception)):
         return str(obj)
 
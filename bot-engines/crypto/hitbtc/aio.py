@@ -0,0 +1,204 @@
+from crypto.engine import AsyncExchange
+from crypto.aiotransport import AsyncTransport
+from crypto.structs import Balance, OrderBook, Entry
+from crypto.timeparse import to_ns
+from crypto.hitbtc.hitbtc import HitBTCExchange
+from crypto.metrics import api_call
+import logging
+import uuid
+
+
+class AsyncHitBTCExchange(AsyncExchange):
+    """HitBTCExchange on asyncio. Responses are converted by the same functions the blocking adapter uses."""
+    def __init__(self, base_url, key, secret, symbols, cache_dir=None):
+        super().__init__(base_url, key, secret, symbols, cache_dir)
+        self.session = AsyncTransport(auth=(self.key, self.secret))
+
+    async def _all_markets(self):
+        status, data = await self._symbols()
+        if status == 200:
+            return {d['id']: self._to_market(d, d['id']) for d in data}
+        else:
+            raise Exception(data['error']['message'])
+
+    async def close(self):
+        await self.session.close()
+
+    # Interface
+    async def bid(self, market, rate, quantity):
+        try:
+            status, data = await self._order_create(market.symbol, side="buy", price=rate, quantity=quantity)
+            return self._to_order(self._result(status, data))
+        except Exception as e:
+            logging.exception("Error in bid function")
+
+    async def ask(self, market, rate, quantity):
+        try:
+            status, data = await self._order_create(market.symbol, side="sell", price=rate, quantity=quantity)
+            return self._to_order(self._result(status, data))
+        except Exception as e:
+            logging.exception("Error in ask function")
+
+    async def cancel(self, order_id=None, market=None, all=False):
+        try:
+            call, args = self._cancel_request(order_id, market, all)
+            status, data = await call(*args)
+            return self._cancelled(self._result(status, data))
+        except Exception as e:
+            logging.exception("Error in cancel function")
+
+    async def amend(self, order, rate, quantity=None):
+        # cancel/replace in one request; the order keeps its place in the queue when only the quantity goes down
+        try:
+            status, data = await self._order_replace(order.order_id, quantity=quantity, price=rate)
+            return self._to_order(self._result(status, data))
+        except Exception as e:
+            logging.exception("Error in amend function")
+
+    async def balance(self):
+        try:
+            status, data = await self._trading_balance()
+            if status == 200:
+                return {d['currency']: Balance(d['available'], d['reserved']) for d in data if (float(d['available']) + float(d['reserved'])) > 0}
+            else:
+                raise Exception(data['error']['message'])
+        except Exception as e:
+            logging.exception("Error in balance function")
+
+    async def orders(self, market=None):
+        try:
+            symbol = market.symbol if market else ''
+            status, data = await self._orders_active(symbol)
+            if status == 200:
+                return list(map(self._to_order, data))
+            else:
+                raise Exception(data['error']['message'])
+        except Exception as e:
+            logging.exception("Error in orders function")
+
+    async def order_book(self, market):
+        try:
+            status, data = await self._orderbook(market.symbol)
+            if status == 200:
+                asks = [Entry(d['price'], d['size']) for d in data['ask'][:10]]
+                bids = [Entry(d['price'], d['size']) for d in data['bid'][:10]]
+                return OrderBook(asks, bids)
+            else:
+                raise Exception(data['error']['message'])
+        except Exception as e:
+            logging.exception("Error in order_book function")
+
+    async def ticker(self, market=None):
+        try:
+            symbol = market.symbol if market else ''
+            status, data = await self._tickers(symbol)
+            if status == 200:
+                if market:
+                    return self._to_ticker(data, market)
+                else:
+                    return [self._to_ticker(d) for d in data if d['symbol'] in self.markets]
+            else:
+                raise Exception(data['error']['message'])
+        except Exception as e:
+            logging.exception("Error in ticker function")
+
+    async def trades(self, market):
+        try:
+            status, data = await self._history_trades(market.symbol)
+            if status == 200:
+                return [self._to_trade(d, market) for d in data]
+            else:
+                raise Exception(data['error']['message'])
+        except Exception as e:
+            logging.exception("Error in trades function")
+
+    async def candles(self, market, start=None, limit=100):
+        try:
+            status, data = await self._candles(market.symbol, limit=limit, period='M1')
+            if status == 200:
+                candles = [self._to_candle(d, market) for d in data]
+                # filter out candles from before start param
+                candles = [c for c in candles if start is None or c.time_ns > to_ns(start)]
+                return candles
+            else:
+                raise Exception(data['error']['message'])
+        except Exception as e:
+            logging.exception("Error in candles function")
+
+    # Requests and responses
+    _cancel_request = HitBTCExchange._cancel_request
+    _result = HitBTCExchange._result
+    _cancelled = HitBTCExchange._cancelled
+
+    # Data conversion
+    _to_market = HitBTCExchange._to_market
+    _to_order = HitBTCExchange._to_order
+    _to_trade = HitBTCExchange._to_trade
+    _to_ticker = HitBTCExchange._to_ticker
+    _to_candle = HitBTCExchange._to_candle
+
+    # API Methods
+    @api_call
+    async def _symbols(self, symbol=''):
+        r = await self.session.get(self.base_url + '/public/symbol/' + symbol)
+        return r.status_code, r.json()
+
+    @api_call
+    async def _tickers(self, symbol=''):
+        r = await self.session.get(self.base_url + '/public/ticker/' + symbol)
+        return r.status_code, r.json()
+
+    @api_call
+    async def _orderbook(self, symbol):
+        r = await self.session.get(self.base_url + '/public/orderbook/' + symbol)
+        return r.status_code, r.json()
+
+    @api_call
+    async def _candles(self, symbol, limit=None, period=None):
+        payload = {k: v for (k, v) in locals().items() if v is not None and v != self}
+        if period and period not in ['M1', 'M3', 'M5', 'M15', 'M30', 'H1', 'H4', 'D1', 'D7', '1M']:
+            raise Exception('Invalid period')
+        r = await self.session.get(self.base_url + '/public/candles/' + symbol, params=payload)
+        return r.status_code, r.json()
+
+    @api_call
+    async def _trading_balance(self):
+        r = await self.session.get(self.base_url + '/trading/balance')
+        return r.status_code, r.json()
+
+    @api_call
+    async def _orders_active(self, symbol=''):
+        r = await self.session.get(self.base_url + '/order/', data={'symbol': symbol})
+        return r.status_code, r.json()
+
+    @api_call
+    async def _order_create(self, symbol, side, quantity, price, timeInForce=None, type=None):
+        payload = {k: v for (k, v) in locals().items() if v is not None and v != self}
+        if side not in ["buy", "sell"]:
+            raise Exception("Invalid side")
+        r = await self.session.post(self.base_url + '/order', data=payload)
+        return r.status_code, r.json()
+
+    @api_call
+    async def _order_replace(self, clientOrderId, quantity=None, price=None, requestClientId=None):
+        payload = {'quantity': quantity, 'price': price, 'requestClientId': requestClientId or uuid.uuid4().hex}
+        payload = {k: v for (k, v) in payload.items() if v is not None}
+        r = await self.session.patch(self.base_url + '/order/' + clientOrderId, data=payload)
+        return r.status_code, r.json()
+
+    @api_call
+    async def _orders_cancel(self, symbol=None):
+        payload = {'symbol': symbol} if symbol else None
+        r = await self.session.delete(self.base_url + '/order', data=payload)
+        return r.status_code, r.json()
+
+    @api_call
+    async def _order_cancel(self, clientOrderId):
+        r = await self.session.delete(self.base_url + '/order/' + clientOrderId)
+        return r.status_code, r.json()
+
+    @api_call
+    async def _history_trades(self, symbol=None):
+        payload = {k: v for (k, v) in locals().items() if v is not None and v != self}
+        r = await self.session.get(self.base_url + '/history/trades', data=payload)
+        return r.status_code, r.json()
@@ -1,63 +1,84 @@
 from crypto.engine import Exchange
-import requests
+from crypto.transport import Transport
 from crypto.structs import Order, Trade, Market, Ticker, Balance, OrderBook, Entry, Candle
-import dateutil.parser
-from crypto.hitbtc.mock import mock_adapter
+from crypto.timeparse import parse_ns, to_ns
+from crypto.hitbtc.stream import HitBTCStream
+from crypto.metadata import MarketCache
 import logging
 import configparser
 from crypto.helpers import print_json
+from crypto.metrics import api_call
+import concurrent.futures
 import datetime
+import uuid
+
+# HitBTC has no batch endpoints: batches go out as concurrent requests over the transport's pooled connections. One
+# pool serves every instance, its threads are only started on first use
+EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=10)
 
 
 class HitBTCExchange(Exchange):
-    def __init__(self, base_url, key, secret, symbols, mock=True):
+    def __init__(self, base_url, key, secret, symbols, mock=True, cache_dir=None):
         super().__init__(base_url, key, secret, symbols, mock)
-        self.session = requests.session()
+        self.session = Transport(auth=(self.key, self.secret))
+        self.symbols = symbols
         if mock:
+            from crypto.hitbtc.mock import mock_adapter, mocker  # requests_mock is only loaded in mock mode
             self.session.mount('mock', mock_adapter)
-        self.session.auth = (self.key, self.secret)
-        self.symbols = symbols if not mock else ['ETHBTC', 'LTCBTC', 'ETCBTC']
+            # the mock only knows the markets it simulates; a subset of them (e.g. one shard's) is kept as given
+            self.symbols = [s for s in symbols if s in mocker.specs] or list(mocker.specs)
         self.markets = {}
-        self.markets = {s: self.to_market(s) for s in symbols}
+        self.metadata = MarketCache(self.base_url, self._all_markets, cache_dir=cache_dir)
+        self.markets = self.metadata.load(self.symbols, lambda markets: self.markets.update(markets))
+        self.markets.update((s, self.to_market(s)) for s in self.symbols if s not in self.markets)
+        self.stream = None
+        self.executor = EXECUTOR
+
+    def start_stream(self, url):
+        # serve order books and tickers from the websocket feed, REST stays the fallback
+        self.stream = HitBTCStream(url, self.symbols)
+        self.stream.start()
 
     # Interface
     def bid(self, market, rate, quantity):
         try:
             status, data = self._order_create(market.symbol, side="buy", price=rate, quantity=quantity)
-            if status == 200:
-                return self._to_order(data)
-            else:
-                raise Exception(data['error']['message'])
+            return self._to_order(self._result(status, data))
         except Exception as e:
             logging.exception("Error in bid function")
 
     def ask(self, market, rate, quantity):
         try:
             status, data = self._order_create(market.symbol, side="sell", price=rate, quantity=quantity)
-            if status == 200:
-                return self._to_order(data)
-            else:
-                raise Exception(data['error']['message'])
+            return self._to_order(self._result(status, data))
         except Exception as e:
             logging.exception("Error in ask function")
 
     def cancel(self, order_id=None, market=None, all=False):
         try:
-            if all:
-                status, data = self._orders_cancel()
-                orders = list(map(self._to_order, data))
-            elif market:
-                status, data = self._orders_cancel(market.symbol)
-                orders = list(map(self._to_order, data))
-            elif order_id:
-                status, data = self._order_cancel(order_id)
-                orders = [self._to_order(data)]
-            else:
-                raise Exception('Specify order_id, market, or all')
-            return orders
+            call, args = self._cancel_request(order_id, market, all)
+            status, data = call(*args)
+            return self._cancelled(self._result(status, data))
         except Exception as e:
             logging.exception("Error in cancel function")
 
+    def place_many(self, orders):
+        return list(self.executor.map(lambda order: self.place(*order), orders))
+
+    def cancel_many(self, order_ids):
+        return list(self.executor.map(self.cancel_one, order_ids))
+
+    def amend(self, order, rate, quantity=None):
+        # cancel/replace in one request; the order keeps its place in the queue when only the quantity goes down
+        try:
+            status, data = self._order_replace(order.order_id, quantity=quantity, price=rate)
+            if status == 200:
+                return self._to_order(data)
+            else:
+                raise Exception(data['error']['message'])
+        except Exception as e:
+            logging.exception("Error in amend function")
+
     def balance(self):
         try:
             status, data = self._trading_balance()
@@ -82,6 +103,10 @@ class HitBTCExchange(Exchange):
 
     def order_book(self, market):
         try:
+            if self.stream:
+                orderbook = self.stream.order_book(market.symbol)
+                if orderbook:
+                    return orderbook
             status, data = self._orderbook(market.symbol)
             if status == 200:
                 asks = [Entry(d['price'], d['size']) for d in data['ask'][:10]]
@@ -95,6 +120,10 @@ class HitBTCExchange(Exchange):
 
     def ticker(self, market=None):
         try:
+            if self.stream and market:
+                data = self.stream.ticker(market.symbol)
+                if data:
+                    return self._to_ticker(data, market)
             symbol = market.symbol if market else ''
             status, data = self._tickers(symbol)
             if status == 200:
@@ -125,25 +154,58 @@ class HitBTCExchange(Exchange):
             if status == 200:
                 candles = [self._to_candle(d, market) for d in data]
                 # filter out candles from before start param
-                candles = [c for c in candles if start is None or c.time.replace(tzinfo=None) > start.replace(tzinfo=None)]
+                candles = [c for c in candles if start is None or c.time_ns > to_ns(start)]
                 return candles
             else:
                 raise Exception(data['error']['message'])
         except Exception as e:
             logging.exception("Error in candles function")
 
+    # Requests and responses, shared with AsyncHitBTCExchange
+    def _cancel_request(self, order_id=None, market=None, all=False):
+        # the API method and its arguments cancelling the orders cancel() was asked for
+        if all:
+            return self._orders_cancel, ()
+        elif market:
+            return self._orders_cancel, (market.symbol,)
+        elif order_id:
+            return self._order_cancel, (order_id,)
+        else:
+            raise Exception('Specify order_id, market, or all')
+
+    def _result(self, status, data):
+        # data of a successful response, the API's error message raised otherwise
+        if status == 200:
+            return data
+        else:
+            raise Exception(data['error']['message'])
+
+    def _cancelled(self, data):
+        # cancelling one order answers that order, cancelling by market or everything a list
+        return list(map(self._to_order, data)) if isinstance(data, list) else [self._to_order(data)]
+
     # Data conversion
     def to_market(self, symbol):
         m = self.markets.get(symbol, None)
         if not m:
             status, data = self._symbols(symbol)
             if status == 200:
-                m = Market(counter=data['baseCurrency'], base=data['quoteCurrency'], symbol=symbol, increment=data['quantityIncrement'],
-                           make_fee=data['provideLiquidityRate'], take_fee=data['takeLiquidityRate'])
+                m = self._to_market(data, symbol)
             else:
                 raise Exception(data['error']['message'])
         return m
 
+    def _all_markets(self):
+        status, data = self._symbols()
+        if status == 200:
+            return {d['id']: self._to_market(d, d['id']) for d in data}
+        else:
+            raise Exception(data['error']['message'])
+
+    def _to_market(self, data, symbol):
+        return Market(counter=data['baseCurrency'], base=data['quoteCurrency'], symbol=symbol, increment=data['quantityIncrement'],
+                      make_fee=data['provideLiquidityRate'], take_fee=data['takeLiquidityRate'])
+
     def _split_symbol(self, symbol):
         return symbol[:len(symbol)//2], symbol[len(symbol)//2:]
 
@@ -151,7 +213,7 @@ class HitBTCExchange(Exchange):
         market = self.markets.get(data['symbol'], None)
         if not market:
             market = self.to_market(data['symbol'])
-        created = dateutil.parser.parse(data['createdAt'])
+        created = parse_ns(data['createdAt'])
         order = Order(order_id=data['clientOrderId'], market=market, side=data['side'],
                       rate=data['price'], quantity=data['cumQuantity'], time=created)
         return order
@@ -159,7 +221,7 @@ class HitBTCExchange(Exchange):
     def _to_trade(self, data, market=None):
         if not market:
             market = self.to_market(data['symbol'])
-        time = dateutil.parser.parse(data['timestamp'])
+        time = parse_ns(data['timestamp'])
         order_id = data.get('clientOrderId', None)
         trade = Trade(trade_id=data['id'], order_id=order_id, market=market,
                       side=data['side'], rate=data['price'], quantity=data['quantity'], time=time)
@@ -168,7 +230,7 @@ class HitBTCExchange(Exchange):
     def _to_ticker(self, data, market=None):
         if not market:
             market = self.to_market(data['symbol'])
-        time = data['timestamp']
+        time = parse_ns(data['timestamp'])
         ticker = Ticker(market=market, ask=data['ask'], bid=data['bid'], low=data['low'], high=data['high'],
                         last=data['last'], base_volume=data['volume'], quote_volume=data['volumeQuote'], time=time)
         return ticker
@@ -176,34 +238,40 @@ class HitBTCExchange(Exchange):
     def _to_candle(self, data, market=None):
         if not market:
             market = self.to_market(data['symbol'])
-        time = dateutil.parser.parse(data['timestamp'])
+        time = parse_ns(data['timestamp'])
         candle = Candle(market=market, open=data['open'], high=data['min'], low=data['max'],
                         close=data['close'], volume=data['volume'], time=time)
         return candle
 
     # API Methods
     # Market
+    @api_call
     def _currencies(self, currency=''):
         response = self.session.get(self.base_url + '/public/currency/' + currency)
         return response.status_code, response.json()
 
+    @api_call
     def _symbols(self, symbol=''):
         response = self.session.get(self.base_url + '/public/symbol/' + symbol)
         return response.status_code, response.json()
 
+    @api_call
     def _tickers(self, symbol=''):
         response = self.session.get(self.base_url + '/public/ticker/' + symbol)
         return response.status_code, response.json()
 
+    @api_call
     def _trades(self, symbol, sort=None, by=None, _from=None, till=None, limit=None, offset=None):
         payload = {k: v for (k, v) in locals().items() if v is not None and v != self and v != symbol}
         response = self.session.get(self.base_url + '/public/trades/' + symbol, params=payload)
         return response.status_code, response.json()
 
+    @api_call
     def _orderbook(self, symbol):
         response = self.session.get(self.base_url + '/public/orderbook/' + symbol)
         return response.status_code, response.json()
 
+    @api_call
     def _candles(self, symbol, limit=None, period=None):
         payload = {k: v for (k, v) in locals().items() if v is not None and v != self}
         if period and period not in ['M1', 'M3', 'M5', 'M15', 'M30', 'H1', 'H4', 'D1', 'D7', '1M']:
@@ -212,19 +280,23 @@ class HitBTCExchange(Exchange):
         return response.status_code, response.json()
 
     # Trading
+    @api_call
     def _trading_balance(self):
         response = self.session.get(self.base_url + '/trading/balance')
         return response.status_code, response.json()
 
+    @api_call
     def _trading_fee(self, symbol):
         response = self.session.get(self.base_url + '/trading/fee/' + symbol)
         return response.status_code, response.json()
 
+    @api_call
     def _orders_active(self, symbol=''):
         payload = {'symbol': symbol}
         response = self.session.get(self.base_url + '/order/', data=payload)
         return response.status_code, response.json()
 
+    @api_call
     def _order_active(self, order_id, wait=''):
         if wait:
             payload = {'wait': wait}
@@ -233,6 +305,7 @@ class HitBTCExchange(Exchange):
         response = self.session.get(self.base_url + '/order/' + order_id, params=payload)
         return response.status_code, response.json()
 
+    @api_call
     def _order_create(self, symbol, side, quantity, price, timeInForce=None,
                       type=None, stopPrice=None, expireTime=None, strictValidate=None):
         payload = {k: v for (k, v) in locals().items() if v is not None and v != self}
@@ -250,6 +323,14 @@ class HitBTCExchange(Exchange):
 
         return response.status_code, response.json()
 
+    @api_call
+    def _order_replace(self, clientOrderId, quantity=None, price=None, requestClientId=None):
+        payload = {'quantity': quantity, 'price': price, 'requestClientId': requestClientId or uuid.uuid4().hex}
+        payload = {k: v for (k, v) in payload.items() if v is not None}
+        response = self.session.patch(self.base_url + '/order/' + clientOrderId, data=payload)
+        return response.status_code, response.json()
+
+    @api_call
     def _orders_cancel(self, symbol=None):
         if symbol:
             payload = {'symbol': symbol}
@@ -258,11 +339,13 @@ class HitBTCExchange(Exchange):
         response = self.session.delete(self.base_url + '/order', data=payload)
         return response.status_code, response.json()
 
+    @api_call
     def _order_cancel(self, clientOrderId):
         response = self.session.delete(self.base_url + '/order/' + clientOrderId)
         return response.status_code, response.json()
 
     # History
+    @api_call
     def _history_orders(self, symbol=None, clientOrderId=None, _from=None, till=None, limit=None, offset=None):
         payload = {k: v for (k, v) in locals().items() if v is not None and v != self}
         if clientOrderId:
@@ -274,6 +357,7 @@ class HitBTCExchange(Exchange):
         response = self.session.get(self.base_url + '/history/order', data=payload)
         return response.status_code, response.json()
 
+    @api_call
     def _history_trades(self, symbol=None, sort=None, by=None, _from=None, till=None, limit=None, offset=None):
         payload = {k: v for (k, v) in locals().items() if v is not None and v != self}
         if _from:
@@ -282,6 +366,7 @@ class HitBTCExchange(Exchange):
         response = self.session.get(self.base_url + '/history/trades', data=payload)
         return response.status_code, response.json()
 
+    @api_call
     def _history_trade(self, orderId):
         response = self.session.get(self.base_url + '/history/order/' + orderId + '/trades')
         return response.status_code, response.json()
@@ -1,191 +1,256 @@
 import requests_mock
 import re
+import os
 import json
+import base64
 import random
-import string
-import datetime as dt
-import crypto.hitbtc.sample_responses as responses
-from urllib.parse import parse_qs
+import uuid
+from urllib.parse import parse_qs, urlparse
+from crypto.matching import MatchingEngine, Spec, Rejected, Latency, iso
+
+
+def number(value):
+    return '{:.10f}'.format(value).rstrip('0').rstrip('.') if value is not None else None
 
 
 class Mocker(object):
+    """
+    HitBTC API v2 on top of the matching engine. Accounts are keyed by the API key of the request, so several bots
+    trade against each other and the simulated market in the same books. Every ticker or order book request moves
+    its market one step.
+    """
     CURRENCIES = ['BTC', 'ETH', 'LTC', 'ETC']
     SYMBOLS = ['ETHBTC', 'LTCBTC', 'ETCBTC']
+    SPECS = [Spec('ETHBTC', 'ETH', 'BTC', 0.07, lot=0.001, tick=0.000001),
+             Spec('LTCBTC', 'LTC', 'BTC', 0.015, lot=0.001, tick=0.000001),
+             Spec('ETCBTC', 'ETC', 'BTC', 0.002, lot=0.001, tick=0.0000001)]
+    BALANCES = {'BTC': 10, 'ETH': 100, 'LTC': 500, 'ETC': 2000}
+
+    def __init__(self, seed=0, specs=None, balances=None):
+        self.latency = Latency()
+        self.reset(seed, specs or Mocker.SPECS, balances or Mocker.BALANCES)
+
+    def reset(self, seed=None, specs=None, balances=None):
+        # start over, optionally with other markets or starting balances (e.g. the synthetic markets of a load test)
+        if specs is not None or balances is not None:
+            self.specs = {s.symbol: s for s in specs or self.specs.values()}
+            self.engine = MatchingEngine(self.specs.values(), seed or 0, balances or self.engine.initial)
+        self.engine.reset(seed)
+        self.ids = random.Random(self.engine.seed)
+
+    @staticmethod
+    def params(request):
+        return {k: v[0] for k, v in parse_qs(request.body or '').items()}
 
-    def __init__(self):
-        self.active_orders = []
-        self.wallet = [self.random_balance(c) for c in Mocker.CURRENCIES]
-        self.values = {s: random.uniform(.0001, .9) for s in Mocker.SYMBOLS}
-        self.trades = {s: [] for s in Mocker.SYMBOLS}
+    @staticmethod
+    def account(request):
+        header = request.headers.get('Authorization', '')
+        if header.startswith('Basic '):
+            return base64.b64decode(header[6:]).decode().split(':')[0]
+        return 'anonymous'
+
+    @staticmethod
+    def path_id(request):
+        # requests_mock lowercases request.path
+        return urlparse(request.url).path.rstrip('/').split('/')[-1]
+
+    def path_symbol(self, request):
+        return self.path_id(request).upper()
 
     @staticmethod
-    def random_balance(currency):
-        return {"currency": currency, "available": random.uniform(0, 100), "reserved": random.uniform(0, 100)}
+    def error(context, e):
+        codes = {'Insufficient funds': 20001, 'Order not found': 20002}
+        context.status_code = 400
+        return json.dumps({"error": {"code": codes.get(str(e), 10001), "message": str(e)}})
+
+    def client_id(self):
+        return uuid.UUID(int=self.ids.getrandbits(128)).hex
+
+    # Market data
+    def ticker(self, request, context):
+        symbol = self.path_symbol(request)
+        if symbol in self.specs:
+            self.engine.step(symbol)
+            return json.dumps(self.to_ticker(symbol))
+        self.engine.step()
+        return json.dumps([self.to_ticker(s) for s in self.specs])
+
+    def orderbook(self, request, context):
+        symbol = self.path_symbol(request)
+        if symbol not in self.specs:
+            return self.error(context, 'Symbol not found')
+        self.engine.step(symbol)
+        asks, bids = self.engine.book(symbol, int(self.params(request).get('limit', 100)))
+        return json.dumps({"ask": [{"price": number(p), "size": number(s)} for p, s in asks],
+                           "bid": [{"price": number(p), "size": number(s)} for p, s in bids]})
+
+    def market_trades(self, request, context):
+        return json.dumps([{"id": i, "price": number(price), "quantity": number(quantity), "side": side,
+                            "timestamp": iso(time)} for i, side, price, quantity, time in
+                           self.engine.tape(self.path_symbol(request))])
+
+    def candles(self, request, context):
+        limit = int(request.qs.get('limit', [100])[0])
+        return json.dumps([{"timestamp": iso(t), "open": number(o), "close": number(c), "min": number(l),
+                            "max": number(h), "volume": number(v), "volumeQuote": number(v * c)}
+                           for t, o, h, l, c, v in self.engine.candles(self.path_symbol(request), limit)])
+
+    def symbol(self, request, context):
+        symbol = self.path_symbol(request)
+        if symbol in self.specs:
+            return json.dumps(self.to_symbol(symbol))
+        return json.dumps([self.to_symbol(s) for s in self.specs])
+
+    # Trading
+    def balances(self, request, context):
+        return json.dumps([{"currency": c, "available": number(a), "reserved": number(r)}
+                           for c, (a, r) in self.engine.balances(self.account(request)).items()])
 
     def orders(self, request, context):
-        for _ in range(random.randint(0, len(self.active_orders))):
-            # randomly turn 'complete' some orders and turn into trades
-            o = random.choice(self.active_orders)
-            self.active_orders.remove(o)
-            self.trades[o['symbol']].append(self.to_trade(o))
-            self.trades[o['symbol']] = self.trades[o['symbol']][-50:]
-        return json.dumps(self.active_orders)
+        symbol = self.params(request).get('symbol') or None
+        return json.dumps([self.to_order(o) for o in self.engine.open_orders(self.account(request), symbol)])
+
+    def active_order(self, request, context):
+        try:
+            order = self.engine.find(self.account(request), client_id=self.path_id(request))
+            return json.dumps(self.to_order(order))
+        except Rejected as e:
+            return self.error(context, e)
 
     def order(self, request, context):
+        params = self.params(request)
         try:
-            params = parse_qs(request._request.body)
-            response = {
-                "id": 0,
-                "clientOrderId": ''.join(random.choice(string.ascii_lowercase + string.digits) for _ in range(32)),
-                "symbol": params['symbol'][0],
-                "side": params['side'][0],
-                "status": "new",
-                "type": "limit",
-                "timeInForce": "GTC",
-                "quantity": params['quantity'][0],
-                "price": params['price'][0],
-                "cumQuantity": "0.000",
-                "createdAt": dt.datetime.utcnow().isoformat(),
-                "updatedAt": dt.datetime.utcnow().isoformat()
-            }
-            self.active_orders.append(response)
-            return json.dumps(response)
-        except:
-            return responses.bid_res
+            price = params.get('price') if params.get('type', 'limit') == 'limit' else None
+            order = self.engine.place(self.account(request), params['symbol'], params['side'], params['quantity'],
+                                      price, params.get('clientOrderId') or self.client_id())
+            return json.dumps(self.to_order(order))
+        except Rejected as e:
+            return self.error(context, e)
 
-    def balances(self, request, context):
-        for b in self.wallet:
-            b['available'] += random.uniform(-5, 5)
-            if b['available'] < 0:
-                b['available'] = 0
-        return json.dumps(self.wallet)
+    def replace(self, request, context):
+        params = self.params(request)
+        try:
+            order = self.engine.replace(self.account(request), client_id=self.path_id(request),
+                                        price=params.get('price'), quantity=params.get('quantity'),
+                                        new_client_id=params.get('requestClientId') or self.client_id())
+            return json.dumps(self.to_order(order))
+        except Rejected as e:
+            return self.error(context, e)
 
-    def orderbook(self, request, context):
+    def cancel_one(self, request, context):
         try:
-            symbol = request._request.url.split('/')[-1]
-            self.values[symbol] += random.uniform(-.00005, .00005)
-
-            if self.values[symbol] < .0001:
-                self.values[symbol] = random.uniform(.0001, .9)
-
-            response = {"ask": [], "bid": []}
-            ask = bid = self.values[symbol]
-            for _ in range(10):
-                ask += random.uniform(.00001, self.values[symbol]/100)
-                bid -= random.uniform(.00001, self.values[symbol]/100)
-                response['ask'].append({"price": ask, "size": random.uniform(.001, 100)})
-                response['bid'].append({"price": bid, "size": random.uniform(.001, 100)})
-            return json.dumps(response)
-        except:
-            return responses.bid_res
+            order = self.engine.cancel(self.account(request), client_id=self.path_id(request))
+            return json.dumps(self.to_order(order))
+        except Rejected as e:
+            return self.error(context, e)
 
-    def ticker(self, request, context):
-        symbol = request._request.url.split('/')[-1]
-        if symbol != 'ticker' and symbol != '':
-            self.values[symbol] += random.uniform(-.00005, .00005)
-            response = {
-                "ask": self.values[symbol] + random.uniform(.00001, self.values[symbol] / 100),
-                "bid": self.values[symbol] - random.uniform(.00001, self.values[symbol] / 100),
-                "last": self.values[symbol],
-                "open": "0.047800",
-                "low": "0.047052",
-                "high": "0.051679",
-                "volume": "36456.720",
-                "volumeQuote": "1782.625000",
-                "timestamp": dt.datetime.utcnow().isoformat(),
-                "symbol": symbol
-            }
-            return json.dumps(response)
-        else:
-            responses = []
-            for symbol in Mocker.SYMBOLS:
-                self.values[symbol] += random.uniform(-.00005, .00005)
-                response = {
-                    "ask": self.values[symbol] + random.uniform(.00001, self.values[symbol]/100),
-                    "bid": self.values[symbol] - random.uniform(.00001, self.values[symbol]/100),
-                    "last": self.values[symbol],
-                    "open": "0.047800",
-                    "low": "0.047052",
-                    "high": "0.051679",
-                    "volume": "36456.720",
-                    "volumeQuote": "1782.625000",
-                    "timestamp": dt.datetime.utcnow().isoformat(),
-                    "symbol": symbol
-                }
-                responses.append(response)
-            return json.dumps(responses)
+    def cancel(self, request, context):
+        symbol = self.params(request).get('symbol')
+        return json.dumps([self.to_order(o) for o in self.engine.cancel_all(self.account(request), symbol)])
 
     def trade_history(self, request, context):
-        params = parse_qs(request._request.body)
-        response = self.trades[params['symbol'][0]]
-        return json.dumps(response)
+        symbol = self.params(request).get('symbol')
+        fills = self.engine.fills(self.account(request), symbol)
+        return json.dumps([self.to_trade(f) for f in reversed(fills)])
 
-    def to_trade(self, order):
+    # Responses
+    def to_ticker(self, symbol):
+        t = self.engine.ticker(symbol)
         return {
-            "id": 9535486,
-            "clientOrderId": order['clientOrderId'],
-            "orderId": random.randint(1, 999999),
-            "symbol": order['symbol'],
-            "side": order['side'],
-            "quantity": order['quantity'],
-            "price": order['price'],
-            "fee": "0.000002775",
-            "timestamp": dt.datetime.utcnow().isoformat()
+            "ask": number(t['ask']),
+            "bid": number(t['bid']),
+            "last": number(t['last']),
+            "open": number(self.specs[symbol].price),
+            "low": number(t['low']),
+            "high": number(t['high']),
+            "volume": number(t['volume']),
+            "volumeQuote": number(t['quote_volume']),
+            "timestamp": iso(t['time']),
+            "symbol": symbol
         }
 
-    def cancel(self, request, context):
-        params = parse_qs(request._request.body)
-        if params:
-            self.active_orders = [o for o in self.active_orders if o['symbol'] != params['symbol'][0]]
-        else:
-            self.active_orders = []
-        return "[]"
+    @staticmethod
+    def to_order(order):
+        return {
+            "id": order.id,
+            "clientOrderId": order.client_id,
+            "symbol": order.symbol,
+            "side": order.side,
+            "status": order.status,
+            "type": order.type,
+            "timeInForce": "GTC" if order.type == 'limit' else "IOC",
+            "quantity": number(order.quantity),
+            "price": number(order.price),
+            "cumQuantity": number(order.filled),
+            "createdAt": iso(order.created),
+            "updatedAt": iso(order.updated)
+        }
 
-    def symbol(self, request, context):
-        symbol = request._request.url.split('/')[-1]
-        if symbol != 'symbol' and symbol != '':
-            response = {
-                "quoteCurrency": symbol[len(symbol)//2:],
-                "baseCurrency": symbol[:len(symbol)//2],
-                "quantityIncrement": .001,
-                "provideLiquidityRate": 0,
-                "takeLiquidityRate": 0
-            }
-            return json.dumps(response)
+    @staticmethod
+    def to_trade(fill):
+        return {
+            "id": fill.id,
+            "clientOrderId": fill.order.client_id,
+            "orderId": fill.order.id,
+            "symbol": fill.symbol,
+            "side": fill.side,
+            "quantity": number(fill.quantity),
+            "price": number(fill.price),
+            "fee": number(fill.fee),
+            "timestamp": iso(fill.time)
+        }
+
+    def to_symbol(self, symbol):
+        spec = self.specs[symbol]
+        return {
+            "id": symbol,
+            "baseCurrency": spec.base,
+            "quoteCurrency": spec.quote,
+            "quantityIncrement": spec.lot,
+            "tickSize": spec.tick,
+            "provideLiquidityRate": spec.maker_fee,
+            "takeLiquidityRate": spec.taker_fee
+        }
 
 
 mock_adapter = requests_mock.Adapter()
-mocker = Mocker()
+mocker = Mocker(int(os.environ.get('MOCK_SEED', 0)))
 
 matcher = re.compile('/public/ticker')
-mock_adapter.register_uri('GET', matcher, text=mocker.ticker)
+mock_adapter.register_uri('GET', matcher, text=mocker.latency.wrap(mocker.ticker))
 
 matcher = re.compile('/public/trades')
-mock_adapter.register_uri('GET', matcher, text=responses.market_trades_res)
+mock_adapter.register_uri('GET', matcher, text=mocker.latency.wrap(mocker.market_trades))
 
 matcher = re.compile('/public/orderbook')
-mock_adapter.register_uri('GET', matcher, text=mocker.orderbook)
+mock_adapter.register_uri('GET', matcher, text=mocker.latency.wrap(mocker.orderbook))
+
+matcher = re.compile('/public/candles')
+mock_adapter.register_uri('GET', matcher, text=mocker.latency.wrap(mocker.candles))
 
 matcher = re.compile('/trading/balance')
-mock_adapter.register_uri('GET', matcher, text=mocker.balances)
+mock_adapter.register_uri('GET', matcher, text=mocker.latency.wrap(mocker.balances))
 
 matcher = re.compile('/history/trades')
-mock_adapter.register_uri('GET', matcher, text=mocker.trade_history)
+mock_adapter.register_uri('GET', matcher, text=mocker.latency.wrap(mocker.trade_history))
 
 matcher = re.compile('/symbol')
-mock_adapter.register_uri('GET', matcher, text=mocker.symbol)
-
-# matcher = re.compile('/trading/balance')
-# mock_adapter.register_uri('GET', matcher, text=responses.error_res, status_code=400)
+mock_adapter.register_uri('GET', matcher, text=mocker.latency.wrap(mocker.symbol))
 
 matcher = re.compile('/order/$')
-mock_adapter.register_uri('GET', matcher, text=mocker.orders)
+mock_adapter.register_uri('GET', matcher, text=mocker.latency.wrap(mocker.orders))
+
+matcher = re.compile('/order/.{10,}')
+mock_adapter.register_uri('GET', matcher, text=mocker.latency.wrap(mocker.active_order))
 
 matcher = re.compile('/order')
-mock_adapter.register_uri('POST', matcher, text=mocker.order)
+mock_adapter.register_uri('POST', matcher, text=mocker.latency.wrap(mocker.order))
 
 matcher = re.compile('/order/.{10,}')
-mock_adapter.register_uri('DELETE', matcher, text=responses.cancel_one_res)
+mock_adapter.register_uri('DELETE', matcher, text=mocker.latency.wrap(mocker.cancel_one))
 
 matcher = re.compile('/order$')
-mock_adapter.register_uri('DELETE', matcher, text=mocker.cancel)
+mock_adapter.register_uri('DELETE', matcher, text=mocker.latency.wrap(mocker.cancel))
+
+matcher = re.compile('/order/.{10,}')
+mock_adapter.register_uri('PATCH', matcher, text=mocker.latency.wrap(mocker.replace))
@@ -186,4 +186,108 @@ orderbook_res = """{
       "size": "0.200"
     }
   ]
-    }"""
\ No newline at end of file
+    }"""
+
+# websocket notifications
+ws_snapshot_orderbook_res = """{
+  "jsonrpc": "2.0",
+  "method": "snapshotOrderbook",
+  "params": {
+    "ask": [
+      {
+        "price": "0.054588",
+        "size": "0.245"
+      },
+      {
+        "price": "0.054590",
+        "size": "1.000"
+      },
+      {
+        "price": "0.054591",
+        "size": "2.784"
+      }
+    ],
+    "bid": [
+      {
+        "price": "0.054558",
+        "size": "0.500"
+      },
+      {
+        "price": "0.054557",
+        "size": "0.076"
+      },
+      {
+        "price": "0.054524",
+        "size": "7.725"
+      }
+    ],
+    "symbol": "ETHBTC",
+    "sequence": 8073827
+  }
+}"""
+
+ws_update_orderbook_res = """{
+  "jsonrpc": "2.0",
+  "method": "updateOrderbook",
+  "params": {
+    "ask": [
+      {
+        "price": "0.054588",
+        "size": "0.000"
+      },
+      {
+        "price": "0.054589",
+        "size": "0.150"
+      }
+    ],
+    "bid": [
+      {
+        "price": "0.054559",
+        "size": "0.300"
+      }
+    ],
+    "symbol": "ETHBTC",
+    "sequence": 8073828
+  }
+}"""
+
+ws_ticker_res = """{
+  "jsonrpc": "2.0",
+  "method": "ticker",
+  "params": {
+    "ask": "0.054464",
+    "bid": "0.054463",
+    "last": "0.054463",
+    "open": "0.057133",
+    "low": "0.053615",
+    "high": "0.057559",
+    "volume": "33068.346",
+    "volumeQuote": "1832.687530809",
+    "timestamp": "2017-10-19T15:45:44.941Z",
+    "symbol": "ETHBTC"
+  }
+}"""
+
+ws_snapshot_trades_res = """{
+  "jsonrpc": "2.0",
+  "method": "snapshotTrades",
+  "params": {
+    "data": [
+      {
+        "id": 54469456,
+        "price": "0.054656",
+        "quantity": "0.057",
+        "side": "buy",
+        "timestamp": "2017-10-19T16:33:42.821Z"
+      },
+      {
+        "id": 54469497,
+        "price": "0.054656",
+        "quantity": "0.092",
+        "side": "buy",
+        "timestamp": "2017-10-19T16:33:48.754Z"
+      }
+    ],
+    "symbol": "ETHBTC"
+  }
+}"""
@@ -0,0 +1,155 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+import websocket
+from crypto.book import LevelBook
+
+
+class HitBTCStream(object):
+    """
+    Keeps order books, tickers and public trades for a set of symbols up to date from the HitBTC websocket feed.
+    Readers get None whenever a symbol is not in sync (not connected yet, sequence gap, stale) and should fall back
+    to the REST API.
+    """
+    def __init__(self, url, symbols, max_age=30, reconnect_delay=1):
+        self.url = url
+        self.symbols = symbols
+        self.max_age = max_age  # seconds without a message on a channel before it counts as stale for a symbol
+        self.reconnect_delay = reconnect_delay
+        self.books = {s: LevelBook() for s in symbols}
+        self.sequences = {s: None for s in symbols}
+        self.tickers = {s: None for s in symbols}
+        self.trades = {s: deque(maxlen=100) for s in symbols}
+        self.updated = {}  # (channel, symbol) -> time of the last message
+        self.ws = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._request_id = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='hitbtc-stream')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.ws:
+            self.ws.close()
+        if self._thread:
+            self._thread.join(5)
+
+    def wait_ready(self, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if all(self.sequences[s] is not None for s in self.symbols):
+                return True
+            time.sleep(.01)
+        return False
+
+    # Readers
+    def order_book(self, symbol, depth=10):
+        with self._lock:
+            if not self._fresh('book', symbol) or self.sequences[symbol] is None:
+                return None
+            return self.books[symbol].snapshot(depth)
+
+    def ticker(self, symbol):
+        with self._lock:
+            if not self._fresh('ticker', symbol):
+                return None
+            return self.tickers[symbol]
+
+    def public_trades(self, symbol):
+        with self._lock:
+            if not self._fresh('trades', symbol):
+                return None
+            return list(self.trades[symbol])
+
+    def _fresh(self, channel, symbol):
+        return time.time() - self.updated.get((channel, symbol), 0) < self.max_age
+
+    # Connection
+    def _run(self):
+        while not self._stop.is_set():
+            self.ws = websocket.WebSocketApp(self.url, on_open=self._on_open, on_message=self._on_message,
+                                             on_error=self._on_error)
+            self.ws.run_forever()
+            self._reset()
+            if not self._stop.is_set():
+                logging.info("HitBTC stream disconnected, reconnecting")
+                time.sleep(self.reconnect_delay)
+
+    def _on_open(self, ws):
+        for symbol in self.symbols:
+            self._subscribe(symbol)
+
+    def _on_message(self, ws, message):
+        try:
+            self.handle(message)
+        except Exception as e:
+            logging.exception("Error handling stream message")
+
+    def _on_error(self, ws, error):
+        logging.warning("HitBTC stream error: {}".format(error))
+
+    def _subscribe(self, symbol, channels=('Orderbook', 'Trades', 'Ticker')):
+        for channel in channels:
+            self._request_id += 1
+            self.ws.send(json.dumps({'method': 'subscribe' + channel, 'params': {'symbol': symbol},
+                                     'id': self._request_id}))
+
+    def _reset(self):
+        with self._lock:
+            for s in self.symbols:
+                self.books[s].clear()
+                self.sequences[s] = None
+            self.updated.clear()
+
+    # Message handling
+    def handle(self, message):
+        msg = json.loads(message)
+        method = msg.get('method')
+        if method is None:
+            if 'error' in msg:
+                logging.warning("HitBTC stream request failed: {}".format(msg['error'].get('message')))
+            return  # subscription acknowledgement
+        params = msg['params']
+        symbol = params['symbol']
+        if symbol not in self.books:
+            return
+        with self._lock:
+            if method == 'snapshotOrderbook':
+                self._apply_book(symbol, params, snapshot=True)
+                channel = 'book'
+            elif method == 'updateOrderbook':
+                if self.sequences[symbol] is None:
+                    return  # waiting for a snapshot
+                if params['sequence'] != self.sequences[symbol] + 1:
+                    logging.info("Sequence gap in {} order book, resubscribing".format(symbol))
+                    self.sequences[symbol] = None
+                    self._subscribe(symbol, channels=('Orderbook',))
+                    return
+                self._apply_book(symbol, params)
+                channel = 'book'
+            elif method == 'ticker':
+                self.tickers[symbol] = params
+                channel = 'ticker'
+            elif method in ('snapshotTrades', 'updateTrades'):
+                self.trades[symbol].extend(params['data'])
+                channel = 'trades'
+            else:
+                return
+            self.updated[(channel, symbol)] = time.time()
+
+    def _apply_book(self, symbol, params, snapshot=False):
+        book = self.books[symbol]
+        if snapshot:
+            book.clear()
+        for d in params['ask']:
+            book.asks.set(float(d['price']), float(d['size']))
+        for d in params['bid']:
+            book.bids.set(float(d['price']), float(d['size']))
+        self.sequences[symbol] = params['sequence']
@@ -0,0 +1,270 @@
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import resource
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from crypto.matching import Spec
+from crypto.metrics import ThreadingHTTPServer, registry
+from crypto.telemetry import Publisher
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {'count': 0}
+
+    def at(q):
+        return samples[min(len(samples) - 1, int(math.ceil(q * len(samples))) - 1)]
+    return {'count': len(samples), 'mean': sum(samples) / len(samples), 'p50': at(0.5), 'p90': at(0.9),
+            'p99': at(0.99), 'max': samples[-1]}
+
+
+def rss():
+    # resident set size in bytes; the peak instead where /proc is not available
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Sink(object):
+    """
+    Local stand-in for the node backend: accepts the Publisher's POSTs and counts messages, batches and bytes.
+    """
+    def __init__(self, host='127.0.0.1', port=0):
+        self.messages = {}  # type -> count
+        self.batches = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                sink.receive(body)
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.url = 'http://{}:{}/update'.format(host, self.server.server_address[1])
+        self._thread = threading.Thread(target=self.server.serve_forever, name='sink')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def receive(self, body):
+        msg = json.loads(body.decode())
+        batch = msg['data'] if msg['type'] == 'batch' else [msg]
+        with self._lock:
+            self.batches += 1
+            self.bytes += len(body)
+            for m in batch:
+                self.messages[m['type']] = self.messages.get(m['type'], 0) + 1
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self):
+        with self._lock:
+            return {'messages': sum(self.messages.values()), 'batches': self.batches, 'bytes': self.bytes,
+                    'types': dict(sorted(self.messages.items()))}
+
+
+def hitbtc_markets(bots, markets, seed):
+    # synthetic spot markets quoted in BTC at prices spread over a few orders of magnitude
+    rng = random.Random(seed)
+    specs = []
+    for i in range(bots * markets):
+        price = round(10 ** rng.uniform(-4, -1), 8)
+        tick = 10 ** (math.floor(math.log10(price)) - 4)
+        specs.append(Spec('S{:03d}BTC'.format(i), 'S{:03d}'.format(i), 'BTC', price, lot=0.01, tick=tick))
+    balances = dict({s.base: 1e6 for s in specs}, BTC=1e4)
+    return specs, balances
+
+
+def bitmex_markets(bots, markets, seed):
+    # synthetic inverse contracts settled in XBT
+    rng = random.Random(seed)
+    specs = []
+    for i in range(bots * markets):
+        price = round(rng.uniform(1000, 20000) * 2) / 2
+        specs.append(Spec('S{:03d}USD'.format(i), 'XBT', 'USD', price, lot=1, tick=0.5, size=1000,
+                          maker_fee=-0.00025, taker_fee=0.00075, spread=0.0002, inverse=True))
+    return specs, {'XBT': 100.0}
+
+
+EXCHANGES = {
+    'hitbtc': ('crypto.hitbtc.mock', 'HitBTCExchange', 'https://api.hitbtc.com/api/2', hitbtc_markets),
+    'bitmex': ('crypto.bitmex.mock', 'BitMEXExchange', 'https://www.bitmex.com/api/v1', bitmex_markets),
+}
+
+
+class LoadTest(object):
+    """
+    Runs several TradingBots with BasicStrategy side by side against the matching engine mock of an exchange, every
+    bot on its own account and its own synthetic markets, with the given latency added to every mock response. The
+    bots publish to a local Sink instead of the node backend. Measures how long every strategy loop takes, the API
+    request rate and how the process' memory grows.
+    """
+    def __init__(self, bots=2, markets=5, latency=0.0, jitter=0.0, duration=30, exchange='hitbtc', seed=0,
+                 interval=2.0, spread=0.002):
+        self.bots = bots
+        self.markets = markets
+        self.latency = latency
+        self.jitter = jitter
+        self.duration = duration
+        self.exchange = exchange
+        self.seed = seed
+        self.interval = interval
+        self.spread = spread
+
+    def config(self):
+        return {'bots': self.bots, 'markets': self.markets, 'latency': self.latency, 'jitter': self.jitter,
+                'duration': self.duration, 'exchange': self.exchange, 'seed': self.seed, 'interval': self.interval,
+                'spread': self.spread}
+
+    def run(self):
+        # bots have to be built on the main thread (TradingBot installs a SIGINT handler); returns the report
+        from crypto.engine import TradingBot
+        from crypto.helpers import str_to_class
+        from crypto.strategies.basic import BasicStrategy
+        module, wrapper, base_url, synthetic = EXCHANGES[self.exchange]
+        mocker = __import__(module, fromlist=['mocker']).mocker
+        specs, balances = synthetic(self.bots, self.markets, self.seed)
+        symbols = [s.symbol for s in specs]
+        previous = (mocker.engine.seed, list(mocker.specs.values()), mocker.engine.initial)
+        cache = tempfile.TemporaryDirectory()  # keep the synthetic markets out of the real metadata cache
+        mocker.reset(self.seed, specs, balances)
+        mocker.latency.seconds, mocker.latency.jitter = self.latency, self.jitter
+        sink = Sink()
+        bots = []
+        try:
+            for i in range(self.bots):
+                mine = symbols[i * self.markets:(i + 1) * self.markets]
+                exchange = str_to_class(wrapper)(base_url, 'bot{}'.format(i), 'secret', mine, True,
+                                                 cache_dir=cache.name)
+                strategy = BasicStrategy(exchange, {s: [str(self.spread)] for s in mine})
+                bot = TradingBot('loadtest{}'.format(i), exchange, strategy, publisher=Publisher(sink.url, 'loadtest'),
+                                 intervals={'strategy': self.interval})
+                bots.append(bot)
+            return self.measure(bots, sink)
+        finally:
+            for bot in bots:
+                bot.publisher.close()
+            sink.close()
+            mocker.latency.seconds, mocker.latency.jitter = 0.0, 0.0
+            mocker.reset(*previous)
+            cache.cleanup()
+
+    def measure(self, bots, sink):
+        loops = [[] for _ in bots]
+        failures = []
+        for bot, samples in zip(bots, loops):
+            bot.execute_strategy = self.timed(bot.execute_strategy, samples)
+        memory = []
+        registry.reset()
+        stop = threading.Event()
+        threads = [threading.Thread(target=self.work, args=(bot, failures), name=bot.name) for bot in bots]
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        while not stop.wait(max(0.0, start + len(memory) - time.time())):
+            memory.append(rss())
+            if time.time() - start >= self.duration:
+                stop.set()
+        for bot in bots:
+            bot.turn_off.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - start
+        snapshot = registry.snapshot()
+        for bot in bots:
+            bot.publisher.close()
+        return self.report(bots, loops, failures, memory, elapsed, snapshot, sink)
+
+    @staticmethod
+    def timed(fn, samples):
+        def wrapper():
+            start = time.perf_counter()
+            try:
+                return fn()
+            finally:
+                samples.append(time.perf_counter() - start)
+        return wrapper
+
+    @staticmethod
+    def work(bot, failures):
+        try:
+            bot.work()
+        except Exception as e:
+            logging.exception("Error in load test bot {}".format(bot.name))
+            failures.append('{}: {}'.format(bot.name, e))
+
+    def report(self, bots, loops, failures, memory, elapsed, snapshot, sink):
+        requests = [s for s in snapshot if s['name'] == 'api_request_seconds']
+        endpoints = {}
+        for s in requests:
+            e = endpoints.setdefault(s['labels'].get('endpoint', ''), {'calls': 0, 'seconds': 0.0})
+            e['calls'] += s['count']
+            e['seconds'] += s['sum']
+        calls = sum(e['calls'] for e in endpoints.values())
+        errors = sum(s['value'] for s in snapshot if s['name'] == 'api_errors_total')
+        overruns = [bot.scheduler.stats()['strategy']['overruns'] for bot in bots if bot.scheduler]
+        quotes = {}
+        for bot in bots:
+            for k, v in bot.strategy.quotes.counts.items():
+                quotes[k] = quotes.get(k, 0) + v
+        return {
+            'config': self.config(),
+            'elapsed': elapsed,
+            'loop_seconds': percentiles([s for samples in loops for s in samples]),
+            'loop_seconds_per_bot': [percentiles(samples) for samples in loops],
+            'loop_overruns': sum(overruns),
+            'api': {'calls': calls, 'calls_per_second': calls / elapsed, 'errors': errors,
+                    'endpoints': {k: dict(v, mean=v['seconds'] / v['calls']) for k, v in sorted(endpoints.items())}},
+            'memory': {'start': memory[0], 'end': memory[-1], 'peak': max(memory), 'growth': memory[-1] - memory[0],
+                       'growth_per_minute': (memory[-1] - memory[0]) / max(elapsed, 1e-9) * 60},
+            'quotes': dict(sorted(quotes.items())),
+            'publisher': [bot.publisher.stats() for bot in bots],
+            'sink': sink.stats(),
+            'failures': failures,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test TradingBots against the mock exchange')
+    parser.add_argument('--bots', type=int, default=2)
+    parser.add_argument('--markets', type=int, default=5, help='synthetic markets per bot')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds added to every mock response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random extra latency, up to this many seconds')
+    parser.add_argument('--duration', type=float, default=60, help='seconds')
+    parser.add_argument('--exchange', default='hitbtc', choices=sorted(EXCHANGES))
+    parser.add_argument('--interval', type=float, default=2.0, help='seconds between strategy loops')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    test = LoadTest(args.bots, args.markets, args.latency, args.jitter, args.duration, args.exchange, args.seed,
+                    args.interval)
+    report = json.dumps(test.run(), indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,475 @@
+import collections
+import datetime
+import itertools
+import math
+import random
+import threading
+import time
+from crypto.book import BookSide
+
+OPEN = ('new', 'partiallyFilled')
+
+
+def iso(timestamp):
+    # exchange-style UTC timestamp with milliseconds
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+class Rejected(Exception):
+    pass
+
+
+class Latency(object):
+    # delay of every mock response, the simulated round trip to the exchange
+    def __init__(self, seconds=0.0, jitter=0.0):
+        self.seconds = seconds
+        self.jitter = jitter
+
+    def wrap(self, handler):
+        def respond(request, context):
+            delay = self.seconds + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+            if delay > 0:
+                time.sleep(delay)
+            return handler(request, context)
+        return respond
+
+
+class Spec(object):
+    """
+    A simulated market. Quantities are in the base currency and prices in the quote currency; an inverse market
+    (BitMEX's XBTUSD) trades contracts worth one unit of quote each, settled in base.
+    """
+    def __init__(self, symbol, base, quote, price, lot=0.001, tick=0.000001, size=None, maker_fee=-0.0001,
+                 taker_fee=0.001, volatility=0.0005, spread=0.001, inverse=False):
+        self.symbol = symbol
+        self.base = base
+        self.quote = quote
+        self.price = price  # starting fair price
+        self.lot = lot
+        self.tick = tick
+        self.size = size or lot * 100  # typical size of the simulated market's orders
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        self.volatility = volatility  # stdev of the fair price's log return per step
+        self.spread = spread  # relative spread of the simulated liquidity
+        self.inverse = inverse
+
+
+class MatchOrder(object):
+    __slots__ = ('id', 'client_id', 'account', 'symbol', 'side', 'type', 'price', 'quantity', 'remaining', 'status',
+                 'created', 'updated', 'reserved')
+
+    def __init__(self, id, client_id, account, symbol, side, type, price, quantity, now):
+        self.id = id
+        self.client_id = client_id
+        self.account = account
+        self.symbol = symbol
+        self.side = side
+        self.type = type
+        self.price = price
+        self.quantity = quantity
+        self.remaining = quantity
+        self.status = 'new'
+        self.created = self.updated = now
+        self.reserved = 0.0  # funds still held for the unfilled part
+
+    @property
+    def filled(self):
+        return round(self.quantity - self.remaining, 10)
+
+
+class Fill(object):
+    __slots__ = ('id', 'order', 'symbol', 'side', 'price', 'quantity', 'fee', 'liquidity', 'time')
+
+    def __init__(self, id, order, price, quantity, fee, liquidity, time):
+        self.id = id
+        self.order = order
+        self.symbol = order.symbol
+        self.side = order.side
+        self.price = price
+        self.quantity = quantity
+        self.fee = fee
+        self.liquidity = liquidity  # 'maker' or 'taker'
+        self.time = time
+
+
+class QueueSide(BookSide):
+    # one side of a matching book: BookSide's levels and sizes plus the resting orders of every level in time
+    # priority. Cancelled orders are dropped from their queue lazily, a level goes when its last live order does.
+    def __init__(self, descending=False):
+        super().__init__(descending)
+        self.queues = {}  # price -> deque of orders
+        self.live = {}  # price -> number of open orders
+
+    def add(self, order):
+        queue = self.queues.get(order.price)
+        if queue is None:
+            queue = self.queues[order.price] = collections.deque()
+            self.live[order.price] = 0
+        queue.append(order)
+        self.live[order.price] += 1
+        self.set(order.price, round(self.sizes.get(order.price, 0.0) + order.remaining, 10))
+
+    def reduce(self, order, quantity, closed):
+        # quantity of a resting order traded or cancelled; closed when the order left the book
+        price = order.price
+        if closed:
+            self.live[price] -= 1
+            if not self.live[price]:
+                self.remove(price)
+                del self.queues[price], self.live[price]
+                return
+            queue = self.queues[price]
+            if len(queue) > 2 * self.live[price] + 16:
+                self.queues[price] = collections.deque(o for o in queue if o.status in OPEN)
+        self.sizes[price] = round(self.sizes[price] - quantity, 10)
+
+    def head(self):
+        # oldest open order at the best price
+        queue = self.queues[self.best_price()]
+        while queue[0].status not in OPEN:
+            queue.popleft()
+        return queue[0]
+
+
+class Account(object):
+    def __init__(self, name, balances):
+        self.name = name
+        self.available = collections.defaultdict(float, balances)
+        self.reserved = collections.defaultdict(float)
+        self.open = collections.defaultdict(dict)  # symbol -> {order id: order}, oldest first
+        self.closed = collections.defaultdict(lambda: collections.deque(maxlen=1000))  # symbol -> filled/cancelled
+        self.fills = collections.defaultdict(lambda: collections.deque(maxlen=1000))  # symbol -> Fill
+        self.positions = collections.defaultdict(lambda: [0.0, 0.0, 0.0])  # symbol -> [contracts, value, realised]
+
+    def balances(self):
+        currencies = sorted(set(self.available) | set(self.reserved))
+        return {c: (round(self.available[c], 10) + 0.0, round(self.reserved[c], 10) + 0.0) for c in currencies}
+
+
+class MarketState(object):
+    def __init__(self, spec, seed):
+        self.spec = spec
+        self.rng = random.Random('{}:{}'.format(seed, spec.symbol))
+        self.fair = spec.price
+        self.asks = QueueSide()
+        self.bids = QueueSide(descending=True)
+        self.liquidity = []  # the simulated market's resting orders
+        self.tape = collections.deque(maxlen=100)  # public trades, newest last
+        self.candles = collections.OrderedDict()  # minute -> [open, high, low, close, volume]
+        self.last = spec.price
+        self.low = self.high = spec.price
+        self.volume = self.quote_volume = 0.0
+        self.steps = 0
+
+    def side(self, side):
+        return self.bids if side == 'buy' else self.asks
+
+
+class MatchingEngine(object):
+    """
+    Price-time priority matching for the mock exchanges. Every market has a book of resting orders per price level
+    in arrival order; an incoming order trades against the best opposite level first and the oldest order in it,
+    rests for the remainder (limit) or is cancelled (market), and pays the taker fee while the resting side pays the
+    maker fee. Accounts are created on first use with `balances`, and funds for open orders are reserved so a spot
+    account cannot spend what it does not have. Inverse markets track a position and realised PnL instead.
+
+    The rest of the market is simulated from a random generator per market seeded with `seed`: each step() moves the
+    fair price, re-quotes `depth` levels of liquidity around it and sends a few market orders, which fill whatever
+    resting orders they cross. The same seed and the same sequence of calls give the same fills.
+    """
+    MARKET = '_market'  # account of the simulated liquidity; its balances are not tracked
+
+    def __init__(self, specs, seed=0, balances=None, clock=time.time, depth=10):
+        self.specs = {s.symbol: s for s in specs}
+        self.initial = dict(balances or {})
+        self.clock = clock
+        self.depth = depth
+        self.lock = threading.RLock()
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        with self.lock:
+            self.seed = self.seed if seed is None else seed
+            self.markets = {s: MarketState(spec, self.seed) for s, spec in self.specs.items()}
+            self.accounts = {}
+            self.orders = {}  # id -> open order
+            self.clients = {}  # client order id -> open order
+            self.ids = itertools.count(1)
+            self.trade_ids = itertools.count(1)  # public trades on the tape
+            self.fill_ids = itertools.count(1)  # the accounts' own fills, one per side of a trade
+
+    # Accounts
+    def account(self, name):
+        account = self.accounts.get(name)
+        if account is None:
+            account = self.accounts[name] = Account(name, self.initial)
+        return account
+
+    def balances(self, account):
+        with self.lock:
+            return self.account(account).balances()
+
+    def open_orders(self, account, symbol=None):
+        with self.lock:
+            books = [self.account(account).open[symbol]] if symbol else self.account(account).open.values()
+            return sorted((o for book in books for o in book.values()), key=lambda o: o.id)
+
+    def closed_orders(self, account, symbol):
+        with self.lock:
+            return list(self.account(account).closed[symbol])
+
+    def fills(self, account, symbol):
+        with self.lock:
+            return list(self.account(account).fills[symbol])
+
+    def position(self, account, symbol):
+        # (contracts, average entry price, realised PnL) of an inverse market
+        with self.lock:
+            contracts, value, realised = self.account(account).positions[symbol]
+            return contracts, (abs(contracts / value) if value else None), realised
+
+    def find(self, account, order_id=None, client_id=None):
+        order = self.orders.get(order_id) if order_id is not None else self.clients.get(client_id)
+        if order is None or order.account != account:
+            raise Rejected('Order not found')
+        return order
+
+    # Trading
+    def place(self, account, symbol, side, quantity, price=None, client_id=None):
+        with self.lock:
+            market = self.markets.get(symbol)
+            if market is None:
+                raise Rejected('Unknown symbol {}'.format(symbol))
+            spec = market.spec
+            if side not in ('buy', 'sell'):
+                raise Rejected('Invalid side {}'.format(side))
+            quantity = float(quantity)
+            if quantity <= 0 or abs(quantity / spec.lot - round(quantity / spec.lot)) > 1e-6:
+                raise Rejected('Quantity should be a positive multiple of {}'.format(spec.lot))
+            if client_id is not None and client_id in self.clients:
+                raise Rejected('Duplicate clientOrderId')
+            type = 'market' if price is None else 'limit'
+            if price is None:
+                price = self.sweep_price(market, side, quantity)
+                if price is None:
+                    raise Rejected('No liquidity')
+            price = round(float(price), 10)
+            if price <= 0:
+                raise Rejected('Price should be positive')
+            order_id = next(self.ids)
+            order = MatchOrder(order_id, client_id, account, symbol, side, type, price, quantity, self.clock())
+            if account != self.MARKET:
+                self.reserve(self.account(account), spec, order)
+            self.match(market, order)
+            if order.remaining > 0:
+                if type == 'market':
+                    self.close(order, 'canceled')
+                else:
+                    self.rest(market, order)
+            return order
+
+    def cancel(self, account, order_id=None, client_id=None):
+        with self.lock:
+            order = self.find(account, order_id, client_id)
+            self.markets[order.symbol].side(order.side).reduce(order, order.remaining, True)
+            self.close(order, 'canceled')
+            return order
+
+    def cancel_all(self, account, symbol=None):
+        with self.lock:
+            return [self.cancel(account, order.id) for order in self.open_orders(account, symbol)]
+
+    def replace(self, account, order_id=None, client_id=None, price=None, quantity=None, new_client_id=None):
+        # cancel/replace: the new order keeps the side and whatever is not given, but not the time priority
+        with self.lock:
+            order = self.find(account, order_id, client_id)
+            quantity = order.remaining if quantity is None else quantity
+            price = order.price if price is None else price
+            self.cancel(account, order.id)
+            return self.place(account, order.symbol, order.side, quantity, price, new_client_id)
+
+    def reserve(self, account, spec, order):
+        if spec.inverse:
+            return
+        if order.side == 'buy':
+            currency, amount = spec.quote, order.quantity * order.price * (1 + max(spec.taker_fee, 0))
+        else:
+            currency, amount = spec.base, order.quantity
+        if account.available[currency] < amount - 1e-12:
+            raise Rejected('Insufficient funds')
+        account.available[currency] -= amount
+        account.reserved[currency] += amount
+        order.reserved = amount
+
+    def release(self, order, amount):
+        account = self.account(order.account)
+        spec = self.specs[order.symbol]
+        currency = spec.quote if order.side == 'buy' else spec.base
+        account.reserved[currency] -= amount
+        account.available[currency] += amount
+        order.reserved -= amount
+
+    def match(self, market, order):
+        opposite = market.asks if order.side == 'buy' else market.bids
+        crosses = (lambda p: p <= order.price) if order.side == 'buy' else (lambda p: p >= order.price)
+        while order.remaining > 0 and opposite.sizes and crosses(opposite.best_price()):
+            maker = opposite.head()
+            quantity = min(order.remaining, maker.remaining)
+            self.trade(market, maker, order, maker.price, quantity)
+            opposite.reduce(maker, quantity, maker.remaining <= 0)
+            if maker.remaining <= 0:
+                self.close(maker, 'filled')
+        if order.remaining <= 0:
+            self.close(order, 'filled')
+
+    def rest(self, market, order):
+        market.side(order.side).add(order)
+        self.orders[order.id] = order
+        if order.client_id is not None:
+            self.clients[order.client_id] = order
+        if order.account == self.MARKET:
+            market.liquidity.append(order)
+        else:
+            self.account(order.account).open[order.symbol][order.id] = order
+
+    def close(self, order, status):
+        order.status = status
+        order.updated = self.clock()
+        self.orders.pop(order.id, None)
+        if order.client_id is not None and self.clients.get(order.client_id) is order:
+            del self.clients[order.client_id]
+        if order.account != self.MARKET:
+            account = self.account(order.account)
+            account.open[order.symbol].pop(order.id, None)
+            account.closed[order.symbol].append(order)
+            if order.reserved:
+                self.release(order, order.reserved)
+
+    def trade(self, market, maker, taker, price, quantity):
+        now = self.clock()
+        for order, liquidity in ((maker, 'maker'), (taker, 'taker')):
+            before = order.remaining
+            order.remaining = round(order.remaining - quantity, 10)
+            order.updated = now
+            if order.remaining > 0:
+                order.status = 'partiallyFilled'
+            if order.account != self.MARKET:
+                self.settle(market.spec, order, price, quantity, before, liquidity, now)
+        market.last = price
+        market.low, market.high = min(market.low, price), max(market.high, price)
+        market.volume += quantity
+        market.quote_volume += quantity * price
+        market.tape.append((next(self.trade_ids), taker.side, price, quantity, now))
+        minute = int(now // 60) * 60
+        candle = market.candles.get(minute)
+        if candle is None:
+            market.candles[minute] = [price, price, price, price, quantity]
+            if len(market.candles) > 1000:
+                market.candles.popitem(last=False)
+        else:
+            candle[1], candle[2], candle[3] = max(candle[1], price), min(candle[2], price), price
+            candle[4] += quantity
+
+    def settle(self, spec, order, price, quantity, before, liquidity, now):
+        account = self.account(order.account)
+        rate = spec.maker_fee if liquidity == 'maker' else spec.taker_fee
+        if spec.inverse:
+            fee = quantity / price * rate
+            account.available[spec.base] -= fee
+            self.update_position(account, spec, order.side, quantity, price)
+        else:
+            held = order.reserved * quantity / before
+            account.reserved[spec.quote if order.side == 'buy' else spec.base] -= held
+            order.reserved -= held
+            notional = quantity * price
+            fee = notional * rate
+            if order.side == 'buy':
+                account.available[spec.quote] += held - notional - fee
+                account.available[spec.base] += quantity
+            else:
+                account.available[spec.quote] += notional - fee
+        account.fills[spec.symbol].append(Fill(next(self.fill_ids), order, price, quantity, fee, liquidity, now))
+
+    def update_position(self, account, spec, side, quantity, price):
+        # the position is [contracts, entry value, realised PnL]; the entry value is contracts / entry price, signed
+        # like the contracts, so abs(contracts / value) is the average entry price
+        position = account.positions[spec.symbol]
+        contracts, entry = position[0], position[1]
+        if contracts and (contracts > 0) != (side == 'buy'):
+            closing = min(quantity, abs(contracts))
+            pnl = closing * (entry / contracts - 1 / price)  # of a long; a short gains what a long would lose
+            pnl = pnl if contracts > 0 else -pnl
+            position[2] += pnl
+            account.available[spec.base] += pnl
+            reduced = math.copysign(closing, contracts)
+            entry -= entry / contracts * reduced
+            contracts = round(contracts - reduced, 10)
+            quantity = round(quantity - closing, 10)
+        if quantity > 0:
+            signed = quantity if side == 'buy' else -quantity
+            contracts = round(contracts + signed, 10)
+            entry += signed / price
+        position[0], position[1] = contracts, (entry if contracts else 0.0)
+
+    # Market data
+    def sweep_price(self, market, side, quantity):
+        # worst price a market order of this size would trade at
+        opposite = market.asks if side == 'buy' else market.bids
+        price = None
+        for price, size in opposite.levels():
+            quantity -= size
+            if quantity <= 0:
+                break
+        return price
+
+    def book(self, symbol, depth=10):
+        with self.lock:
+            market = self.markets[symbol]
+            return list(market.asks.levels(depth)), list(market.bids.levels(depth))
+
+    def ticker(self, symbol):
+        with self.lock:
+            market = self.markets[symbol]
+            return {'ask': market.asks.best_price(), 'bid': market.bids.best_price(), 'last': market.last,
+                    'low': market.low, 'high': market.high, 'volume': market.volume,
+                    'quote_volume': market.quote_volume, 'time': self.clock()}
+
+    def tape(self, symbol):
+        # public trades, newest first: (id, taker side, price, quantity, time)
+        with self.lock:
+            return list(reversed(self.markets[symbol].tape))
+
+    def candles(self, symbol, limit=100):
+        # one-minute candles, oldest first: (time, open, high, low, close, volume)
+        with self.lock:
+            candles = list(self.markets[symbol].candles.items())[-limit:]
+            return [(minute, o, h, l, c, v) for minute, (o, h, l, c, v) in candles]
+
+    # Simulated market
+    def step(self, symbol=None, steps=1):
+        with self.lock:
+            for market in ([self.markets[symbol]] if symbol else list(self.markets.values())):
+                for _ in range(steps):
+                    self.step_market(market)
+
+    def step_market(self, market):
+        spec, rng = market.spec, market.rng
+        market.steps += 1
+        market.fair *= math.exp(rng.gauss(0, spec.volatility))
+        for order in market.liquidity:
+            if order.status in OPEN:
+                market.side(order.side).reduce(order, order.remaining, True)
+                self.close(order, 'canceled')
+        market.liquidity = []
+        for level in range(self.depth):
+            offset = (level + 1) * spec.spread / 2
+            for side, price in (('sell', market.fair * (1 + offset)), ('buy', market.fair * (1 - offset))):
+                ticks = math.ceil(price / spec.tick) if side == 'sell' else math.floor(price / spec.tick)
+                size = max(round(rng.uniform(0.2, 2) * spec.size / spec.lot), 1) * spec.lot
+                self.place(self.MARKET, spec.symbol, side, round(size, 10), round(ticks * spec.tick, 10))
+        for _ in range(rng.randint(0, 2)):
+            side = rng.choice(('buy', 'sell'))
+            size = max(round(rng.uniform(0.1, 1) * spec.size / spec.lot), 1) * spec.lot
+            if (market.asks if side == 'buy' else market.bids).sizes:
+                self.place(self.MARKET, spec.symbol, side, round(size, 10))
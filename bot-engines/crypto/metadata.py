@@ -0,0 +1,90 @@
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from crypto.structs import Market
+
+CACHE_DIR = os.environ.get('MARKET_CACHE_DIR',
+                           os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'camelopardalis'))
+
+
+class MarketCache(object):
+    """
+    Market metadata of one exchange endpoint, fetched with one bulk request and kept in a JSON file so the next start
+    needs no request at all. Markets older than ttl seconds are still served while a background thread refreshes them;
+    the file is only trusted when its version and endpoint match and it has every symbol asked for. The file goes to
+    cache_dir, by default CACHE_DIR ($MARKET_CACHE_DIR or the user's cache directory).
+    """
+    VERSION = 1
+
+    def __init__(self, base_url, fetch=None, ttl=3600, path=None, cache_dir=None):
+        self.base_url = base_url
+        self.fetch = fetch  # () -> {symbol: Market} of every market on the exchange
+        self.ttl = ttl
+        self.path = path or os.path.join(cache_dir or CACHE_DIR,
+                                         'markets-{}.json'.format(re.sub(r'[^\w.-]+', '_', base_url)))
+        self.refresher = None
+
+    def load(self, symbols, on_refresh=None):
+        # markets of the given symbols; on_refresh(markets) is called from the refresh thread if a stale cache was used
+        markets, stale = self.cached(symbols)
+        if markets is None:
+            return self.select(self.refresh(), symbols)
+        if stale:
+            self.refresh_async(symbols, on_refresh)
+        return markets
+
+    def cached(self, symbols):
+        # (markets, stale), or (None, True) when the file can't answer for all symbols
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if data['version'] != self.VERSION or data['base_url'] != self.base_url:
+                return None, True
+            markets = {s: Market(**data['markets'][s]) for s in symbols}
+            return markets, time.time() - data['fetched_at'] > self.ttl
+        except (OSError, ValueError, KeyError, TypeError):
+            return None, True
+
+    def refresh(self):
+        return self.store(self.fetch())
+
+    def refresh_async(self, symbols, on_refresh=None):
+        if self.refresher and self.refresher.is_alive():
+            return
+
+        def run():
+            try:
+                markets = self.refresh()
+                if on_refresh:
+                    on_refresh(self.select(markets, symbols))
+            except Exception as e:
+                logging.exception("Error refreshing market metadata")
+        self.refresher = threading.Thread(target=run, name='market-metadata')
+        self.refresher.daemon = True
+        self.refresher.start()
+
+    def store(self, markets):
+        # written to a temporary file and renamed, so processes starting at the same time never read half a file
+        data = {'version': self.VERSION, 'base_url': self.base_url, 'fetched_at': time.time(),
+                'markets': {s: m.as_dict() for s, m in markets.items()}}
+        tmp = None
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(suffix='.tmp', prefix=os.path.basename(self.path) + '.',
+                                       dir=os.path.dirname(self.path))
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            logging.warning("Could not write market cache %s", self.path)
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+        return markets
+
+    @staticmethod
+    def select(markets, symbols):
+        return {s: markets[s] for s in symbols if s in markets}
@@ -0,0 +1,182 @@
+import bisect
+import functools
+import inspect
+import socketserver
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# histogram bucket upper bounds in seconds, from a cached order book read to a stalled request
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram(object):
+    __slots__ = ('counts', 'count', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        # upper bound of the bucket holding the q-th observation
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class Registry(object):
+    """
+    Latency histograms and counters of one process, keyed by name and labels. Recording is a dict lookup and a few
+    additions under a lock, cheap enough to wrap every API call and strategy step.
+    """
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            h = self.histograms.get(key)
+            if h is None:
+                h = self.histograms[key] = Histogram()
+            h.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        # list of series, the payload of the 'metrics' push type
+        series = []
+        with self._lock:
+            for (name, labels), h in sorted(self.histograms.items()):
+                cumulative, buckets = 0, []
+                for bound, n in zip(BUCKETS, h.counts):
+                    cumulative += n
+                    buckets.append([bound, cumulative])
+                series.append({'name': name, 'type': 'histogram', 'labels': dict(labels), 'count': h.count,
+                               'sum': h.sum, 'mean': h.sum / h.count if h.count else 0.0, 'p50': h.quantile(0.5),
+                               'p99': h.quantile(0.99), 'buckets': buckets})
+            for (name, labels), value in sorted(self.counters.items()):
+                series.append({'name': name, 'type': 'counter', 'labels': dict(labels), 'value': value})
+        return series
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+registry = Registry()
+
+
+def api_call(fn):
+    # times one exchange API method into api_request_seconds; an exception or an error status (the methods return
+    # (status, data)) also counts in api_errors_total
+    endpoint = fn.__name__
+
+    def record(self, start, result, failed):
+        labels = {'exchange': type(self).__name__, 'endpoint': endpoint}
+        registry.observe('api_request_seconds', time.perf_counter() - start, **labels)
+        if failed or (isinstance(result, tuple) and isinstance(result[0], int) and result[0] >= 400):
+            registry.inc('api_errors_total', **labels)
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(self, *args, **kwargs):
+            start, result, failed = time.perf_counter(), None, True
+            try:
+                result = await fn(self, *args, **kwargs)
+                failed = False
+                return result
+            finally:
+                record(self, start, result, failed)
+    else:
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            start, result, failed = time.perf_counter(), None, True
+            try:
+                result = fn(self, *args, **kwargs)
+                failed = False
+                return result
+            finally:
+                record(self, start, result, failed)
+    return wrapper
+
+
+def exposition(series):
+    # Prometheus text format
+    lines = []
+    typed = set()
+    for s in series:
+        name = s['name']
+        if name not in typed:
+            lines.append('# TYPE {} {}'.format(name, s['type']))
+            typed.add(name)
+        labels = sorted(s['labels'].items())
+        if s['type'] == 'histogram':
+            for bound, count in s['buckets']:
+                lines.append('{}_bucket{} {}'.format(name, _labels(labels + [('le', repr(bound))]), count))
+            lines.append('{}_bucket{} {}'.format(name, _labels(labels + [('le', '+Inf')]), s['count']))
+            lines.append('{}_sum{} {!r}'.format(name, _labels(labels), s['sum']))
+            lines.append('{}_count{} {}'.format(name, _labels(labels), s['count']))
+        else:
+            lines.append('{}{} {}'.format(name, _labels(labels), s['value']))
+    return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = [(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in labels]
+    return '{' + ','.join('{}="{}"'.format(k, v) for k, v in escaped) + '}'
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    # http.server only has one from Python 3.7 on
+    daemon_threads = True
+
+
+def serve(port, source=registry.snapshot, host='127.0.0.1'):
+    # GET /metrics on a daemon thread; source() gives the series to expose
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = exposition(source()).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    thread = threading.Thread(target=server.serve_forever, name='metrics')
+    thread.daemon = True
+    thread.start()
+    return server
@@ -0,0 +1,144 @@
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+
+class SamplingProfiler(object):
+    """
+    Statistical CPU profiler: a daemon thread records the stack of every other thread every `interval` seconds.
+    Nothing is hooked into the profiled code, so it can be switched on in a running bot at a cost of a few percent.
+    """
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = collections.Counter()  # (thread name, outermost frame, ..., innermost frame) -> samples
+        self.samples = 0
+        self.started = None
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started = time.time()
+        self._thread = threading.Thread(target=self._run, name='profiler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.time() - self.started
+        return self.stacks
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append('{} ({}:{})'.format(code.co_name, os.path.basename(code.co_filename),
+                                                     code.co_firstlineno))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        # one "frame;frame;frame count" line per stack, the input format of flamegraph.pl and speedscope
+        return ''.join('{} {}\n'.format(';'.join(stack), n) for stack, n in self.stacks.most_common())
+
+    def top(self, limit=15):
+        # functions by samples spent in them (self) and under them (total)
+        own, total = collections.Counter(), collections.Counter()
+        for stack, n in self.stacks.items():
+            if len(stack) > 1:
+                own[stack[-1]] += n
+            for frame in set(stack[1:]):
+                total[frame] += n
+        return {'self': own.most_common(limit), 'total': total.most_common(limit)}
+
+
+class Profiler(object):
+    """
+    Profiling session of a running bot, driven by 'profile' control messages: {"type": "profile", "data": "start"}
+    or {"type": "profile", "data": {"action": "start", "cpu": true, "memory": true, "interval": 0.005}}, then
+    "stop". Stopping writes the collapsed CPU stacks and the tracemalloc snapshot to `directory` and returns a
+    summary for the backend.
+    """
+    def __init__(self, name, directory='profiles'):
+        self.name = name
+        self.directory = directory
+        self.cpu = None
+        self.memory = None  # tracemalloc snapshot taken at start
+        self.started = None
+
+    @property
+    def running(self):
+        return self.started is not None
+
+    def handle(self, data):
+        options = data if isinstance(data, dict) else {'action': data}
+        action = options.get('action')
+        if action == 'start':
+            return self.start(cpu=options.get('cpu', True), memory=options.get('memory', True),
+                              interval=options.get('interval', 0.005))
+        elif action == 'stop':
+            return self.stop()
+        raise Exception('Unknown profile action {}'.format(action))
+
+    def start(self, cpu=True, memory=True, interval=0.005):
+        if self.running:
+            raise Exception('Profiler already running')
+        if cpu:
+            self.cpu = SamplingProfiler(interval)
+            self.cpu.start()
+        if memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(25)
+            self.memory = tracemalloc.take_snapshot()
+        self.started = time.time()
+        logging.info("Profiling started (cpu={}, memory={})".format(bool(cpu), bool(memory)))
+        return {'status': 'started', 'pid': os.getpid(), 'cpu': bool(cpu), 'memory': bool(memory)}
+
+    def stop(self, limit=15):
+        if not self.running:
+            raise Exception('Profiler not running')
+        os.makedirs(self.directory, exist_ok=True)
+        prefix = os.path.join(self.directory, '{}-{}-{}'.format(self.name, os.getpid(),
+                                                               time.strftime('%Y%m%d-%H%M%S')))
+        summary = {'status': 'stopped', 'pid': os.getpid(), 'seconds': time.time() - self.started, 'files': []}
+        if self.cpu:
+            self.cpu.stop()
+            with open(prefix + '-cpu.txt', 'w') as f:
+                f.write(self.cpu.collapsed())
+            summary['files'].append(prefix + '-cpu.txt')
+            summary['cpu'] = dict(self.cpu.top(limit), samples=self.cpu.samples)
+        if self.memory:
+            summary['files'].extend(self._dump_memory(prefix, limit, summary))
+        self.cpu = self.memory = self.started = None
+        logging.info("Profiling stopped, wrote {}".format(', '.join(summary['files'])))
+        return summary
+
+    def _dump_memory(self, prefix, limit, summary):
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        growth = snapshot.filter_traces(ignore).compare_to(self.memory.filter_traces(ignore), 'lineno')
+        snapshot.dump(prefix + '-memory.tracemalloc')  # tracemalloc.Snapshot.load() for further digging
+        with open(prefix + '-memory.txt', 'w') as f:
+            f.writelines(str(stat) + '\n' for stat in growth)
+        summary['memory'] = {
+            'current': current,
+            'peak': peak,
+            'growth': [{'where': str(stat.traceback[0]), 'size_diff': stat.size_diff, 'count_diff': stat.count_diff}
+                       for stat in growth[:limit]],
+        }
+        return [prefix + '-memory.tracemalloc', prefix + '-memory.txt']
@@ -0,0 +1,95 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from crypto.metrics import registry
+
+
+def retry_after(value, default=1.0):
+    # seconds to wait from a Retry-After header, either delay-seconds or an HTTP-date
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class RateLimiter(object):
+    """
+    Token bucket shared by every thread using one exchange instance. The bucket refills continuously and is
+    re-synchronised from the x-ratelimit-limit/remaining/reset headers of every response, so callers only block
+    once the exchange's budget is actually spent.
+    """
+    def __init__(self, limit=300, window=300):
+        self.capacity = float(limit)
+        self.rate = limit / float(window)  # tokens per second
+        self.tokens = float(limit)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def reserve(self, tokens=1):
+        # reserve tokens up front (the bucket may go negative) so concurrent callers queue up in order; returns how
+        # long the caller has to wait before sending, without sleeping, so coroutines can await it instead
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= tokens
+            wait = max(self.blocked_until - now, -self.tokens / self.rate if self.tokens < 0 else 0.0)
+            if wait > 0:
+                self.waits += 1
+                self.wait_total += wait
+                self.wait_max = max(self.wait_max, wait)
+        if wait > 0:
+            registry.observe('rate_limit_wait_seconds', wait)
+        return wait
+
+    def update(self, response):
+        headers = response.headers
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if response.status_code == 429:
+                self.blocked_until = now + retry_after(headers.get('retry-after'))
+                self.tokens = min(self.tokens, 0.0)
+            try:
+                limit = int(headers['x-ratelimit-limit'])
+                remaining = int(headers['x-ratelimit-remaining'])
+                reset = float(headers['x-ratelimit-reset'])
+            except (KeyError, ValueError):
+                return  # no rate limit information, keep the local estimate
+            self.capacity = float(limit)
+            # reset is the wall-clock time at which the bucket is full again
+            until_reset = reset - time.time()
+            if remaining < limit and until_reset > 0:
+                self.rate = (limit - remaining) / until_reset
+            self.tokens = min(self.tokens, float(remaining))
+
+    def stats(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                'tokens': self.tokens,
+                'capacity': self.capacity,
+                'rate': self.rate,
+                'waits': self.waits,
+                'wait_total': self.wait_total,
+                'wait_max': self.wait_max,
+            }
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
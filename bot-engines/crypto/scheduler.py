@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import math
+import time
+from crypto.metrics import registry as metrics
+
+
+class Task(object):
+    def __init__(self, name, fn, interval, align=None, offset=0.0):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.align = align  # e.g. 60: run on minute boundaries (plus offset) instead of whenever the bot started
+        self.offset = offset
+        self.next_run = None
+        self.runs = 0
+        self.overruns = 0
+        self.skipped = 0  # slots missed because the task or the ones before it ran long
+        self.last_duration = 0.0
+
+    def first_run(self, now):
+        if not self.align:
+            return now
+        return math.ceil((now - self.offset) / self.align) * self.align + self.offset
+
+    def as_dict(self):
+        return {'interval': self.interval, 'runs': self.runs, 'overruns': self.overruns, 'skipped': self.skipped,
+                'last_duration': self.last_duration, 'next_run': self.next_run}
+
+
+class Scheduler(object):
+    """
+    Runs tasks on their own cadences from one thread, or as coroutines on an event loop with run_async. A task is
+    due interval seconds after its previous slot, not after it last finished, so run time and sleep jitter don't
+    accumulate into drift. A task that takes longer than its interval, or starts more than an interval late, is an
+    overrun: it is logged and counted, and the slots it missed are skipped instead of being run back to back.
+    """
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.tasks = []
+
+    def add(self, name, fn, interval, align=None, offset=0.0):
+        task = Task(name, fn, interval, align, offset)
+        task.next_run = task.first_run(self.clock())
+        self.tasks.append(task)
+        return task
+
+    def due(self, now=None):
+        now = self.clock() if now is None else now
+        return sorted([t for t in self.tasks if t.next_run <= now], key=lambda t: t.next_run)
+
+    def run_pending(self):
+        # run every task that is due, earliest slot first; returns the tasks that ran
+        tasks = self.due()
+        for task in tasks:
+            self.run_task(task)
+        return tasks
+
+    def run_task(self, task):
+        start = self.clock()
+        try:
+            with metrics.timer('scheduler_task_seconds', task=task.name):
+                task.fn()
+        finally:
+            self.finished(task, start)
+
+    async def run_task_async(self, task):
+        # run_task for a task whose fn is a coroutine function
+        start = self.clock()
+        try:
+            with metrics.timer('scheduler_task_seconds', task=task.name):
+                await task.fn()
+        finally:
+            self.finished(task, start)
+
+    def finished(self, task, start):
+        # book keeping after a run: duration, overruns and the next slot
+        late = start - task.next_run
+        end = self.clock()
+        task.runs += 1
+        task.last_duration = end - start
+        slot = task.next_run + task.interval
+        if end > slot:
+            missed = int(math.ceil((end - slot) / task.interval))
+            slot += missed * task.interval
+            task.skipped += missed
+        if task.last_duration > task.interval or late > task.interval:
+            task.overruns += 1
+            metrics.inc('scheduler_overruns_total', task=task.name)
+            logging.warning("Task {} overran: started {:.3f}s late, took {:.3f}s, interval {}s".format(
+                task.name, late, task.last_duration, task.interval))
+        task.next_run = slot
+
+    def next_due(self):
+        return min(t.next_run for t in self.tasks) if self.tasks else None
+
+    def run(self, stop):
+        # run tasks until the stop event is set
+        while not stop.is_set():
+            self.run_pending()
+            if self.tasks:
+                stop.wait(max(self.next_due() - self.clock(), 0))
+            else:
+                stop.wait(1)
+
+    async def run_async(self, stop):
+        # run coroutine tasks until the asyncio.Event stop is set; every task waits for its own slots on the event
+        # loop, so a slow one only delays itself. The first task to raise stops the others and the error propagates
+        runners = [asyncio.ensure_future(self.every(task, stop)) for task in self.tasks]
+        try:
+            done, _ = await asyncio.wait(runners, return_when=asyncio.FIRST_EXCEPTION)
+            for runner in done:
+                runner.result()
+        finally:
+            for runner in runners:
+                runner.cancel()
+
+    async def every(self, task, stop):
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), max(task.next_run - self.clock(), 0))
+                return
+            except asyncio.TimeoutError:
+                pass
+            await self.run_task_async(task)
+
+    def stats(self):
+        return {t.name: t.as_dict() for t in self.tasks}
@@ -0,0 +1,153 @@
+import datetime
+import json
+from json.encoder import encode_basestring_ascii
+from crypto import structs
+from crypto.helpers import serialize_obj
+from crypto.timeparse import NS
+
+# field kinds of the records; each kind has a specialised encoder so a record is written by one compiled function
+# instead of a default() callback, a __dict__ copy and a second pass of the json encoder. 'float' fields are always
+# floats (the constructors cast them), 'number' fields may also be None or an int. 'epoch' fields are read from their
+# integer nanosecond slot (time -> time_ns) and written as epoch seconds.
+SCHEMA = {
+    structs.Order: dict(order_id='str', market='market', side='str', rate='float', quantity='float', time='epoch'),
+    structs.Trade: dict(trade_id='str', order_id='str', market='market', side='str', rate='float',
+                        quantity='float', time='epoch'),
+    structs.Ticker: dict(market='market', ask='float', bid='number', low='float', high='float', last='float',
+                         base_volume='float', quote_volume='float', time='epoch'),
+    structs.Balance: dict(available='float', reserved='float'),
+    structs.OrderBook: dict(asks='list', bids='list'),
+    structs.Entry: dict(rate='float', quantity='float'),
+    structs.Candle: dict(market='market', open='number', high='number', low='number', close='number',
+                         volume='number', time='epoch'),
+}
+
+NON_FINITE = {float('inf'): 'Infinity', float('-inf'): '-Infinity'}
+
+
+def number(x):
+    # float text exactly as the json module writes it; float fields can also hold None or an int (Candle.volume)
+    if type(x) is float:
+        return float.__repr__(x) if x - x == 0 else NON_FINITE.get(x, 'NaN')
+    return json.dumps(x)
+
+
+def epoch(ns):
+    return 'null' if ns is None else '"%d"' % (ns // NS)
+
+
+class Serializer(object):
+    """
+    JSON encoder for bot payloads. The first time a record type is seen an encoder is compiled from SCHEMA that
+    writes the record's JSON text directly; markets and timestamps, which repeat on every report, are encoded once and
+    cached. The output parses to the same value as json.dumps(payload, default=serialize_obj).
+    """
+    def __init__(self, time_cache=10000):
+        self.encoders = {
+            str: encode_basestring_ascii,
+            float: number,
+            int: int.__repr__,
+            bool: lambda v: 'true' if v else 'false',
+            type(None): lambda v: 'null',
+            dict: self._dict,
+            list: self._list,
+            tuple: self._list,
+            datetime.datetime: self._time,
+            datetime.date: self._time,
+            structs.Market: self._market,
+        }
+        self.markets = {}  # Market -> encoded key
+        self.times = {}  # datetime -> encoded epoch string
+        self.time_cache = time_cache
+
+    def dumps(self, obj):
+        return self.encode(obj).encode('ascii')
+
+    def encode(self, obj):
+        encoder = self.encoders.get(type(obj))
+        if encoder is None:
+            encoder = self._resolve(type(obj))
+        return encoder(obj)
+
+    def _resolve(self, cls):
+        if issubclass(cls, structs.Record):
+            encoder = self.compile(cls)
+        elif issubclass(cls, BaseException):
+            encoder = lambda v: encode_basestring_ascii(str(v))
+        elif issubclass(cls, float):
+            encoder = lambda v: number(float(v))  # e.g. numpy floats
+        elif issubclass(cls, int):
+            encoder = lambda v: int.__repr__(int(v))
+        else:
+            encoder = lambda v: json.dumps(v, default=serialize_obj, separators=(',', ':'))
+        self.encoders[cls] = encoder
+        return encoder
+
+    def compile(self, cls):
+        # e.g. for Entry:
+        #     def encode(o):
+        #         v0 = o.rate
+        #         v1 = o.quantity
+        #         if v0 - v0 == 0 and v1 - v1 == 0:
+        #             return '{"rate":%r,"quantity":%r}' % (v0, v1)
+        #         return '{"rate":%s,"quantity":%s}' % (number(v0), number(v1))
+        # floats are written with %r (their repr, as json does) unless one of them is NaN or infinite
+        kinds = SCHEMA.get(cls, {})
+        calls = {'str': 'enc_str', 'float': 'number', 'number': 'number', 'market': 'enc_market', 'time': 'enc_time',
+                 'epoch': 'epoch', 'list': 'enc_list', 'any': 'enc'}
+        lines = ['def encode(o):']
+        fast, slow, checks, fast_values, slow_values = [], [], [], [], []
+        for i, field in enumerate(cls._fields):
+            kind = kinds.get(field, 'any')
+            lines.append('    v{} = o.{}{}'.format(i, field, '_ns' if kind == 'epoch' else ''))
+            key = encode_basestring_ascii(field)
+            slow.append(key + ':%s')
+            slow_values.append('{}(v{})'.format(calls[kind], i))
+            if kind == 'float':
+                fast.append(key + ':%r')
+                fast_values.append('v{}'.format(i))
+                checks.append('v{0} - v{0} == 0'.format(i))
+            else:
+                fast.append(key + ':%s')
+                fast_values.append(slow_values[-1])
+        if checks:
+            lines.append('    if {}:'.format(' and '.join(checks)))
+            lines.append('        return {!r} % ({},)'.format('{' + ','.join(fast) + '}', ', '.join(fast_values)))
+        lines.append('    return {!r} % ({},)'.format('{' + ','.join(slow) + '}', ', '.join(slow_values)))
+        scope = {'enc_str': encode_basestring_ascii, 'number': number, 'epoch': epoch, 'enc_market': self._market,
+                 'enc_time': self._time, 'enc_list': self._list, 'enc': self.encode}
+        exec('\n'.join(lines) + '\n', scope)
+        return scope['encode']
+
+    def _dict(self, d):
+        return '{' + ','.join([self._key(k) + ':' + self.encode(v) for k, v in d.items()]) + '}'
+
+    def _list(self, items):
+        return '[' + ','.join(map(self.encode, items)) + ']'
+
+    def _key(self, k):
+        if type(k) is str:
+            return encode_basestring_ascii(k)
+        return '"' + json.dumps(k) + '"'  # numbers, booleans and None become strings, as in json
+
+    def _market(self, m):
+        key = self.markets.get(m)
+        if key is None:
+            key = self.markets[m] = encode_basestring_ascii(serialize_obj(m))
+        return key
+
+    def _time(self, t):
+        if not isinstance(t, (datetime.datetime, datetime.date)):
+            return self.encode(t)
+        # equal instants in different zones format differently, so the zone is part of the key
+        key = (t, getattr(t, 'tzinfo', None))
+        text = self.times.get(key)
+        if text is None:
+            if len(self.times) >= self.time_cache:
+                self.times.clear()
+            text = self.times[key] = encode_basestring_ascii(serialize_obj(t))
+        return text
+
+
+def dumps(obj, serializer=Serializer()):
+    return serializer.dumps(obj)
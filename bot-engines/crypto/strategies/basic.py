@@ -1,11 +1,18 @@
 from crypto.engine import Strategy
+from crypto.strategies.quotes import QuoteManager, AsyncQuoteManager
+import asyncio
 import logging
 
 
 class BasicStrategy(Strategy):
+    quote_manager = QuoteManager
+
     def __init__(self, exchange, params):
         super().__init__(exchange, params)
         self.spreads = {k: float(v[0]) for k, v in params.items()}
+        # quotes that moved less than this fraction of the spread are left where they are
+        self.tolerances = {k: float(v[1]) if len(v) > 1 else 0.1 for k, v in params.items()}
+        self.quotes = self.quote_manager(exchange, clock=exchange.time)  # a backtest's exchange runs its own clock
 
     def __str__(self):
         return "Basic"
@@ -21,31 +28,61 @@ class BasicStrategy(Strategy):
         market_value = (best_ask + best_bid) / 2
         return market_value
 
-    def trade(self, market):
-        self.exchange.cancel(market=market)  # cancel previous orders in this market
-        market_value = round(self.analyze_market(market), 8)
+    def quote_prices(self, market, market_value):
+        # bid and ask quotes around the market value and how far they may drift before they are amended
+        market_value = round(market_value, 8)
         spread = market_value * self.spreads[market.symbol]
         ask_quote = round(market_value + (spread / 2), 8)
         bid_quote = round(market_value - (spread / 2), 8)
-        min_qty = market.increment
 
         logging.info("{} market value: {}".format(market.symbol, market_value))
         logging.info("{} ask quote: {}".format(market.symbol, ask_quote))
         logging.info("{} bid quote: {}".format(market.symbol, bid_quote))
+        return bid_quote, ask_quote, spread * self.tolerances[market.symbol]
+
+    def trade(self, market):
+        bid_quote, ask_quote, tolerance = self.quote_prices(market, self.analyze_market(market))
+        min_qty = market.increment
 
         try:
-            new_orders = []
-            bid = self.exchange.bid(market=market, rate=bid_quote, quantity=min_qty)
-            ask = self.exchange.ask(market=market, rate=ask_quote, quantity=min_qty)
-            for order in [bid, ask]:
-                if order:
-                    new_orders.append(order)
-                    logging.info("Successfully placed {} order #{} in {}".format(order.side, order.order_id, market.symbol))
-
-            return new_orders
+            bid = self.quotes.quote(market, 'buy', bid_quote, min_qty, tolerance)
+            ask = self.quotes.quote(market, 'sell', ask_quote, min_qty, tolerance)
+            return self.placed(market, [bid, ask])
         except Exception as e:
             logging.warning('Order failed: "{}"'.format(e))
-            self.exchange.cancel(all=True)
+            self.quotes.cancel()
             raise e
 
+    @staticmethod
+    def placed(market, orders):
+        new_orders = []
+        for order in orders:
+            if order:
+                new_orders.append(order)
+                logging.info("Successfully placed {} order #{} in {}".format(order.side, order.order_id, market.symbol))
+        return new_orders
+
+
+class AsyncBasicStrategy(BasicStrategy):
+    # BasicStrategy for an AsyncExchange; both quotes of a market are sent concurrently
+    quote_manager = AsyncQuoteManager
 
+    async def analyze_market(self, market):
+        ticker = await self.exchange.ticker(market)
+        logging.info("{} best ask: {}".format(market.symbol, ticker.ask))
+        logging.info("{} best bid: {}".format(market.symbol, ticker.bid))
+        logging.info("{} last: {}".format(market.symbol, ticker.last))
+        return (ticker.ask + ticker.bid) / 2
+
+    async def trade(self, market):
+        bid_quote, ask_quote, tolerance = self.quote_prices(market, await self.analyze_market(market))
+        min_qty = market.increment
+
+        try:
+            orders = await asyncio.gather(self.quotes.quote(market, 'buy', bid_quote, min_qty, tolerance),
+                                          self.quotes.quote(market, 'sell', ask_quote, min_qty, tolerance))
+            return self.placed(market, orders)
+        except Exception as e:
+            logging.warning('Order failed: "{}"'.format(e))
+            await self.quotes.cancel()
+            raise e
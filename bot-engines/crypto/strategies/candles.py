@@ -0,0 +1,56 @@
+import numpy as np
+from crypto.timeparse import NS
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class CandleBuffer(object):
+    """
+    Fixed-capacity columnar store for one market's candles. Every value is written twice, at i and i + capacity,
+    so the newest `len(self)` values of a column are always one contiguous slice of a preallocated array: appends
+    are O(1) and readers (TA-Lib) get views instead of freshly built arrays.
+    """
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self.prices = np.full((len(PRICE_COLUMNS), 2 * capacity), np.nan)
+        self.times = np.zeros(2 * capacity)  # epoch seconds
+        self.head = 0  # next write position in [0, capacity)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, candle):
+        row = (candle.open, candle.high, candle.low, candle.close, candle.volume)
+        self._write(self.head, row, candle.time_ns / NS)
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def extend(self, candles):
+        for c in candles:
+            self.append(c)
+
+    def _write(self, i, row, timestamp):
+        col = self.prices[:, i]
+        col[:] = [np.nan if v is None else v for v in row]
+        self.prices[:, i + self.capacity] = col
+        self.times[i] = self.times[i + self.capacity] = timestamp
+
+    def _window(self):
+        end = self.head + self.capacity
+        return end - self.count, end
+
+    def column(self, name):
+        start, end = self._window()
+        if name == 'time':
+            return self.times[start:end]
+        return self.prices[PRICE_COLUMNS.index(name), start:end]
+
+    def inputs(self):
+        start, end = self._window()
+        return {name: self.prices[k, start:end] for k, name in enumerate(PRICE_COLUMNS)}
+
+    def last_time(self):
+        if not self.count:
+            return None
+        return self.times[self.head + self.capacity - 1]
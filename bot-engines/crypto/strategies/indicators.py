@@ -0,0 +1,283 @@
+import math
+from collections import deque
+
+NAN = float('nan')
+
+
+# Streaming building blocks. Each one takes a single new value per candle in O(1) (amortized for the rolling
+# extremes) and follows TA-Lib's definition and default periods, so the scoring rules in signal.py keep the
+# meaning they had when they were written against TA-Lib.
+class SMA(object):
+    def __init__(self, period):
+        self.period = period
+        self.window = deque()
+        self.total = 0.0
+        self.updates = 0
+        self.value = NAN
+
+    def update(self, x):
+        self.window.append(x)
+        self.total += x
+        if len(self.window) > self.period:
+            self.total -= self.window.popleft()
+        self.updates += 1
+        if self.updates % 1000 == 0:
+            self.total = math.fsum(self.window)  # keep the running sum from drifting
+        if len(self.window) == self.period:
+            self.value = self.total / self.period
+        return self.value
+
+
+class EMA(object):
+    def __init__(self, period):
+        self.k = 2.0 / (period + 1)
+        self.seed = SMA(period)
+        self.value = NAN
+
+    def update(self, x):
+        if math.isnan(self.value):
+            self.value = self.seed.update(x)  # seeded with the SMA of the first `period` values
+        else:
+            self.value += self.k * (x - self.value)
+        return self.value
+
+
+class WilderGainLoss(object):
+    # Wilder-smoothed average gain and loss of a series, shared by RSI and CMO
+    def __init__(self, period):
+        self.period = period
+        self.prev = None
+        self.count = 0
+        self.gain = 0.0
+        self.loss = 0.0
+        self.ready = False
+
+    def update(self, x):
+        if self.prev is None:
+            self.prev = x
+            return
+        change = x - self.prev
+        self.prev = x
+        up, down = max(change, 0.0), max(-change, 0.0)
+        if self.ready:
+            self.gain = (self.gain * (self.period - 1) + up) / self.period
+            self.loss = (self.loss * (self.period - 1) + down) / self.period
+        else:
+            self.gain += up
+            self.loss += down
+            self.count += 1
+            if self.count == self.period:
+                self.gain /= self.period
+                self.loss /= self.period
+                self.ready = True
+
+    def rsi(self):
+        if not self.ready:
+            return NAN
+        total = self.gain + self.loss
+        return 100 * self.gain / total if total else 0.0
+
+    def cmo(self):
+        if not self.ready:
+            return NAN
+        total = self.gain + self.loss
+        return 100 * (self.gain - self.loss) / total if total else 0.0
+
+
+class RollingExtreme(object):
+    # max (or min) of the last `period` values and the position it occurred at, via a monotonic deque
+    def __init__(self, period, maximum=True):
+        self.period = period
+        self.sign = 1 if maximum else -1
+        self.queue = deque()  # (position, value)
+        self.position = -1
+
+    def update(self, x):
+        self.position += 1
+        while self.queue and self.sign * self.queue[-1][1] <= self.sign * x:
+            self.queue.pop()  # on ties the most recent position wins, as in TA-Lib
+        self.queue.append((self.position, x))
+        if self.queue[0][0] <= self.position - self.period:
+            self.queue.popleft()
+
+    @property
+    def full(self):
+        return self.position + 1 >= self.period
+
+    @property
+    def value(self):
+        return self.queue[0][1] if self.full else NAN
+
+    @property
+    def age(self):
+        return self.position - self.queue[0][0]
+
+
+class Lagged(object):
+    # current and previous value of a series
+    def __init__(self):
+        self.value = NAN
+        self.last = NAN
+
+    def update(self, x):
+        self.last, self.value = self.value, x
+
+
+class Features(dict):
+    pass
+
+
+class IndicatorEngine(object):
+    """
+    Incrementally maintained base series for the SignalStrategy indicator set. Each new candle updates every
+    series once, intermediates shared between indicators (the close SMA, MACD, RSI, typical price) are computed
+    a single time, and `values` holds the latest readings the scoring rules use.
+    """
+    def __init__(self):
+        self.sma = SMA(30)
+        self.sma_10 = SMA(10)
+        self.sma_60 = SMA(60)
+        self.volume_sma_50 = SMA(50)
+        self.ema_12 = EMA(12)
+        self.ema_26 = EMA(26)
+        self.macd_signal = EMA(9)
+        self.macd = Lagged()
+        self.macd_hist = Lagged()
+        self.rsi = WilderGainLoss(14)
+        self.cmo = WilderGainLoss(20)
+        self.cmo_value = Lagged()
+        self.stoch_max = RollingExtreme(5)
+        self.stoch_min = RollingExtreme(5, maximum=False)
+        self.stoch_d = SMA(3)
+        self.aroon_high = RollingExtreme(15)
+        self.aroon_low = RollingExtreme(15, maximum=False)
+        self.aroon = Lagged()
+        self.willr_high = RollingExtreme(14)
+        self.willr_low = RollingExtreme(14, maximum=False)
+        self.willr = Lagged()
+        self.willr_history = deque(maxlen=21)
+        self.prev_tp = None
+        self.mfi_flows = deque()
+        self.mfi_pos = 0.0
+        self.mfi_neg = 0.0
+        self.cci_tp = deque(maxlen=20)
+        self.cci_sma = SMA(20)
+        self.cci = Lagged()
+        self.count = 0
+        self.values = Features()
+
+    def update(self, open, high, low, close, volume):
+        self.count += 1
+        sma = self.sma.update(close)
+        sma_10 = self.sma_10.update(close)
+        sma_60 = self.sma_60.update(close)
+        volume_sma_50 = self.volume_sma_50.update(volume)
+
+        # like TA-Lib, the fast EMA starts late enough to produce its first value on the same candle as the slow one
+        slow = self.ema_26.update(close)
+        fast = self.ema_12.update(close) if self.count > 26 - 12 else NAN
+        macd = fast - slow
+        signal = self.macd_signal.update(macd) if not math.isnan(macd) else NAN
+        self.macd.update(macd)
+        self.macd_hist.update(macd - signal)
+
+        self.rsi.update(close)
+        rsi = self.rsi.rsi()
+        self.cmo.update(close)
+        self.cmo_value.update(self.cmo.cmo())
+        stoch_d = NAN
+        if not math.isnan(rsi):
+            self.stoch_max.update(rsi)
+            self.stoch_min.update(rsi)
+            if self.stoch_max.full:
+                hi, lo = self.stoch_max.value, self.stoch_min.value
+                stoch_d = self.stoch_d.update(100 * (rsi - lo) / (hi - lo) if hi != lo else 0.0)
+
+        self.aroon_high.update(high)
+        self.aroon_low.update(low)
+        aroon = NAN
+        if self.aroon_high.full:
+            period = self.aroon_high.period - 1
+            aroon = 100.0 * (self.aroon_low.age - self.aroon_high.age) / period
+        self.aroon.update(aroon)
+
+        self.willr_high.update(high)
+        self.willr_low.update(low)
+        willr = NAN
+        if self.willr_high.full:
+            hh, ll = self.willr_high.value, self.willr_low.value
+            willr = -100 * (hh - close) / (hh - ll) if hh != ll else 0.0
+        self.willr.update(willr)
+        self.willr_history.append(willr)
+
+        tp = (high + low + close) / 3
+        mfi = self._update_mfi(tp, volume)
+        cci = self._update_cci(tp)
+
+        self.values = Features(
+            close=close,
+            volume=volume,
+            sma=sma,
+            sma_10=sma_10,
+            sma_60=sma_60,
+            volume_sma_50=volume_sma_50,
+            macd=macd,
+            macd_last=self.macd.last,
+            macd_signal=signal,
+            macd_hist=self.macd_hist.value,
+            macd_hist_last=self.macd_hist.last,
+            rsi=rsi,
+            stoch_rsi=stoch_d,
+            aroon=aroon,
+            aroon_last=self.aroon.last,
+            mfi=mfi,
+            cci=cci,
+            cci_last=self.cci.last,
+            cmo=self.cmo_value.value,
+            cmo_last=self.cmo_value.last,
+            willr=willr,
+            willr_last=self.willr.last,
+            willr_20_ago=self.willr_history[0] if len(self.willr_history) == 21 else NAN,
+        )
+        return self.values
+
+    def _update_mfi(self, tp, volume, period=14):
+        if self.prev_tp is not None:
+            flow = tp * volume
+            pos = flow if tp > self.prev_tp else 0.0
+            neg = flow if tp < self.prev_tp else 0.0
+            self.mfi_flows.append((pos, neg))
+            self.mfi_pos += pos
+            self.mfi_neg += neg
+            if len(self.mfi_flows) > period:
+                old_pos, old_neg = self.mfi_flows.popleft()
+                self.mfi_pos -= old_pos
+                self.mfi_neg -= old_neg
+        self.prev_tp = tp
+        if len(self.mfi_flows) < period:
+            return NAN
+        total = self.mfi_pos + self.mfi_neg
+        return 100 * self.mfi_pos / total if total >= 1 else 0.0
+
+    def _update_cci(self, tp):
+        self.cci_tp.append(tp)
+        mean = self.cci_sma.update(tp)
+        cci = NAN
+        if not math.isnan(mean):
+            # mean deviation needs the whole 20-value window, a constant cost independent of the candle history
+            deviation = sum(abs(x - mean) for x in self.cci_tp) / len(self.cci_tp)
+            cci = (tp - mean) / (0.015 * deviation) if deviation and tp != mean else 0.0
+        self.cci.update(cci)
+        return cci
+
+    def replay(self, inputs):
+        for row in zip(inputs['open'], inputs['high'], inputs['low'], inputs['close'], inputs['volume']):
+            self.update(*row)
+        return self.values
+
+
+def features(inputs):
+    # indicator functions accept either engine readings or the raw column arrays used before the engine existed
+    if isinstance(inputs, Features):
+        return inputs
+    return IndicatorEngine().replay(inputs)
@@ -0,0 +1,131 @@
+import logging
+import threading
+import time
+
+
+class Quote(object):
+    __slots__ = ('order', 'rate', 'quantity')
+
+    def __init__(self, order, rate, quantity):
+        self.order = order
+        self.rate = rate  # the price we asked for; the exchange may report the order at a rounded one
+        self.quantity = quantity
+
+
+class QuoteManager(object):
+    """
+    Keeps one live order per market and side. A new quote within `tolerance` of the live one leaves the order (and its
+    queue position) alone, anything else amends it in place. Open orders are checked against the exchange every
+    `sync_interval` seconds with a single orders() call, so fills and outside cancels are noticed without a request per
+    quote.
+    """
+    def __init__(self, exchange, sync_interval=10, clock=time.time):
+        self.exchange = exchange
+        self.sync_interval = sync_interval
+        self.clock = clock
+        self.quotes = {}  # (symbol, side) -> Quote
+        self.synced = None
+        self.counts = {'placed': 0, 'amended': 0, 'kept': 0}
+        self.lock = threading.RLock()
+
+    def quote(self, market, side, rate, quantity, tolerance=0.0):
+        # returns the order if one was placed or amended, None if the live quote was kept or placing failed
+        with self.lock:
+            self.refresh()
+            key = (market.symbol, side)
+            live = self.quotes.get(key)
+            if self.keep(live, rate, quantity, tolerance):
+                return None
+            order = self.amended(key, self.exchange.amend(live.order, rate, quantity)) if live else None
+            if not order:
+                place = self.exchange.bid if side == 'buy' else self.exchange.ask
+                order = self.placed(key, place(market=market, rate=rate, quantity=quantity))
+            if order:
+                self.quotes[key] = Quote(order, rate, quantity)
+            return order
+
+    def refresh(self, force=False):
+        # drop quotes whose orders are no longer open
+        with self.lock:
+            if not self.due(force):
+                return
+            now = self.clock()
+            self.drop_closed(self.exchange.orders(), now)
+
+    def cancel(self, market=None):
+        with self.lock:
+            self.exchange.cancel(**self.cancelled(market))
+
+    # Decisions shared with AsyncQuoteManager
+    def keep(self, live, rate, quantity, tolerance):
+        if live and abs(live.rate - rate) <= tolerance and live.quantity == quantity:
+            self.counts['kept'] += 1
+            return True
+        return False
+
+    def amended(self, key, order):
+        if order:
+            self.counts['amended'] += 1
+        else:
+            # gone since the last sync (filled or cancelled) or rejected; a fresh one is placed
+            self.quotes.pop(key)
+        return order
+
+    def placed(self, key, order):
+        if order:
+            self.counts['placed'] += 1
+        return order
+
+    def due(self, force=False):
+        now = self.clock()
+        return bool(self.quotes) and (force or self.synced is None or now - self.synced >= self.sync_interval)
+
+    def drop_closed(self, orders, now, quotes=None):
+        # quotes is what was live when the orders were requested, quotes placed since then are kept
+        if orders is None:
+            return
+        open_ids = {o.order_id for o in orders}
+        for key, live in list((self.quotes if quotes is None else quotes).items()):
+            if self.quotes.get(key) is live and live.order.order_id not in open_ids:
+                logging.info("{} {} quote #{} is no longer open".format(key[0], key[1], live.order.order_id))
+                del self.quotes[key]
+        self.synced = now
+
+    def cancelled(self, market=None):
+        # forgets the market's quotes (every quote without one); returns the exchange's cancel arguments
+        if market is None:
+            self.quotes.clear()
+            return {'all': True}
+        for key in [k for k in self.quotes if k[0] == market.symbol]:
+            del self.quotes[key]
+        return {'market': market}
+
+
+class AsyncQuoteManager(QuoteManager):
+    """
+    QuoteManager for an AsyncExchange: the same decisions, with the exchange calls awaited. Quotes of different
+    markets and sides may be sent concurrently; the open orders are requested by one sync at a time.
+    """
+    async def quote(self, market, side, rate, quantity, tolerance=0.0):
+        await self.refresh()
+        key = (market.symbol, side)
+        live = self.quotes.get(key)
+        if self.keep(live, rate, quantity, tolerance):
+            return None
+        order = self.amended(key, await self.exchange.amend(live.order, rate, quantity)) if live else None
+        if not order:
+            place = self.exchange.bid if side == 'buy' else self.exchange.ask
+            order = self.placed(key, await place(market=market, rate=rate, quantity=quantity))
+        if order:
+            self.quotes[key] = Quote(order, rate, quantity)
+        return order
+
+    async def refresh(self, force=False):
+        if not self.due(force):
+            return
+        now = self.synced = self.clock()  # concurrent quotes don't sync again meanwhile
+        quotes = dict(self.quotes)
+        self.drop_closed(await self.exchange.orders(), now, quotes)
+
+    async def cancel(self, market=None):
+        await self.exchange.cancel(**self.cancelled(market))
@@ -1,13 +1,11 @@
 from crypto.engine import Strategy
 import logging
-import numpy as np
-import concurrent.futures
-from talib import abstract
+import asyncio
 from crypto.helpers import print_json
-from collections import namedtuple
+from crypto.strategies.candles import CandleBuffer
+from crypto.strategies.indicators import IndicatorEngine, features
 import datetime as dt
 import abc
-import time
 import csv
 
 class SignalConfig:
@@ -21,9 +19,16 @@ class SignalConfig:
 
 
 class SignalStrategy(Strategy):
-    def __init__(self, exchange, params, indicators):
+    # positions only change when a 1m candle closes; the exchange has the candle a few seconds after the minute
+    interval = 60
+    align = 60
+    offset = 5
+
+    def __init__(self, exchange, params, indicators, window=100):
         super().__init__(exchange, params)
+        self.window = window
         self.candles = {}
+        self.engines = {}
         self.next_update = {}
         self.indicators = indicators
         self.cfg = {market: SignalConfig(*args) for market, args in params.items()}
@@ -32,69 +37,91 @@ class SignalStrategy(Strategy):
         return "Signal"
 
     def new_candle(self, market):
-        if market.symbol not in self.candles.keys():
-            self.candles[market.symbol] = self.exchange.candles(market, limit=100)
+        if market.symbol not in self.candles.keys() or not len(self.candles[market.symbol]):
+            candles = CandleBuffer(self.window)
+            self.candles[market.symbol] = candles
+            self.engines[market.symbol] = IndicatorEngine()
+            self.add_candles(market, self.exchange.candles(market, limit=self.window) or [])
             return True
-        elif (time.time() - self.candles[market.symbol][-1].time.timestamp()) > 60:
-            start_time = self.candles[market.symbol][-1].time + dt.timedelta(seconds=5)
+        elif (self.exchange.time() - self.candles[market.symbol].last_time()) > 60:
+            last_time = dt.datetime.fromtimestamp(self.candles[market.symbol].last_time(), tz=dt.timezone.utc)
+            start_time = last_time + dt.timedelta(seconds=5)
             new_candles = self.exchange.candles(market, start=start_time, limit=5)
-            if len(new_candles) < 1:
+            if not new_candles:
                 return False  # no new candles yet
-            self.candles[market.symbol].extend(new_candles)
-            self.candles[market.symbol] = self.candles[market.symbol][-100:]
+            self.add_candles(market, new_candles)
             return True
         else:
             return False
 
+    def add_candles(self, market, candles):
+        engine = self.engines[market.symbol]
+        for c in candles:
+            self.candles[market.symbol].append(c)
+            if None not in (c.open, c.high, c.low, c.close):
+                engine.update(c.open, c.high, c.low, c.close, c.volume)
+
     def get_input(self, market):
-        inputs = {
-            'open': np.array([c.open for c in self.candles[market.symbol]]),
-            'high': np.array([c.high for c in self.candles[market.symbol]]),
-            'low': np.array([c.low for c in self.candles[market.symbol]]),
-            'close': np.array([c.close for c in self.candles[market.symbol]]),
-            'volume': np.array([c.volume for c in self.candles[market.symbol]]),
-        }
-        return inputs
+        # contiguous views of the market's candle buffer, no copies
+        return self.candles[market.symbol].inputs()
 
     def signals(self, market):
         inputs = self.get_input(market)
         if inputs['volume'][-1] < self.cfg[market.symbol].min_volume:
             return {k: 0 for (k, v) in self.indicators.items()}  # volume is too low for signals to be meaningful
-        return {k: v(inputs) for (k, v) in self.indicators.items()}
+        readings = self.engines[market.symbol].values
+        return {k: v(readings) for (k, v) in self.indicators.items()}
 
     def trade(self, market):
         if self.new_candle(market):
             logging.info("Beginning of new period. Analyzing {} market using {} strategy...".format(market.symbol, self))
 
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                signal_future = executor.submit(self.signals, market)
-                position_future = executor.submit(self.exchange.position, market)
-                balance_future = executor.submit(self.exchange.balance)
-                book_future = executor.submit(self.exchange.order_book, market)
-
-                signal = signal_future.result()
-                mean_score = sum(v for v in signal.values()) / len(signal)
-                if mean_score > self.cfg[market.symbol].long_score_threshold:
-                    logging.info("Mean score of {} indicates bull market".format(mean_score))
-                    self.open_longs(market=market, position=position_future.result(), balance=balance_future.result(), book=book_future.result())
-                elif mean_score >= self.cfg[market.symbol].short_score_threshold:
-                    logging.info("Mean score of {}".format(mean_score))
-                    self.close_positions(market=market, position=position_future.result())
-                else:
-                    logging.info("Mean score of {} indicates bear market".format(mean_score))
-                    self.open_shorts(market=market, position=position_future.result(), balance=balance_future.result(), book=book_future.result())
-
+            signal_future = self.executor.submit(self.signals, market)
+            position_future = self.executor.submit(self.exchange.position, market)
+            balance_future = self.executor.submit(self.exchange.balance)
+            book_future = self.executor.submit(self.exchange.order_book, market)
+
+            signal = signal_future.result()
+            mean_score = sum(v for v in signal.values()) / len(signal)
+            if mean_score > self.cfg[market.symbol].long_score_threshold:
+                logging.info("Mean score of {} indicates bull market".format(mean_score))
+                self.open_longs(market=market, position=position_future.result(), balance=balance_future.result(), book=book_future.result())
+            elif mean_score >= self.cfg[market.symbol].short_score_threshold:
+                logging.info("Mean score of {}".format(mean_score))
+                self.close_positions(market=market, position=position_future.result())
+            else:
+                logging.info("Mean score of {} indicates bear market".format(mean_score))
+                self.open_shorts(market=market, position=position_future.result(), balance=balance_future.result(), book=book_future.result())
+
+    # Each decision returns the market orders to place as (side, rate, quantity); place() sends them, so the
+    # AsyncSignalStrategy only overrides place() and the decisions return its coroutine
     def close_positions(self, market, position):
+        return self.place(market, self.closing_orders(market, position))
+
+    def open_longs(self, market, position, balance, book):
+        return self.place(market, self.long_orders(market, position, balance, book))
+
+    def open_shorts(self, market, position, balance, book):
+        return self.place(market, self.short_orders(market, position, balance, book))
+
+    def place(self, market, orders):
+        for side, rate, quantity in orders:
+            place = self.exchange.bid if side == 'buy' else self.exchange.ask
+            place(market=market, rate=rate, quantity=quantity)
+
+    def closing_orders(self, market, position):
         if position > 0:
             logging.info("Closing long position ({}) in {} market...".format(position, market.symbol))
-            self.exchange.ask(market=market, rate=None, quantity=position)
+            return [('sell', None, position)]
         elif position < 0:
             logging.info("Closing short position ({}) in {} market...".format(position, market.symbol))
-            self.exchange.bid(market=market, rate=None, quantity=abs(position))
+            return [('buy', None, abs(position))]
+        return []
 
-    def open_longs(self, market, position, balance, book):
+    def long_orders(self, market, position, balance, book):
+        orders = []
         if position < 0:
-            self.close_positions(market=market, position=position)
+            orders = self.closing_orders(market=market, position=position)
             position = 0
 
         cap_buffer = self.cfg[market.symbol].long_qty_cap - position
@@ -102,11 +129,13 @@ class SignalStrategy(Strategy):
         quantity = min(funds, self.cfg[market.symbol].lot_qty, cap_buffer)
         if quantity >= market.increment:
             logging.info("Increasing long position from {} to {} in {} market...".format(position, position+quantity, market.symbol))
-            self.exchange.bid(market=market, rate=None, quantity=quantity)
+            orders.append(('buy', None, quantity))
+        return orders
 
-    def open_shorts(self, market, position, balance, book):
+    def short_orders(self, market, position, balance, book):
+        orders = []
         if position > 0:
-            self.close_positions(market=market, position=position)
+            orders = self.closing_orders(market=market, position=position)
             position = 0
 
         cap_buffer = self.cfg[market.symbol].short_qty_cap + position
@@ -114,35 +143,70 @@ class SignalStrategy(Strategy):
         quantity = min(funds, self.cfg[market.symbol].lot_qty, cap_buffer)
         if quantity >= market.increment:
             logging.info("Increasing short position from {} to {} in {} market...".format(position, position-quantity, market.symbol))
-            self.exchange.ask(market=market, rate=None, quantity=quantity)
+            orders.append(('sell', None, quantity))
+        return orders
 
     @staticmethod
     def mid_spread(book):
         return book.bids[0].rate + ((book.asks[0].rate - book.bids[0].rate) / 2)
 
 
-# For more information about this technical indicator and the source of the scan conditions, see:
-# http://stockcharts.com/school/doku.php?id=chart_school:technical_indicators:moving_average_convergence_divergence_macd
-def MACD(inputs):
-    Result = namedtuple('Result', 'close, sma, macd, signal, macd_last')
 
-    calculate_sma = abstract.Function("SMA")
-    sma = calculate_sma(inputs)
+class AsyncSignalStrategy(SignalStrategy):
+    """
+    SignalStrategy for an AsyncExchange. Candle state, indicator engines and scoring are shared with the blocking
+    strategy; the market data a decision needs is awaited concurrently instead of on the executor.
+    """
+    async def new_candle(self, market):
+        if market.symbol not in self.candles.keys() or not len(self.candles[market.symbol]):
+            self.candles[market.symbol] = CandleBuffer(self.window)
+            self.engines[market.symbol] = IndicatorEngine()
+            self.add_candles(market, await self.exchange.candles(market, limit=self.window) or [])
+            return True
+        elif (self.exchange.time() - self.candles[market.symbol].last_time()) > 60:
+            last_time = dt.datetime.fromtimestamp(self.candles[market.symbol].last_time(), tz=dt.timezone.utc)
+            new_candles = await self.exchange.candles(market, start=last_time + dt.timedelta(seconds=5), limit=5)
+            if not new_candles:
+                return False  # no new candles yet
+            self.add_candles(market, new_candles)
+            return True
+        else:
+            return False
 
-    calculate_macd = abstract.Function("MACD")
-    macd, macdsignal, macdhist = calculate_macd(inputs)
+    async def trade(self, market):
+        if await self.new_candle(market):
+            logging.info("Beginning of new period. Analyzing {} market using {} strategy...".format(market.symbol, self))
+            position, balance, book = await asyncio.gather(self.exchange.position(market), self.exchange.balance(),
+                                                           self.exchange.order_book(market))
+            signal = self.signals(market)
+            mean_score = sum(v for v in signal.values()) / len(signal)
+            if mean_score > self.cfg[market.symbol].long_score_threshold:
+                logging.info("Mean score of {} indicates bull market".format(mean_score))
+                await self.open_longs(market=market, position=position, balance=balance, book=book)
+            elif mean_score >= self.cfg[market.symbol].short_score_threshold:
+                logging.info("Mean score of {}".format(mean_score))
+                await self.close_positions(market=market, position=position)
+            else:
+                logging.info("Mean score of {} indicates bear market".format(mean_score))
+                await self.open_shorts(market=market, position=position, balance=balance, book=book)
+
+    async def place(self, market, orders):
+        for side, rate, quantity in orders:  # in turn: a closing order goes out before the opening one
+            place = self.exchange.bid if side == 'buy' else self.exchange.ask
+            await place(market=market, rate=rate, quantity=quantity)
+
+# Each indicator is a scoring rule over the readings of the IndicatorEngine; `inputs` is either those readings
+# (as passed by SignalStrategy.signals) or a dict of open/high/low/close/volume arrays, which is replayed
+# through a fresh engine.
 
-    r = Result(
-        close=inputs['close'][-1],
-        sma=sma[-1],
-        macd=macd[-1],
-        signal=macdsignal[-1],
-        macd_last=macd[-2]
-    )
+# For more information about this technical indicator and the source of the scan conditions, see:
+# http://stockcharts.com/school/doku.php?id=chart_school:technical_indicators:moving_average_convergence_divergence_macd
+def MACD(inputs):
+    r = features(inputs)
     indicator = 0
-    if r.close > r.sma and (0 > r.macd > r.signal > r.macd_last):
+    if r['close'] > r['sma'] and (0 > r['macd'] > r['macd_signal'] > r['macd_last']):
         indicator = 1
-    elif r.close < r.sma and (0 < r.macd < r.signal < r.macd_last):
+    elif r['close'] < r['sma'] and (0 < r['macd'] < r['macd_signal'] < r['macd_last']):
         indicator = -1
     return indicator
 
@@ -150,22 +214,11 @@ def MACD(inputs):
 # For more information about this technical indicator and the source of the scan conditions, see:
 # http://stockcharts.com/school/doku.php?id=chart_school:technical_indicators:williams_r
 def RSI(inputs):
-    Result = namedtuple('Result', 'close, sma, rsi')
-    calculate_sma = abstract.Function("SMA")
-    sma = calculate_sma(inputs)
-
-    calculate_rsi = abstract.Function("RSI")
-    rsi = calculate_rsi(inputs)
-
-    r = Result(
-        close=inputs['close'][-1],
-        sma=sma[-1],
-        rsi=rsi[-1]
-    )
+    r = features(inputs)
     indicator = 0
-    if r.close > r.sma and r.rsi <= 30:
+    if r['close'] > r['sma'] and r['rsi'] <= 30:
         indicator = 1
-    elif r.close < r.sma and r.rsi >= 70:
+    elif r['close'] < r['sma'] and r['rsi'] >= 70:
         indicator = -1
     return indicator
 
@@ -173,24 +226,11 @@ def RSI(inputs):
 # For more information about this technical indicator and the source of the scan conditions, see:
 # http://stockcharts.com/school/doku.php?id=chart_school:technical_indicators:stochastic_oscillator_fast_slow_and_full
 def STOCHRSI(inputs):
-    Result = namedtuple('Result', 'close, sma_10, sma_60, stoch_rsi')
-    calculate_sma = abstract.Function("SMA")
-    sma_10 = calculate_sma(inputs, timeperiod=10)
-    sma_60 = calculate_sma(inputs, timeperiod=60)
-
-    calculate_rsi = abstract.Function("STOCHRSI")
-    fastk, fastd = calculate_rsi(inputs)
-    r = Result(
-        close=inputs['close'][-1],
-        sma_10=sma_10[-1],
-        sma_60=sma_60[-1],
-        stoch_rsi=fastd[-1]
-    )
-
+    r = features(inputs)
     indicator = 0
-    if r.close > r.sma_60 and r.stoch_rsi <= 20 and r.close < r.sma_10:
+    if r['close'] > r['sma_60'] and r['stoch_rsi'] <= 20 and r['close'] < r['sma_10']:
         indicator = 1
-    elif r.close < r.sma_60 and r.stoch_rsi > 80 and r.close > r.sma_10:
+    elif r['close'] < r['sma_60'] and r['stoch_rsi'] > 80 and r['close'] > r['sma_10']:
         indicator = -1
     return indicator
 
@@ -198,25 +238,11 @@ def STOCHRSI(inputs):
 # For more information about this technical indicator and the source of the scan conditions, see:
 # http://stockcharts.com/school/doku.php?id=chart_school:technical_indicators:aroon_oscillator
 def AROON_OSCILLATOR(inputs):
-    Result = namedtuple('Result', 'aroon_last, aroon, sma_volume, volume')
-
-    calculate_aroon_osc = abstract.Function("AROONOSC")
-    aroon_osc = calculate_aroon_osc(inputs)
-
-    calculate_sma = abstract.Function("SMA")
-    sma_volume = calculate_sma(inputs, timeperiod=50, price='volume')
-
-    r = Result(
-        aroon_last=aroon_osc[-2],
-        aroon=aroon_osc[-1],
-        sma_volume=sma_volume[-1],
-        volume=inputs['volume'][-1]
-    )
-
+    r = features(inputs)
     indicator = 0
-    if r.aroon_last < 0 < r.aroon and r.volume > r.sma_volume:
+    if r['aroon_last'] < 0 < r['aroon'] and r['volume'] > r['volume_sma_50']:
         indicator = 1
-    elif r.aroon_last > 0 > r.aroon and r.volume > r.sma_volume:
+    elif r['aroon_last'] > 0 > r['aroon'] and r['volume'] > r['volume_sma_50']:
         indicator = -1
     return indicator
 
@@ -224,9 +250,7 @@ def AROON_OSCILLATOR(inputs):
 # For more information about this technical indicator and the source of the scan conditions, see:
 # http://stockcharts.com/school/doku.php?id=chart_school:technical_indicators:money_flow_index_mfi
 def MFI(inputs):
-    calculate_mfi = abstract.Function("MFI")
-    mfi = calculate_mfi(inputs)[-1]
-
+    mfi = features(inputs)['mfi']
     indicator = 0
     if mfi < 10:
         indicator = 1
@@ -238,25 +262,11 @@ def MFI(inputs):
 # For more information about this technical indicator and the source of the scan conditions, see:
 # http://stockcharts.com/school/doku.php?id=chart_school:technical_indicators:commodity_channel_index_cci
 def CCI(inputs):
-    Result = namedtuple('Result', 'close, sma, cci, cci_last')
-
-    calculate_cci = abstract.Function("CCI")
-    cci = calculate_cci(inputs, timeperiod=20)
-
-    calculate_sma = abstract.Function("SMA")
-    sma = calculate_sma(inputs)
-
-    r = Result(
-        close=inputs['close'][-1],
-        sma=sma[-1],
-        cci=cci[-1],
-        cci_last=cci[-2]
-    )
-
+    r = features(inputs)
     indicator = 0
-    if r.close > r.sma and r.cci_last < -200 < r.cci:
+    if r['close'] > r['sma'] and r['cci_last'] < -200 < r['cci']:
         indicator = 1
-    elif r.close > r.sma and r.cci_last < 200 < r.cci:
+    elif r['close'] > r['sma'] and r['cci_last'] < 200 < r['cci']:
         indicator = -1
     return indicator
 
@@ -264,24 +274,11 @@ def CCI(inputs):
 # For more information about this technical indicator and the source of the scan conditions, see:
 # https://www.investopedia.com/terms/c/chandemomentumoscillator.asp
 def CMO(inputs):
-    Result = namedtuple('Result', 'cmf, cmf_last, rsi')
-
-    calculate_cmo = abstract.Function("CMO")
-    cmo = calculate_cmo(inputs, timeperiod=20)
-
-    calculate_rsi = abstract.Function("RSI", timeperiod=14)
-    rsi = calculate_rsi(inputs)
-
-    r = Result(
-        cmf=cmo[-1],
-        cmf_last=cmo[-2],
-        rsi=rsi[-1]
-    )
-
+    r = features(inputs)
     indicator = 0
-    if r.cmf_last < 0 < r.cmf and r.rsi > 50:
+    if r['cmo_last'] < 0 < r['cmo'] and r['rsi'] > 50:
         indicator = 1
-    elif r.cmf_last > 0 > r.cmf and r.rsi < 50:
+    elif r['cmo_last'] > 0 > r['cmo'] and r['rsi'] < 50:
         indicator = -1
     return indicator
 
@@ -289,25 +286,11 @@ def CMO(inputs):
 # For more information about this technical indicator and the source of the scan conditions, see:
 # http://stockcharts.com/school/doku.php?id=chart_school:technical_indicators:macd-histogram
 def MACD_HIST(inputs):
-    Result = namedtuple('Result', 'close, sma, macd_hist, macd_hist_last, macd_line')
-
-    calculate_sma = abstract.Function("SMA")
-    sma = calculate_sma(inputs)
-
-    calculate_macd = abstract.Function("MACD")
-    macd, macdsignal, macdhist = calculate_macd(inputs)
-
-    r = Result(
-        close=inputs['close'][-1],
-        sma=sma[-1],
-        macd_hist=macdhist[-1],
-        macd_hist_last=macdhist[-2],
-        macd_line=macd[-1]
-    )
+    r = features(inputs)
     indicator = 0
-    if r.close > r.sma and r.macd_hist_last < 0 < r.macd_hist and r.macd_line < 0:
+    if r['close'] > r['sma'] and r['macd_hist_last'] < 0 < r['macd_hist'] and r['macd'] < 0:
         indicator = 1
-    elif r.close > r.sma and r.macd_hist_last > 0 > r.macd_hist and r.macd_line > 0:
+    elif r['close'] > r['sma'] and r['macd_hist_last'] > 0 > r['macd_hist'] and r['macd'] > 0:
         indicator = -1
     return indicator
 
@@ -315,32 +298,10 @@ def MACD_HIST(inputs):
 # For more information about this technical indicator and the source of the scan conditions, see:
 # http://stockcharts.com/school/doku.php?id=chart_school:technical_indicators:williams_r
 def WILLR(inputs):
-    inputs_20_days_ago = {
-        'open': inputs['open'][:-20],
-        'high': inputs['high'][:-20],
-        'low': inputs['low'][:-20],
-        'close': inputs['close'][:-20],
-        'volume': inputs['volume'][:-20],
-    }
-    Result = namedtuple('Result', 'close, sma, willr_20_days_ago, willr, willr_last')
-
-    calculate_sma = abstract.Function("SMA")
-    sma = calculate_sma(inputs)
-
-    calculate_willr = abstract.Function("WILLR")
-    willr = calculate_willr(inputs)
-    willr_20_days_ago = calculate_willr(inputs_20_days_ago)
-
-    r = Result(
-        close=inputs['close'][-1],
-        sma=sma[-1],
-        willr_20_days_ago=willr_20_days_ago[-1],
-        willr=willr[-1],
-        willr_last=willr[-2]
-    )
+    r = features(inputs)
     indicator = 0
-    if r.close > r.sma and r.willr_20_days_ago < -80  and r.willr_last < -50 < r.willr:
+    if r['close'] > r['sma'] and r['willr_20_ago'] < -80 and r['willr_last'] < -50 < r['willr']:
         indicator = 1
-    elif r.close > r.sma and r.willr_20_days_ago > -20  and r.willr_last > -50 > r.willr:
+    elif r['close'] > r['sma'] and r['willr_20_ago'] > -20 and r['willr_last'] > -50 > r['willr']:
         indicator = -1
-    return indicator
\ No newline at end of file
+    return indicator
@@ -1,8 +1,46 @@
+from crypto.timeparse import to_ns, from_ns
+
+# the array helpers import NumPy themselves, so importing the records doesn't load it
+
+
 class Currency:
     pass
 
 
-class Market(object):
+class Record(object):
+    # records are created by the thousand on every loop, so they keep their fields in __slots__ instead of a
+    # per-instance __dict__; as_dict() gives the public fields (_fields, the slots unless a subclass says otherwise)
+    # in the order the old __dict__ had them
+    __slots__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if '_fields' not in cls.__dict__:
+            cls._fields = cls.__slots__
+
+    def as_dict(self):
+        return {k: getattr(self, k) for k in self._fields}
+
+    def __getstate__(self):
+        return tuple(getattr(self, k) for k in self.__slots__)
+
+    def __setstate__(self, state):
+        for k, v in zip(self.__slots__, state):
+            setattr(self, k, v)
+
+
+class Timed(object):
+    # records stamped by the exchange keep integer epoch nanoseconds in time_ns; time is the aware UTC datetime
+    __slots__ = ()
+
+    @property
+    def time(self):
+        return from_ns(self.time_ns)
+
+
+class Market(Record):
+    __slots__ = ('counter', 'base', 'symbol', 'increment', 'make_fee', 'take_fee')
+
     def __init__(self, counter, base, symbol, increment, make_fee, take_fee):
         self.counter = counter
         self.base = base
@@ -12,17 +50,23 @@ class Market(object):
         self.take_fee = take_fee
 
 
-class Order(object):
+class Order(Timed, Record):
+    __slots__ = ('order_id', 'market', 'side', 'rate', 'quantity', 'time_ns')
+    _fields = ('order_id', 'market', 'side', 'rate', 'quantity', 'time')
+
     def __init__(self, order_id, market, side, rate, quantity, time):
         self.order_id = str(order_id)
         self.market = market
         self.side = str(side)
         self.rate = float(rate)
         self.quantity = float(quantity)
-        self.time = time
+        self.time_ns = to_ns(time)
 
 
-class Trade(object):
+class Trade(Timed, Record):
+    __slots__ = ('trade_id', 'order_id', 'market', 'side', 'rate', 'quantity', 'time_ns')
+    _fields = ('trade_id', 'order_id', 'market', 'side', 'rate', 'quantity', 'time')
+
     def __init__(self, trade_id, order_id, market, side, rate, quantity, time):
         self.trade_id = str(trade_id)
         self.order_id = str(order_id)
@@ -30,10 +74,19 @@ class Trade(object):
         self.side = str(side)
         self.rate = float(rate)
         self.quantity = float(quantity)
-        self.time = time
+        self.time_ns = to_ns(time)
+
+    @staticmethod
+    def to_array(trades):
+        # (n, 2) float array of rate, quantity
+        import numpy as np
+        return np.array([(t.rate, t.quantity) for t in trades], dtype=float).reshape(-1, 2)
 
 
-class Ticker(object):
+class Ticker(Timed, Record):
+    __slots__ = ('market', 'ask', 'bid', 'low', 'high', 'last', 'base_volume', 'quote_volume', 'time_ns')
+    _fields = ('market', 'ask', 'bid', 'low', 'high', 'last', 'base_volume', 'quote_volume', 'time')
+
     def __init__(self, market, ask, bid,  low, high, last, base_volume, quote_volume, time):
         self.market = market
         self.ask = float(ask)
@@ -43,28 +96,59 @@ class Ticker(object):
         self.last = float(last)
         self.base_volume = float(base_volume)
         self.quote_volume = float(quote_volume)
-        self.time = time
+        self.time_ns = to_ns(time)
+
 
+class Balance(Record):
+    __slots__ = ('available', 'reserved')
 
-class Balance(object):
     def __init__(self, available, reserved):
         self.available = float(available)
         self.reserved = float(reserved)
 
 
-class OrderBook(object):
+class OrderBook(Record):
+    __slots__ = ('asks', 'bids')
+
     def __init__(self, asks, bids):
         self.asks = asks
         self.bids = bids
 
+    @classmethod
+    def from_arrays(cls, asks, bids):
+        return cls(Entry.from_array(asks), Entry.from_array(bids))
+
+    def to_arrays(self):
+        return Entry.to_array(self.asks), Entry.to_array(self.bids)
+
+
+class Entry(Record):
+    __slots__ = ('rate', 'quantity')
 
-class Entry(object):
     def __init__(self, rate, quantity):
         self.rate = float(rate)
         self.quantity = float(quantity)
 
+    @staticmethod
+    def to_array(entries):
+        # (n, 2) float array of rate, quantity
+        import numpy as np
+        return np.array([(e.rate, e.quantity) for e in entries], dtype=float).reshape(-1, 2)
+
+    @classmethod
+    def from_array(cls, array):
+        # rows of rate, quantity; tolist() hands out Python floats in one pass instead of one numpy scalar per value
+        import numpy as np
+        return [cls(rate, quantity) for rate, quantity in np.asarray(array, dtype=float).tolist()]
+
+
+CANDLE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class Candle(Timed, Record):
+    __slots__ = ('market', 'open', 'high', 'low', 'close', 'volume', 'time_ns')
+    _fields = ('market', 'open', 'high', 'low', 'close', 'volume', 'time')
 
-class Candle(object):
     def __init__(self, market, open, high, low, close, volume, time):
         self.market = market
         self.open = float(open) if open else None
@@ -72,5 +156,11 @@ class Candle(object):
         self.low = float(low) if low else None
         self.close = float(close) if close else None
         self.volume = float(volume) if volume else 0
-        self.time = time
-
+        self.time_ns = to_ns(time)
+
+    @staticmethod
+    def to_arrays(candles):
+        # column name -> float array, missing prices become NaN
+        import numpy as np
+        rows = np.array([(c.open, c.high, c.low, c.close, c.volume) for c in candles], dtype=float).reshape(-1, 5)
+        return {name: rows[:, k] for k, name in enumerate(CANDLE_COLUMNS)}
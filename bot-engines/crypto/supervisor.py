@@ -0,0 +1,246 @@
+import configparser
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from crypto.engine import TradingBot
+from crypto.aiobot import AsyncTradingBot
+from crypto.telemetry import EVENT_TYPES
+from crypto import metrics
+
+# report types keyed by market: every shard sends its own markets and the supervisor publishes the union
+MARKET_TYPES = ('orderbooks', 'trades', 'positions', 'signals')
+
+
+class ShardPublisher(object):
+    # takes the place of the telemetry Publisher inside a shard, messages go to the supervisor instead of the backend
+    def __init__(self, reports, shard):
+        self.reports = reports
+        self.shard = shard
+
+    def publish(self, data, type):
+        if isinstance(data, Exception):
+            data = str(data)  # not every exception survives pickling
+        self.reports.put((self.shard, type, data))
+
+    def close(self, timeout=5):
+        pass
+
+
+def config_bot(name, symbols, publisher, report_account):
+    return TradingBot(name, config_path='config.ini', symbols=symbols, publisher=publisher,
+                      report_account=report_account)
+
+
+def run_shard(factory, name, shard, symbols, commands, reports):
+    bot = factory(name, symbols, ShardPublisher(reports, shard), shard == 0)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the supervisor turns shards off through their command queue
+    bot.work_thread = threading.Thread(target=bot.work)
+    bot.work_thread.daemon = True
+    bot.work_thread.start()
+    reports.put((shard, 'ready', list(bot.markets.keys())))
+    while True:
+        try:
+            msg = commands.get(timeout=1)
+        except queue.Empty:
+            if not bot.work_thread.is_alive():
+                # the bot stopped trading on its own (its work() raised); exit so the supervisor restarts the shard
+                reports.put((shard, 'error', 'Shard {} stopped trading'.format(shard)))
+                sys.exit(1)
+            continue
+        if msg is None:
+            break
+        bot.msg_queue.put(msg)
+    bot.turn_off.set()
+    bot.work_thread.join()
+    reports.put((shard, 'stopped', None))
+
+
+class Supervisor(TradingBot):
+    """
+    Runs the bot's markets in worker processes. Each shard is a TradingBot over a subset of the symbols that owns
+    their strategy state; the supervisor keeps the stdin control channel, routes commands to the shards owning the
+    markets and merges the shards' reports before publishing them. Only shard 0 reports balance and orders. A shard
+    whose process exits is restarted up to max_restarts times, then the supervisor turns the bot off.
+    """
+    def __init__(self, name, shards=None, factory=config_bot, max_restarts=3, **kwargs):
+        super().__init__(name, **kwargs)
+        symbols = list(self.exchange.symbols)
+        count = max(min(shards or os.cpu_count(), len(symbols)), 1)
+        self.assignment = [symbols[i::count] for i in range(count)]
+        self.owners = {}  # market key -> shard
+        for shard, shard_symbols in enumerate(self.assignment):
+            for s in shard_symbols:
+                m = self.exchange.to_market(s)
+                self.owners[m.counter + '_' + m.base] = shard
+        self.factory = factory
+        context = multiprocessing.get_context('spawn')  # no forking with the publisher and executor threads running
+        self.reports = context.Queue()
+        self.commands = [context.Queue() for _ in self.assignment]
+        self.context = context
+        self.processes = [self.shard_process(i) for i in range(len(self.assignment))]
+        self.max_restarts = max_restarts
+        self.restarts = [0 for _ in self.assignment]
+        self.ready = set()
+        self.shard_reports = {}  # type -> shard -> latest data
+
+    def config_strategy(self, section, exchange, symbols):
+        return None  # the shards trade, the supervisor only needs the exchange to name markets
+
+    def shard_process(self, shard):
+        process = self.context.Process(target=run_shard, name='{}-shard-{}'.format(self.name, shard),
+                                       args=(self.factory, self.name, shard, self.assignment[shard],
+                                             self.commands[shard], self.reports))
+        process.daemon = True
+        return process
+
+    def start_shards(self):
+        for p in self.processes:
+            p.start()
+        logging.info("Started {} shards: {}".format(len(self.processes), self.assignment))
+
+    def check_shards(self):
+        # restart shards whose process exited, a shard that keeps dying turns the whole bot off
+        for i, p in enumerate(self.processes):
+            if p.pid is None or p.is_alive():
+                continue
+            self.ready.discard(i)
+            if self.restarts[i] >= self.max_restarts:
+                self.push('Shard {} exited with code {} after {} restarts, stopping'.format(
+                    i, p.exitcode, self.restarts[i]), 'error')
+                self.turn_off.set()
+                return
+            self.push('Shard {} exited with code {}, restarting it'.format(i, p.exitcode), 'error')
+            self.restarts[i] += 1
+            self.processes[i] = self.shard_process(i)
+            self.processes[i].start()
+            off = {k: 'off' for k, shard in self.owners.items() if shard == i and not self.markets_on[k]}
+            if off:
+                self.commands[i].put({'type': 'markets', 'data': off})  # a new shard starts with every market on
+
+    def stop_shards(self, timeout=30):
+        started = [i for i, p in enumerate(self.processes) if p.pid is not None]
+        for i in started:
+            self.commands[i].put(None)
+        for p in [self.processes[i] for i in started]:
+            p.join(timeout)
+            if p.is_alive():
+                logging.warning("Shard {} did not stop, terminating it".format(p.name))
+                p.terminate()
+        self.collect(timeout=0)
+
+    def work(self):
+        self.start_shards()
+        while True:
+            if self.turn_off.is_set():
+                logging.info("Stopping shards")
+                self.stop_shards()
+                self.executor.shutdown(wait=False)
+                return
+            if not self.msg_queue.empty():
+                self.process_msg(self.msg_queue.get())
+            self.collect()
+            self.check_shards()
+
+    def process_msg(self, msg):
+        if msg['type'] == 'markets':
+            routed = {}
+            for k, v in msg['data'].items():
+                if k not in self.owners:
+                    logging.warning("Unknown market {}".format(k))
+                    continue
+                self.markets_on[k] = (v == 'on')
+                routed.setdefault(self.owners[k], {})[k] = v
+            for shard, data in routed.items():
+                self.commands[shard].put({'type': 'markets', 'data': data})
+        elif msg['type'] == 'pause':
+            for m in self.markets_on.keys():
+                self.markets_on[m] = False
+            logging.info("Pausing all markets")
+            for c in self.commands:
+                c.put(msg)
+        elif msg['type'] == 'profile':
+            for c in self.commands:  # the shards do the work, every one profiles itself and pushes its summary
+                c.put(msg)
+
+    def collect(self, timeout=0.5):
+        # wait up to `timeout` for shard reports, then take everything that is already queued
+        try:
+            report = self.reports.get(timeout=timeout) if timeout else self.reports.get_nowait()
+            while True:
+                self.merge(*report)
+                report = self.reports.get_nowait()
+        except queue.Empty:
+            pass
+
+    def merge(self, shard, type, data):
+        if type == 'ready':
+            self.ready.add(shard)
+            return
+        if type == 'stopped':
+            self.ready.discard(shard)
+            return
+        if type == 'metrics':
+            self.shard_reports.setdefault(type, {})[shard] = data
+            self.push(self.metrics(), type)
+            return
+        if type in EVENT_TYPES or (type not in MARKET_TYPES and type != 'status'):
+            self.push(data, type)
+            return
+        self.shard_reports.setdefault(type, {})[shard] = data
+        parts = [self.shard_reports[type][s] for s in sorted(self.shard_reports[type])]
+        if type == 'status':
+            merged = {'strategy': parts[0]['strategy'], 'markets': {}, 'skipped': []}
+            for part in parts:
+                merged['markets'].update(part['markets'])
+                merged['skipped'].extend(part['skipped'])
+        else:
+            merged = {}
+            for part in parts:
+                merged.update(part)
+        self.push(merged, type)
+
+
+    def metrics(self):
+        # the supervisor's own series and the latest ones of every shard, labelled with the shard
+        series = super().metrics()
+        for shard, part in sorted(self.shard_reports.get('metrics', {}).items()):
+            series.extend(dict(s, labels=dict(s['labels'], shard=str(shard))) for s in part)
+        return series
+
+
+def create_bot(name, config_path='config.ini'):
+    # an AsyncTradingBot when the bot's config section sets Async, a Supervisor when it asks for more than one shard
+    # and a single process TradingBot otherwise
+    config = configparser.ConfigParser(allow_no_value=True)
+    config.read(os.path.join(os.path.dirname(__file__), 'config.ini'))
+    section = config[name] if config.has_section(name) else {}
+    if section and section.getboolean('Async', fallback=False):
+        bot = AsyncTradingBot.from_config(name)
+    elif section and section.getint('Shards', fallback=1) > 1:
+        bot = Supervisor(name, shards=section.getint('Shards'), config_path=config_path)
+    else:
+        bot = TradingBot(name, config_path=config_path)
+    if section and section.get('MetricsPort'):
+        metrics.serve(int(section['MetricsPort']), bot.metrics)  # text exposition on localhost
+    return bot
+
+
+def startup_times(name, config_path='config.ini', started=None):
+    # seconds spent importing (since started, a time.perf_counter() taken before `import crypto`) and building the
+    # configured bot, and which modules that loaded; the bot is never run
+    built = time.perf_counter()
+    bot = create_bot(name, config_path)
+    done = time.perf_counter()
+    bot.publisher.close()
+    return {
+        'import': built - started if started is not None else None,
+        'create_bot': done - built,
+        'modules': sorted(m for m in sys.modules if m.startswith('crypto.')),
+        'dependencies': [m for m in ('requests', 'requests_mock', 'aiohttp', 'numpy', 'talib', 'dateutil')
+                         if m in sys.modules],
+    }
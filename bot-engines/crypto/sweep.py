@@ -0,0 +1,133 @@
+import argparse
+import itertools
+import json
+import numpy as np
+from crypto.strategies.indicators import IndicatorEngine
+
+# SignalConfig fields, in config.ini order
+PARAMS = ['long_qty_cap', 'short_qty_cap', 'lot_qty', 'long_score_threshold', 'short_score_threshold', 'min_volume']
+
+
+def score_matrix(histories, indicators):
+    """
+    Mean indicator score of every market at every bar, shape (markets, time). The indicator readings come from the
+    same IndicatorEngine and scoring functions SignalStrategy uses live, so this is computed once per history and
+    reused for every parameter combination.
+    """
+    scores = np.zeros((len(histories), len(histories[0])))
+    for m, h in enumerate(histories):
+        engine = IndicatorEngine()
+        for t, row in enumerate(zip(h.open, h.high, h.low, h.close, h.volume)):
+            readings = engine.update(*row)
+            scores[m, t] = sum(f(readings) for f in indicators.values()) / len(indicators)
+    return scores
+
+
+def grid(**values):
+    # cartesian product of parameter values -> dict of equally long arrays, one entry per combination
+    names = [p for p in PARAMS if p in values]
+    combos = list(itertools.product(*[values[p] for p in names]))
+    return {p: np.array([c[i] for c in combos], dtype=float) for i, p in enumerate(names)}
+
+
+class SweepResult(object):
+    def __init__(self, params, pnl, max_drawdown, trades):
+        self.params = params  # name -> (P,)
+        self.pnl = pnl  # (markets, P)
+        self.max_drawdown = max_drawdown  # (markets, P)
+        self.trades = trades  # (markets, P)
+
+    def table(self, sort='pnl', top=20):
+        pnl = self.pnl.sum(axis=0)
+        drawdown = self.max_drawdown.sum(axis=0)
+        key = {'pnl': -pnl, 'max_drawdown': drawdown, 'ratio': -pnl / np.maximum(drawdown, 1e-12)}[sort]
+        rows = []
+        for p in np.argsort(key, kind='stable')[:top]:
+            row = {name: float(v[p]) for name, v in self.params.items()}
+            row.update(pnl=float(pnl[p]), max_drawdown=float(drawdown[p]), trades=int(self.trades[:, p].sum()))
+            rows.append(row)
+        return rows
+
+
+def sweep(histories, scores, params, spread=0.0005):
+    """
+    Simulates SignalStrategy's position rules for every parameter combination at once. The state is a
+    (markets, params) array stepped through time with NumPy, filled at the close plus or minus half the spread
+    paying the market's taker fee, like SimulatedExchange. As in the live strategy, a long signal closes any short
+    and adds up to lot_qty until long_qty_cap, a neutral score closes the position and a short signal mirrors the
+    long case. The balance-based funds check of SignalStrategy is not modelled.
+    """
+    n_markets, n_params = len(histories), len(next(iter(params.values())))
+    full = {p: np.broadcast_to(params.get(p, np.inf if p.endswith('cap') else 0.0), (n_params,)) for p in PARAMS}
+    long_thr, short_thr = full['long_score_threshold'][None, :], full['short_score_threshold'][None, :]
+    lot, long_cap, short_cap = full['lot_qty'][None, :], full['long_qty_cap'][None, :], full['short_qty_cap'][None, :]
+    min_volume = full['min_volume'][None, :]
+
+    close = np.array([h.close for h in histories])  # (markets, time)
+    volume = np.array([h.volume for h in histories])
+    increment = np.array([float(h.market.increment) for h in histories])[:, None]
+    fee = np.array([float(h.market.take_fee) for h in histories])[:, None]
+    # cost per unit of price of a market buy at the ask / sell at the bid, taker fee included
+    buy_cost = (1 + spread / 2) * (1 + fee) - 1
+    sell_cost = 1 - (1 - spread / 2) * (1 - fee)
+
+    shape = (n_markets, n_params)
+    pos = np.zeros(shape)
+    equity = np.zeros(shape)
+    peak = np.zeros(shape)
+    max_drawdown = np.zeros(shape)
+    trades = np.zeros(shape)
+    for t in range(close.shape[1]):
+        price = close[:, t:t + 1]
+        if t:
+            equity += pos * (price - close[:, t - 1:t])
+        score = np.where(volume[:, t:t + 1] >= min_volume, scores[:, t:t + 1], 0.0)
+        go_long = score > long_thr
+        go_short = score < short_thr
+
+        base = np.maximum(pos, 0)
+        qty = np.minimum(lot, long_cap - base)
+        long_target = base + np.where(qty >= increment, qty, 0)
+        base = np.minimum(pos, 0)
+        qty = np.minimum(lot, short_cap + base)
+        short_target = base - np.where(qty >= increment, qty, 0)
+        target = np.where(go_long, long_target, np.where(go_short, short_target, 0.0))
+
+        traded = target - pos
+        equity -= np.where(traded > 0, traded * buy_cost, -traded * sell_cost) * price
+        trades += traded != 0
+        pos = target
+        np.maximum(peak, equity, out=peak)
+        np.maximum(max_drawdown, peak - equity, out=max_drawdown)
+    return SweepResult({p: np.asarray(v) for p, v in params.items()}, equity, max_drawdown, trades)
+
+
+def main():
+    from crypto.backtest import History
+    from crypto.structs import Market
+    import crypto.strategies.signal as signal
+
+    parser = argparse.ArgumentParser(description='Rank SignalConfig parameters over candle histories')
+    parser.add_argument('csv', nargs='+', help='SYMBOL=path of a time,open,high,low,close,volume csv')
+    parser.add_argument('--indicators', default='MACD,RSI,STOCHRSI,AROON_OSCILLATOR,MFI,CCI,CMO,MACD_HIST,WILLR')
+    parser.add_argument('--take-fee', type=float, default=0.001)
+    parser.add_argument('--increment', type=float, default=0.001)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--sort', default='pnl', choices=['pnl', 'max_drawdown', 'ratio'])
+    for p in PARAMS:
+        parser.add_argument('--' + p.replace('_', '-'), default=None, help='comma separated values')
+    args = parser.parse_args()
+
+    histories = []
+    for arg in args.csv:
+        symbol, path = arg.split('=', 1)
+        market = Market(symbol, '', symbol, args.increment, 0, args.take_fee)
+        histories.append(History.from_csv(path, market))
+    indicators = {name: getattr(signal, name) for name in args.indicators.split(',')}
+    values = {p: [float(v) for v in getattr(args, p).split(',')] for p in PARAMS if getattr(args, p)}
+    result = sweep(histories, score_matrix(histories, indicators), grid(**values))
+    print(json.dumps(result.table(args.sort, args.top), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import random
+import threading
+import logging
+import time
+from collections import OrderedDict, deque
+from crypto.serialization import Serializer
+from crypto.transport import Transport
+
+# message types that are events rather than snapshots; every one of them is delivered instead of only the latest
+EVENT_TYPES = {'error'}
+
+
+def nonce():
+    return ''.join([str(random.randint(0, 9)) for _ in range(10)])
+
+
+class Publisher(object):
+    """
+    Sends bot telemetry to the node backend from a background thread. Snapshot messages of the same type are
+    coalesced so only the newest one is sent, everything that is pending is batched into a single POST, and the
+    event queue is bounded so a slow backend can never block the trading thread. Messages are encoded when they are
+    published, so the caller is free to change the published objects afterwards.
+    """
+    def __init__(self, url, name, max_events=50, batch_interval=0.25, timeout=(1, 5)):
+        self.url = url
+        self.name = name
+        self.batch_interval = batch_interval
+        self.transport = Transport(timeout=timeout, pool_size=1)
+        self.serializer = Serializer()
+        self.snapshots = OrderedDict()
+        self.events = deque(maxlen=max_events)
+        self.published = 0
+        self.batches = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.failures = 0
+        self._cond = threading.Condition()
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name='publisher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def publish(self, data, type):
+        try:
+            msg = self.serializer.encode({'exchange': self.name, 'type': type, 'data': data, 'nonce': nonce()})
+        except Exception as e:
+            with self._cond:
+                self.failures += 1
+            logging.warning("Could not encode {} message: {}".format(type, e))
+            return
+        with self._cond:
+            if type in EVENT_TYPES:
+                if len(self.events) == self.events.maxlen:
+                    self.dropped += 1  # deque drops the oldest event
+                self.events.append(msg)
+            else:
+                if type in self.snapshots:
+                    self.coalesced += 1
+                    del self.snapshots[type]
+                self.snapshots[type] = msg
+            self._cond.notify()
+
+    def close(self, timeout=5):
+        # flush whatever is pending and stop the publisher thread
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        self.transport.close()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'published': self.published,
+                'batches': self.batches,
+                'coalesced': self.coalesced,
+                'dropped': self.dropped,
+                'failures': self.failures,
+                'pending': len(self.snapshots) + len(self.events),
+            }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not (self.snapshots or self.events or self._closing):
+                    self._cond.wait()
+                closing = self._closing
+            if not closing:
+                time.sleep(self.batch_interval)  # give the rest of a report() a chance to join the batch
+            with self._cond:
+                batch = list(self.events) + list(self.snapshots.values())
+                self.events.clear()
+                self.snapshots.clear()
+            if batch:
+                self._send(batch)
+            if closing:
+                return
+
+    def _send(self, batch):
+        if len(batch) == 1:
+            msg = batch[0]
+        else:
+            msg = '{"exchange":%s,"type":"batch","data":[%s],"nonce":"%s"}' % (
+                self.serializer.encode(self.name), ','.join(batch), nonce())
+        try:
+            msg = msg.encode('ascii')
+            self.transport.post(self.url, data=msg, headers={'content-type': 'application/json'})
+            with self._cond:
+                self.published += len(batch)
+                self.batches += 1
+        except Exception as e:
+            with self._cond:
+                self.failures += 1
+            logging.warning("Could not publish {} message(s): {}".format(len(batch), e))
@@ -0,0 +1,52 @@
+import datetime
+import functools
+import re
+
+NS = 10 ** 9
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+EPOCH_NAIVE = EPOCH.replace(tzinfo=None)
+
+# the layouts HitBTC and BitMEX send, e.g. 2017-05-15T17:01:05.092Z; no zone means UTC
+ISO_8601 = re.compile(r'(\d{4})-(\d\d)-(\d\d)[T ](\d\d):(\d\d):(\d\d)(?:\.(\d+))?(Z|[+-]\d\d:?\d\d)?$')
+
+
+@functools.lru_cache(maxsize=4096)
+def _day_ns(year, month, day):
+    return (datetime.date(year, month, day).toordinal() - 719163) * 86400 * NS  # 719163 is 1970-01-01
+
+
+@functools.lru_cache(maxsize=65536)
+def parse_ns(text):
+    """Epoch nanoseconds of an ISO-8601 timestamp. Repeated values (the same trades every report) hit the cache."""
+    m = ISO_8601.match(text)
+    if m is None:
+        import dateutil.parser  # anything else is rare, dateutil is only loaded for it
+        return to_ns(dateutil.parser.parse(text))
+    year, month, day, hour, minute, second, fraction, zone = m.groups()
+    ns = _day_ns(int(year), int(month), int(day)) + (int(hour) * 3600 + int(minute) * 60 + int(second)) * NS
+    if fraction:
+        ns += int(fraction[:9].ljust(9, '0'))
+    if zone and zone != 'Z':
+        offset = (int(zone[1:3]) * 3600 + int(zone[-2:]) * 60) * NS
+        ns += -offset if zone[0] == '+' else offset
+    return ns
+
+
+def to_ns(value):
+    # epoch nanoseconds of an int (already nanoseconds), a datetime (naive means UTC), a date or a timestamp string
+    if value is None or type(value) is int:
+        return value
+    if isinstance(value, str):
+        return parse_ns(value)
+    if isinstance(value, datetime.datetime):
+        epoch = EPOCH if value.tzinfo else EPOCH_NAIVE
+        return (value - epoch) // datetime.timedelta(microseconds=1) * 1000
+    if isinstance(value, datetime.date):
+        return _day_ns(value.year, value.month, value.day)
+    return int(value)
+
+
+def from_ns(ns):
+    if ns is None:
+        return None
+    return EPOCH + datetime.timedelta(microseconds=ns // 1000)
@@ -0,0 +1,149 @@
+import threading
+import time
+import weakref
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (3.05, 10)
+
+
+class HostStats(object):
+    def __init__(self, host):
+        self.host = host
+        self.requests = 0
+        self.errors = 0
+        self.new_connections = 0
+        self.elapsed = 0.0
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'new_connections': self.new_connections,
+            'reused': max(self.requests - self.new_connections, 0),
+            'mean_latency': self.elapsed / self.requests if self.requests else 0.0,
+        }
+
+
+class Transport(object):
+    """
+    HTTP transport shared by the exchange adapters. Every thread gets its own keep-alive session (requests.Session is
+    not thread safe), all requests get explicit connect/read timeouts and connection reuse is tracked per host.
+    An optional rate limiter is consulted before and updated after every request.
+    """
+    def __init__(self, auth=None, timeout=DEFAULT_TIMEOUT, pool_size=10, rate_limiter=None):
+        self.auth = auth
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._mounts = []
+        self._local = threading.local()
+        self._sessions = weakref.WeakSet()
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._new_session()
+            self._local.session = session
+            self._local.connections = {}
+            with self._lock:
+                self._sessions.add(session)
+        return session
+
+    def _new_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        for prefix, mock_adapter in self._mounts:
+            session.mount(prefix, mock_adapter)
+        session.auth = self.auth
+        return session
+
+    def mount(self, prefix, adapter):
+        self._mounts.append((prefix, adapter))
+        with self._lock:
+            sessions = list(self._sessions)
+        for s in sessions:
+            s.mount(prefix, adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        session = self.session
+        host = urlparse(url).netloc
+        stats = self._host_stats(host)
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        start = time.time()
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                stats.errors += 1
+            raise
+        finally:
+            elapsed = time.time() - start
+            with self._lock:
+                stats.requests += 1
+                stats.elapsed += elapsed
+        if self.rate_limiter:
+            self.rate_limiter.update(response)
+        self._count_connections(session, url, stats)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            return {host: s.as_dict() for host, s in self._stats.items()}
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions)
+            self._sessions = weakref.WeakSet()
+        for s in sessions:
+            s.close()
+        self._local = threading.local()
+
+    def _host_stats(self, host):
+        stats = self._stats.get(host)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(host, HostStats(host))
+        return stats
+
+    def _count_connections(self, session, url, stats):
+        # urllib3 counts the connections each pool has opened; the delta since the last request on this thread is
+        # the number of new TCP/TLS handshakes the request needed
+        poolmanager = getattr(session.get_adapter(url), 'poolmanager', None)
+        if poolmanager is None:
+            return  # mock adapters have no connection pool
+        parsed = urlparse(url)
+        opened = 0
+        for key in poolmanager.pools.keys():
+            if key.key_host == parsed.hostname and key.key_scheme == parsed.scheme:
+                pool = poolmanager.pools.get(key)
+                opened += pool.num_connections if pool else 0
+        seen = self._local.connections.get(stats.host, 0)
+        if opened > seen:
+            with self._lock:
+                stats.new_connections += opened - seen
+        self._local.connections[stats.host] = opened
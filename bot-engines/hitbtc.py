@@ -1,18 +1,23 @@
-from crypto import TradingBot
+import time
+started = time.perf_counter()
+from crypto import create_bot, startup_times
+import json
 import sys
 import logging
-import time
 
 
 def main():
+    if '--startup-time' in sys.argv[1:]:
+        # how long a restart takes before the bot starts trading, e.g. after a lazy import or cache change
+        print(json.dumps(startup_times('hitbtc', 'config.ini', started), indent=2))
+        return
     logging.basicConfig(filename='hitbtc.log', level=logging.INFO, format='%(asctime)s: %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p')
-    b = TradingBot('hitbtc', config_path='config.ini')
+    b = create_bot('hitbtc', config_path='config.ini')
     try:
         b.run()
     except (KeyboardInterrupt, SystemExit) as e:
         logging.info("Exiting program")
-        b.exchange.cancel(all=True)  # cancel orders one more time just to be sure
-        b.push([], 'active_orders')
+        b.close()
         sys.exit(0)
 
 
@@ -0,0 +1,9 @@
+# the tests keep their market metadata in a temporary directory instead of the user's cache; set before any test
+# module imports crypto.metadata
+import atexit
+import os
+import shutil
+import tempfile
+
+os.environ['MARKET_CACHE_DIR'] = tempfile.mkdtemp(prefix='market-cache-')
+atexit.register(shutil.rmtree, os.environ['MARKET_CACHE_DIR'], True)
@@ -0,0 +1,183 @@
+"""
+Microbenchmarks of the bot's hot paths: the indicator functions of signal.py at several window sizes,
+SignalStrategy.get_input, the adapters' _to_order/_to_trade/_to_candle converters and json.dumps of report()
+payloads. Results are written as JSON keyed by benchmark name so runs can be compared. Run from bot-engines:
+
+    python -m tests.bench --output before.json
+    python -m tests.bench --output after.json --compare before.json
+"""
+import argparse
+import datetime as dt
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+import timeit
+import numpy as np
+from crypto.structs import Market, Candle, Order
+from crypto.helpers import serialize_obj
+import crypto.strategies.signal as signal
+from tests.bench_serialization import report_payloads
+
+FORMAT = 1
+WINDOWS = (50, 100, 500)
+ITEMS = 100  # items per converted payload
+INDICATORS = ['MACD', 'RSI', 'STOCHRSI', 'AROON_OSCILLATOR', 'MFI', 'CCI', 'CMO', 'MACD_HIST', 'WILLR']
+
+
+def random_inputs(n, seed=1):
+    rng = np.random.RandomState(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return {
+        'open': close + rng.normal(0, .5, n),
+        'high': close + rng.uniform(0, 2, n),
+        'low': close - rng.uniform(0, 2, n),
+        'close': close,
+        'volume': rng.uniform(1, 100, n),
+    }
+
+
+def indicator_cases():
+    cases = {}
+    for window in WINDOWS:
+        inputs = random_inputs(window)
+        for name in INDICATORS:
+            cases['signal.{}[{}]'.format(name, window)] = lambda f=getattr(signal, name), i=inputs: f(i)
+    return cases
+
+
+def get_input_cases():
+    cases = {}
+    market = Market('ETH', 'BTC', 'ETHBTC', 0.001, 0, 0.001)
+    for window in WINDOWS:
+        strategy = signal.SignalStrategy(None, {}, {}, window=window)
+        inputs = random_inputs(window)
+        rows = zip(inputs['open'], inputs['high'], inputs['low'], inputs['close'], inputs['volume'])
+        start = dt.datetime(2018, 1, 1, tzinfo=dt.timezone.utc)
+        strategy.candles['ETHBTC'] = signal.CandleBuffer(window)
+        strategy.candles['ETHBTC'].extend(Candle(market, *row, time=start + dt.timedelta(minutes=t))
+                                          for t, row in enumerate(rows))
+        cases['SignalStrategy.get_input[{}]'.format(window)] = lambda s=strategy: s.get_input(market)
+    return cases
+
+
+def converter_cases():
+    # HitBTC on the recorded sample responses, candles and everything BitMEX from the matching engine mocks; every
+    # payload is repeated up to ITEMS items
+    from crypto import HitBTCExchange, BitMEXExchange
+    from crypto.hitbtc import sample_responses
+    from crypto.hitbtc.mock import mocker as hitbtc_mocker
+    from crypto.bitmex.mock import mocker as bitmex_mocker
+    cases = {}
+    hitbtc_mocker.reset(0)
+    hitbtc = HitBTCExchange('https://api.hitbtc.com/api/2', 'bench', 's', ['ETHBTC', 'LTCBTC'], True)
+    market = hitbtc.markets['ETHBTC']
+    hitbtc_mocker.engine.step(steps=500)
+    orders = json.loads(sample_responses.orders_res)
+    trades = json.loads(sample_responses.market_trades_res)
+    candles = hitbtc._candles('ETHBTC', limit=100)[1]
+
+    bitmex_mocker.reset(0)
+    bitmex = BitMEXExchange('https://www.bitmex.com/api/v1', 'bench', 's', ['XBTUSD'], True)
+    xbtusd = bitmex.markets['XBTUSD']
+    bid = bitmex.ticker(xbtusd).bid
+    for i in range(20):
+        bitmex.bid(xbtusd, bid - 500 - i, 100)  # resting well below the market
+        bitmex.ask(xbtusd, None, 10)
+    bitmex_mocker.engine.step(steps=500)
+    bitmex_orders = bitmex._active_orders()[1]
+    bitmex_trades = bitmex._filled_orders('XBTUSD')[1]
+    bitmex_candles = bitmex._trades_bucketed('XBTUSD', count=100)[1]
+    for name, convert, payload in [('hitbtc._to_order', hitbtc._to_order, orders),
+                                   ('hitbtc._to_trade', lambda d: hitbtc._to_trade(d, market), trades),
+                                   ('hitbtc._to_candle', lambda d: hitbtc._to_candle(d, market), candles),
+                                   ('bitmex._to_order', bitmex._to_order, bitmex_orders),
+                                   ('bitmex._to_trade', bitmex._to_trade, bitmex_trades),
+                                   ('bitmex._to_candle', bitmex._to_candle, bitmex_candles)]:
+        payload = (payload * ITEMS)[:ITEMS]
+        cases['{}[{}]'.format(name, ITEMS)] = lambda c=convert, p=payload: [c(d) for d in p]
+    return cases
+
+
+def serialization_cases():
+    payloads = report_payloads()
+    rng = random.Random(0)
+    now = dt.datetime.now(dt.timezone.utc)
+    markets = [Market('C{}'.format(i), 'BTC', 'C{}BTC'.format(i), .001, 0, .001) for i in range(10)]
+    payloads['active_orders'] = [Order('{:032x}'.format(rng.getrandbits(128)), m, side, rng.random(), rng.random(),
+                                       now) for m in markets for side in ('buy', 'sell')]
+    payloads['status'] = {'strategy': 'Basic', 'markets': {m.counter + '_BTC': True for m in markets}, 'skipped': []}
+    return {'json.dumps[{}]'.format(name): lambda p=payload: json.dumps(p, default=serialize_obj)
+            for name, payload in payloads.items()}
+
+
+def cases():
+    suite = {}
+    for group in (indicator_cases, get_input_cases, converter_cases, serialization_cases):
+        suite.update(group())
+    return suite
+
+
+def measure(fn, min_time=0.2, repeat=5):
+    # seconds per call: the best and the median of `repeat` rounds of `number` calls, each round >= min_time
+    timer = timeit.Timer(fn)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 10 if number < 1000 else 2
+    rounds = [t / number for t in timer.repeat(repeat, number)]
+    return {'best': min(rounds), 'median': statistics.median(rounds), 'number': number, 'repeat': repeat}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(suite, pattern=None, min_time=0.2, repeat=5):
+    results = {name: measure(fn, min_time, repeat) for name, fn in sorted(suite.items())
+               if not pattern or pattern in name}
+    meta = {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+            'platform': platform.platform(), 'commit': git_commit(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+    return {'format': FORMAT, 'meta': meta, 'results': results}
+
+
+def compare(old, new):
+    # one row per benchmark in both runs: old and new best time per call and the ratio new / old
+    rows = []
+    for name in sorted(set(old['results']) & set(new['results'])):
+        before, after = old['results'][name]['best'], new['results'][name]['best']
+        rows.append((name, before, after, after / before))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmarks of indicators, converters and serialization')
+    parser.add_argument('--output', default=None, help='write the JSON results here')
+    parser.add_argument('--compare', default=None, help='JSON results of an earlier run to compare with')
+    parser.add_argument('--filter', default=None, help='only benchmarks whose name contains this')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per timing round')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    results = run(cases(), args.filter, args.min_time, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(json.dumps(results, indent=2, sort_keys=True) + '\n')
+    print('{:<40}{:>14}{:>14}'.format('benchmark', 'best (us)', 'median (us)'))
+    for name, r in results['results'].items():
+        print('{:<40}{:>14.2f}{:>14.2f}'.format(name, r['best'] * 1e6, r['median'] * 1e6))
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        print('\n{:<40}{:>14}{:>14}{:>10}'.format('benchmark', 'before (us)', 'after (us)', 'ratio'))
+        for name, before, after, ratio in compare(old, results):
+            print('{:<40}{:>14.2f}{:>14.2f}{:>9.2f}x'.format(name, before * 1e6, after * 1e6, ratio))
+
+
+if __name__ == '__main__':
+    main()
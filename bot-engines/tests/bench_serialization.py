@@ -0,0 +1,43 @@
+"""
+Compares the telemetry Serializer with the json.dumps(payload, default=serialize_obj) path it replaced on report
+sized payloads. Run from bot-engines: python -m tests.bench_serialization
+"""
+import datetime as dt
+import json
+import random
+import timeit
+from crypto.structs import Market, Trade, OrderBook, Entry, Balance
+from crypto.helpers import serialize_obj
+from crypto.serialization import Serializer
+
+
+def report_payloads(markets=10, depth=10, trades=100, seed=0):
+    rng = random.Random(seed)
+    now = dt.datetime.now(dt.timezone.utc)
+    ms = [Market('C{}'.format(i), 'BTC', 'C{}BTC'.format(i), .001, 0, .001) for i in range(markets)]
+    books = {m.counter + '_BTC': OrderBook([Entry(rng.random(), rng.random() * 100) for _ in range(depth)],
+                                           [Entry(rng.random(), rng.random() * 100) for _ in range(depth)])
+             for m in ms}
+    fills = {m.counter + '_BTC': [Trade(rng.randint(1, 10 ** 9), rng.randint(1, 10 ** 9), m, 'buy', rng.random(),
+                                        rng.random(), now - dt.timedelta(seconds=7 * i)) for i in range(trades)]
+             for m in ms}
+    balance = {'BTC': Balance(1.5, 0.2), 'ETH': Balance(30.85, 0)}
+    batch = {'exchange': 'bench', 'type': 'batch', 'nonce': '0', 'data': [
+        {'exchange': 'bench', 'type': t, 'data': d, 'nonce': '0'}
+        for t, d in [('orderbooks', books), ('trades', fills), ('balance', balance)]]}
+    return {'orderbooks': books, 'trades': fills, 'batch': batch}
+
+
+def main(repeat=5, number=20):
+    serializer = Serializer()
+    print('{:<12}{:>14}{:>14}{:>10}'.format('payload', 'json (ms)', 'compiled (ms)', 'speedup'))
+    for name, payload in report_payloads().items():
+        assert json.loads(serializer.dumps(payload)) == json.loads(json.dumps(payload, default=serialize_obj))
+        old = min(timeit.repeat(lambda: json.dumps(payload, default=serialize_obj).encode(), repeat=repeat,
+                                number=number)) / number
+        new = min(timeit.repeat(lambda: serializer.dumps(payload), repeat=repeat, number=number)) / number
+        print('{:<12}{:>14.3f}{:>14.3f}{:>9.1f}x'.format(name, old * 1e3, new * 1e3, old / new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# test doubles shared by the test modules
+import base64
+import hashlib
+import json
+import socket
+import struct
+import threading
+import time
+
+
+class Recorder(object):
+    # publisher keeping every published message as (type, data)
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, data, type):
+        self.messages.append((type, data))
+
+    def close(self, timeout=5):
+        pass
+
+    def types(self):
+        return [t for t, _ in self.messages]
+
+    def latest(self, type):
+        return next((d for t, d in reversed(self.messages) if t == type), None)
+
+
+def wait_until(condition, timeout=5):
+    # polls condition() until it holds; False if it still doesn't after timeout seconds
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(.01)
+    return True
+
+
+GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+class StandInServer(object):
+    """Minimal websocket server that replays recorded messages once the client has subscribed."""
+    def __init__(self, messages):
+        self.messages = messages
+        self.received = []
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(1)
+        self.url = 'ws://127.0.0.1:{}/api/2/ws'.format(self.sock.getsockname()[1])
+        self.conn = None
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        self.conn, _ = self.sock.accept()
+        request = b''
+        while b'\r\n\r\n' not in request:
+            request += self.conn.recv(1024)
+        key = [l.split(b':', 1)[1].strip() for l in request.split(b'\r\n') if l.lower().startswith(b'sec-websocket-key')][0]
+        accept = base64.b64encode(hashlib.sha1(key + GUID.encode()).digest())
+        self.conn.sendall(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                          b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+        self.received.append(self.read_frame())
+        for message in self.messages:
+            self.send(message)
+        while True:
+            frame = self.read_frame()
+            if frame is None:
+                self.conn.close()
+                return
+            self.received.append(frame)
+
+    def send(self, message):
+        data = message.encode()
+        header = struct.pack('!BB', 0x81, len(data)) if len(data) < 126 else struct.pack('!BBH', 0x81, 126, len(data))
+        self.conn.sendall(header + data)
+
+    def recv_exactly(self, n):
+        data = b''
+        while len(data) < n:
+            chunk = self.conn.recv(n - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def read_frame(self):
+        header = self.recv_exactly(2)
+        if header is None or header[0] & 0x0f == 0x8:
+            return None
+        length = header[1] & 0x7f
+        if length == 126:
+            length = struct.unpack('!H', self.recv_exactly(2))[0]
+        mask = self.recv_exactly(4)
+        payload = self.recv_exactly(length)
+        return json.loads(bytes(b ^ mask[i % 4] for i, b in enumerate(payload)).decode())
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+        self.sock.close()
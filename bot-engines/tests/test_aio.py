@@ -0,0 +1,287 @@
+import asyncio
+import base64
+import json
+import time
+import unittest
+import uuid
+from aiohttp import web
+import crypto.hitbtc.sample_responses as responses
+from crypto import AsyncHitBTCExchange, AsyncBasicStrategy, AsyncSignalStrategy, AsyncTradingBot, Market
+from crypto.scheduler import Scheduler
+from crypto.strategies.quotes import AsyncQuoteManager
+from crypto.bitmex.auth import APIKeyAuthWithExpires
+from crypto.structs import Balance, Entry, OrderBook
+from tests.helpers import Recorder
+
+
+class StandInHitBTC(object):
+    """Local HTTP server answering the HitBTC endpoints the async adapter uses."""
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.orders = []
+        self.placed = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.auth = []
+        app = web.Application()
+        app.router.add_get('/api/2/public/symbol/', self.symbols)
+        app.router.add_get('/api/2/public/ticker/{symbol}', self.ticker)
+        app.router.add_get('/api/2/public/orderbook/{symbol}', self.text(responses.orderbook_res))
+        app.router.add_get('/api/2/trading/balance', self.text(responses.balance_res))
+        app.router.add_get('/api/2/history/trades', self.text('[]'))
+        app.router.add_get('/api/2/order/', self.active_orders)
+        app.router.add_post('/api/2/order', self.order)
+        app.router.add_delete('/api/2/order', self.cancel)
+        app.router.add_patch('/api/2/order/{id}', self.replace)
+        self.runner = web.AppRunner(app)
+
+    async def start(self):
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return 'http://127.0.0.1:{}/api/2'.format(port)
+
+    def text(self, body):
+        async def handler(request):
+            return web.Response(text=body, content_type='application/json')
+        return handler
+
+    async def symbols(self, request):
+        return web.json_response([{'id': s, 'baseCurrency': s[:3], 'quoteCurrency': s[3:], 'quantityIncrement': '0.001',
+                                   'provideLiquidityRate': '-0.0001', 'takeLiquidityRate': '0.001'}
+                                  for s in ['ETHBTC', 'LTCBTC', 'ETCBTC']])
+
+    async def ticker(self, request):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        data = json.loads(responses.ticker_res)[0]
+        data['symbol'] = request.match_info['symbol']
+        return web.json_response(data)
+
+    async def active_orders(self, request):
+        return web.json_response(self.orders)
+
+    async def order(self, request):
+        self.auth.append(request.headers.get('Authorization'))
+        form = await request.post()
+        order = json.loads(responses.bid_res)
+        order.update(symbol=form['symbol'], side=form['side'], price=form['price'], quantity=form['quantity'],
+                     clientOrderId=uuid.uuid4().hex)
+        self.orders.append(order)
+        self.placed += 1
+        return web.json_response(order)
+
+    async def replace(self, request):
+        form = await request.post()
+        for order in self.orders:
+            if order['clientOrderId'] == request.match_info['id']:
+                order.update(clientOrderId=form['requestClientId'], price=form['price'], quantity=form['quantity'])
+                return web.json_response(order)
+        return web.json_response({'error': {'code': 20002, 'message': 'Order not found'}}, status=400)
+
+    async def cancel(self, request):
+        form = await request.post()
+        cancelled = [o for o in self.orders if 'symbol' not in form or o['symbol'] == form['symbol']]
+        self.orders = [o for o in self.orders if o not in cancelled]
+        return web.json_response(cancelled)
+
+
+class LoopTestCase(unittest.TestCase):
+    # a fresh event loop per test (IsolatedAsyncioTestCase needs Python 3.8, the bots run on 3.6)
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+
+class TestAsyncHitBTC(LoopTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = StandInHitBTC(delay=0.2)
+        url = self.run_async(self.server.start())
+        self.exchange = AsyncHitBTCExchange(url, 'key', 'secret', ['ETHBTC', 'LTCBTC'])
+        self.run_async(self.exchange.load_markets())
+
+    def tearDown(self):
+        self.run_async(self.exchange.close())
+        self.run_async(self.server.runner.cleanup())
+        super().tearDown()
+
+    def test_interface(self):
+        self.assertEqual(sorted(self.exchange.markets), ['ETHBTC', 'LTCBTC'])
+        market = self.exchange.markets['ETHBTC']
+        book = self.run_async(self.exchange.order_book(market))
+        self.assertEqual(book.asks[0].rate, 0.046002)
+        self.assertIn('BTC', self.run_async(self.exchange.balance()))
+
+        order = self.run_async(self.exchange.bid(market, '0.05', '0.01'))
+        self.assertEqual((order.side, order.rate, order.market), ('buy', 0.05, market))
+        self.assertEqual(self.server.auth[-1], 'Basic ' + base64.b64encode(b'key:secret').decode())
+        self.assertEqual(len(self.run_async(self.exchange.orders())), 1)
+        self.assertEqual(len(self.run_async(self.exchange.cancel(market=market))), 1)
+        self.assertEqual(self.run_async(self.exchange.orders()), [])
+
+    def test_amend(self):
+        market = self.exchange.markets['ETHBTC']
+        order = self.run_async(self.exchange.ask(market, '0.05', '0.01'))
+        amended = self.run_async(self.exchange.amend(order, '0.051', '0.01'))
+        self.assertEqual((amended.side, amended.rate), ('sell', 0.051))
+        self.assertEqual([o['clientOrderId'] for o in self.server.orders], [amended.order_id])
+        with self.assertLogs(level='ERROR'):
+            self.assertIsNone(self.run_async(self.exchange.amend(order, '0.052', '0.01')))  # replaced already
+
+    def test_quote_manager(self):
+        market = self.exchange.markets['ETHBTC']
+        quotes = AsyncQuoteManager(self.exchange)
+        self.run_async(asyncio.gather(quotes.quote(market, 'buy', 0.049, 0.01),
+                                      quotes.quote(market, 'sell', 0.051, 0.01)))
+        self.assertIsNone(self.run_async(quotes.quote(market, 'buy', 0.0491, 0.01, tolerance=0.0005)))
+        self.assertEqual(self.run_async(quotes.quote(market, 'sell', 0.052, 0.01)).rate, 0.052)
+        self.assertEqual(quotes.counts, {'placed': 2, 'amended': 1, 'kept': 1})
+        self.assertEqual(sorted(o['price'] for o in self.server.orders), ['0.049', '0.052'])
+
+        self.server.orders.pop()  # filled
+        self.run_async(quotes.refresh(force=True))
+        self.assertEqual(len(quotes.quotes), 1)
+        self.run_async(quotes.cancel(market))
+        self.assertEqual((quotes.quotes, self.server.orders), ({}, []))
+
+    def test_requests_share_one_loop(self):
+        market = self.exchange.markets['ETHBTC']
+        start = time.time()
+        tickers = self.run_async(asyncio.gather(*[self.exchange.ticker(market) for _ in range(200)]))
+        elapsed = time.time() - start
+        self.assertEqual(len(tickers), 200)
+        self.assertTrue(all(t.market == market for t in tickers))
+        self.assertGreater(self.server.max_in_flight, 50)
+        self.assertLess(elapsed, 0.25 * 200 * self.server.delay)  # 200 sequential requests would take 40s
+        stats = self.exchange.session.stats()
+        self.assertEqual(sum(s['errors'] for s in stats.values()), 0)
+        self.assertLessEqual(sum(s['new_connections'] for s in stats.values()), 100)
+
+
+class TestAsyncTradingBot(LoopTestCase):
+    def run_bot(self, server, bot, seconds=0.5):
+        try:
+            self.run_async(bot.main(end_time=time.time() + seconds))
+        finally:
+            self.run_async(server.runner.cleanup())
+
+    def test_loop(self):
+        server = StandInHitBTC()
+        url = self.run_async(server.start())
+        exchange = AsyncHitBTCExchange(url, 'key', 'secret', ['ETHBTC', 'LTCBTC', 'ETCBTC'])
+        strategy = AsyncBasicStrategy(exchange, {s: ['0.01'] for s in ['ETHBTC', 'LTCBTC', 'ETCBTC']})
+        publisher = Recorder()
+        bot = AsyncTradingBot('hitbtc', exchange, strategy, publisher=publisher, input_timeout=None,
+                              intervals={'strategy': 0.05, 'orderbooks': 0.05})
+        self.run_bot(server, bot)
+
+        types = [t for t, _ in publisher.messages]
+        self.assertIn('orderbooks', types)
+        books = [d for t, d in publisher.messages if t == 'orderbooks'][-1]
+        self.assertEqual(sorted(books), ['ETC_BTC', 'ETH_BTC', 'LTC_BTC'])
+        self.assertEqual(publisher.messages[-1], ('active_orders', []))
+        self.assertEqual(server.orders, [])  # cancelled on the way out
+        self.assertEqual(server.placed, 6)  # the ticker doesn't move, so the quotes are kept after the first loop
+        self.assertGreater(len(server.auth), 0)
+
+    def test_failing_signals_dont_stop_the_loop(self):
+        server = StandInHitBTC()
+        url = self.run_async(server.start())
+        exchange = AsyncHitBTCExchange(url, 'key', 'secret', ['ETHBTC'])
+        publisher = Recorder()
+        bot = AsyncTradingBot('hitbtc', exchange, FailingSignals(exchange, {'ETHBTC': ['0.01']}), publisher=publisher,
+                              input_timeout=None, intervals={'strategy': 0.05, 'orderbooks': 0.05, 'signals': 0.05})
+        with self.assertLogs(level='ERROR'):
+            self.run_bot(server, bot)
+
+        self.assertNotIn('error', publisher.types())
+        self.assertGreater(bot.scheduler.stats()['strategy']['runs'], 3)
+        self.assertIn('signals/ETH_BTC', publisher.latest('status')['skipped'])
+        self.assertIn('ETH_BTC', publisher.latest('orderbooks'))
+
+
+class FailingSignals(AsyncBasicStrategy):
+    def signals(self, market):
+        raise Exception('no candles yet')
+
+
+class Placing(object):
+    # async exchange double recording the orders placed
+    def __init__(self):
+        self.placed = []
+
+    async def bid(self, market, rate, quantity):
+        self.placed.append(('buy', rate, quantity))
+
+    async def ask(self, market, rate, quantity):
+        self.placed.append(('sell', rate, quantity))
+
+
+class TestAsyncSignalStrategy(LoopTestCase):
+    def test_orders(self):
+        exchange = Placing()
+        strategy = AsyncSignalStrategy(exchange, {'ETHBTC': [1, 1, .1, .2, -.2, 0]}, {})
+        market = Market('ETH', 'BTC', 'ETHBTC', .001, 0, .001)
+        balance = {'BTC': Balance(10, 0)}
+        book = OrderBook([Entry(0.051, 1)], [Entry(0.049, 1)])
+        self.run_async(strategy.open_longs(market, -0.5, balance, book))
+        self.assertEqual(exchange.placed, [('buy', None, 0.5), ('buy', None, 0.1)])  # closes the short first
+        self.run_async(strategy.open_shorts(market, 0.95, balance, book))
+        self.assertEqual(exchange.placed[2:], [('sell', None, 0.95), ('sell', None, 0.1)])
+        self.run_async(strategy.close_positions(market, 0))
+        self.assertEqual(len(exchange.placed), 4)
+
+
+class TestAsyncScheduler(LoopTestCase):
+    def test_cadences(self):
+        scheduler = Scheduler()
+        stop = asyncio.Event()
+        counts = {'fast': 0, 'slow': 0}
+
+        async def count(name, duration=0.0):
+            counts[name] += 1
+            await asyncio.sleep(duration)
+        scheduler.add('fast', lambda: count('fast'), 0.01)
+        scheduler.add('slow', lambda: count('slow', duration=0.2), 0.1)  # only holds itself back
+        self.loop.call_later(0.35, stop.set)
+        self.run_async(scheduler.run_async(stop))
+        self.assertGreater(counts['fast'], 15)
+        self.assertEqual(counts['slow'], 2)
+
+    def test_error_stops_every_task(self):
+        scheduler = Scheduler()
+        runs = []
+
+        async def fail():
+            raise Exception('lost the exchange')
+
+        async def run():
+            runs.append(1)
+        scheduler.add('fail', fail, 0.1)
+        scheduler.add('other', run, 0.01)
+        with self.assertRaises(Exception):
+            self.run_async(scheduler.run_async(asyncio.Event()))
+        ran = len(runs)
+        self.run_async(asyncio.sleep(0.05))
+        self.assertEqual(len(runs), ran)  # the other task was cancelled
+
+
+class TestSignedHeaders(unittest.TestCase):
+    def test_headers_match_request_signing(self):
+        auth = APIKeyAuthWithExpires('key', 'secret')
+        headers = auth.headers('GET', 'https://www.bitmex.com/api/v1/instrument?symbol=XBTUSD', '')
+        expected = auth.generate_signature('secret', 'GET', '/api/v1/instrument?symbol=XBTUSD',
+                                           int(headers['api-expires']), '')
+        self.assertEqual(headers['api-signature'], expected)
+        self.assertEqual(headers['api-key'], 'key')
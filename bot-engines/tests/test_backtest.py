@@ -0,0 +1,89 @@
+import logging
+import unittest
+import numpy as np
+from crypto import BasicStrategy, SignalStrategy, Market, MACD, RSI, CCI, WILLR
+from crypto.backtest import History, SimulatedExchange, Backtest
+
+
+def history(n=500, fee=0.001, seed=0):
+    rng = np.random.RandomState(seed)
+    close = 0.05 * np.exp(np.cumsum(rng.normal(0, .002, n)))
+    times = 1514764800 + 60 * np.arange(n)
+    market = Market('ETH', 'BTC', 'ETHBTC', .001, fee / 2, fee)
+    return History(market, times, close, close * 1.002, close * .998, close, rng.uniform(1, 100, n))
+
+
+class TestSimulatedExchange(unittest.TestCase):
+    def setUp(self):
+        self.h = history()
+        self.e = SimulatedExchange([self.h], balances={'BTC': 1.0})
+        self.m = self.h.market
+        self.e.advance(10)
+
+    def test_market_order_pays_taker_fee(self):
+        self.e.bid(self.m, rate=None, quantity=2)
+        ask = self.h.close[10] * (1 + self.e.spread / 2)
+        self.assertEqual(self.e.position(self.m), 2)
+        self.assertAlmostEqual(self.e.fees, 2 * ask * 0.001)
+        self.assertAlmostEqual(self.e.balance()['BTC'].available, 1.0 - 2 * ask * 1.001)
+
+    def test_resting_limit_order(self):
+        rate = self.h.close[10] * .99
+        self.h.low[11] = rate * .99
+        order = self.e.bid(self.m, rate=rate, quantity=1)
+        self.assertEqual(len(self.e.orders()), 1)
+        self.assertAlmostEqual(self.e.balance()['BTC'].reserved, rate)
+        self.e.advance(11)
+        self.assertEqual(self.e.orders(), [])
+        self.assertEqual(self.e.position(self.m), 1)
+        self.assertAlmostEqual(self.e.fees, rate * 0.0005)
+        self.assertEqual(self.e.trades(self.m)[-1].order_id, order.order_id)
+
+    def test_cancel(self):
+        self.e.ask(self.m, rate=self.h.close[10] * 2, quantity=1)
+        self.assertEqual(len(self.e.cancel(market=self.m)), 1)
+        self.assertEqual(self.e.orders(), [])
+
+    def test_ticker_follows_bars(self):
+        ticker = self.e.ticker(self.m)
+        self.assertIs(self.e.ticker(self.m), ticker)  # built once per bar
+        self.assertEqual(ticker.last, self.h.close[10])
+        self.e.advance(11)
+        self.assertEqual(self.e.ticker(self.m).last, self.h.close[11])
+        self.assertEqual(self.e.order_book(self.m).bids[0].rate, self.e.ticker(self.m).bid)
+
+    def test_candles_only_up_to_clock(self):
+        candles = self.e.candles(self.m, limit=5)
+        self.assertEqual(len(candles), 5)
+        self.assertEqual(candles[-1].time.timestamp(), self.h.times[10])
+        self.assertGreater(self.e.time(), self.h.times[10] + 60)
+
+
+class TestBacktest(unittest.TestCase):
+    def test_basic_strategy(self):
+        h = history()
+        e = SimulatedExchange([h], balances={'BTC': 1.0})
+        strategy = BasicStrategy(e, {'ETHBTC': ['0.01']})
+        warnings = []
+        handler = logging.Handler(logging.WARNING)
+        handler.emit = warnings.append
+        logging.getLogger().addHandler(handler)
+        try:
+            result = Backtest(e, strategy, warmup=1).run()
+        finally:
+            logging.getLogger().removeHandler(handler)
+        self.assertEqual(len(result.equity), len(h))
+        self.assertGreater(result.summary()['fills'], 0)
+        self.assertEqual(strategy.quotes.synced, e.time())  # filled quotes are noticed on the simulated clock
+        self.assertEqual(warnings, [])
+
+    def test_signal_strategy_is_deterministic(self):
+        summaries = []
+        for _ in range(2):
+            h = history(1000)
+            e = SimulatedExchange([h], balances={'BTC': 1.0})
+            s = SignalStrategy(e, {'ETHBTC': [1, 1, .1, .2, -.2, 0]}, {'MACD': MACD, 'RSI': RSI, 'CCI': CCI,
+                                                                        'WILLR': WILLR})
+            summaries.append(Backtest(e, s).run().summary())
+        self.assertEqual(summaries[0], summaries[1])
+        self.assertEqual(len(s.candles['ETHBTC']), 100)
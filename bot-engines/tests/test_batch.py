@@ -0,0 +1,123 @@
+import json
+import threading
+import unittest
+from unittest import mock
+from urllib.parse import parse_qs
+import requests_mock
+from crypto import HitBTCExchange, BitMEXExchange
+from crypto.engine import Exchange
+from crypto.hitbtc.mock import mocker
+from crypto.metrics import registry
+
+INSTRUMENT = {"symbol": "XBTUSD", "positionCurrency": "USD", "underlying": "XBT", "lotSize": 1,
+              "makerFee": -0.00025, "takerFee": 0.00075}
+
+
+def ladder(markets, levels, mid=0.05, step=0.0001, quantity=0.001):
+    orders = []
+    for market in markets:
+        for i in range(1, levels + 1):
+            orders.append((market, 'buy', round(mid - i * step, 8), quantity))
+            orders.append((market, 'sell', round(mid + i * step, 8), quantity))
+    return orders
+
+
+def requests_to(endpoint):
+    counts = [s['count'] for s in registry.snapshot() if s['name'] == 'api_request_seconds' and
+              s['labels']['endpoint'] == endpoint]
+    return sum(counts)
+
+
+class TestHitBTCBatch(unittest.TestCase):
+    def setUp(self):
+        mocker.reset()
+        self.exchange = HitBTCExchange('https://api.hitbtc.com/api/2', 'k', 's', ['ETHBTC', 'LTCBTC'], True)
+        registry.reset()
+
+    def test_place_many(self):
+        markets = list(self.exchange.markets.values())
+        orders = ladder(markets, 10)
+        threads = set()
+        create = self.exchange._order_create
+
+        def record(*args, **kwargs):
+            threads.add(threading.get_ident())
+            return create(*args, **kwargs)
+        with mock.patch.object(self.exchange, '_order_create', record):
+            placed = self.exchange.place_many(orders)
+        self.assertEqual(len(placed), 40)
+        self.assertEqual([(o.market.symbol, o.side, o.rate) for o in placed],
+                         [(m.symbol, side, rate) for m, side, rate, _ in orders])
+        self.assertGreater(len(threads), 1)
+
+    def test_cancel_many(self):
+        placed = self.exchange.place_many(ladder([self.exchange.markets['ETHBTC']], 2))
+        with self.assertLogs(level='ERROR'):
+            cancelled = self.exchange.cancel_many([placed[0].order_id, 'x' * 32, placed[3].order_id])
+        self.assertEqual([o and o.order_id for o in cancelled], [placed[0].order_id, None, placed[3].order_id])
+        self.assertEqual(requests_to('_order_cancel'), 3)
+        self.assertEqual(len(self.exchange.orders()), 2)
+
+    def test_shared_executor(self):
+        other = HitBTCExchange('https://api.hitbtc.com/api/2', 'k', 's', ['ETHBTC'], True)
+        self.assertIs(other.executor, self.exchange.executor)
+
+    def test_cancel_and_place_again(self):
+        # the fallback amend of exchanges without an amend endpoint
+        order = self.exchange.bid(self.exchange.markets['ETHBTC'], 0.05, 0.001)
+        amended = Exchange.amend(self.exchange, order, 0.04, 0.001)
+        self.assertEqual([o.order_id for o in self.exchange.orders()], [amended.order_id])
+        with self.assertLogs(level='INFO'):
+            self.assertIsNone(Exchange.amend(self.exchange, order, 0.03, 0.001))  # gone already
+        self.assertEqual([o.rate for o in self.exchange.orders()], [0.04])
+
+
+class TestBitMEXBatch(unittest.TestCase):
+    def setUp(self):
+        self.server = requests_mock.Mocker()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.server.get('https://www.bitmex.com/api/v1/instrument/active', json=[INSTRUMENT])
+        self.exchange = BitMEXExchange('https://www.bitmex.com/api/v1', 'k', 's', ['XBTUSD'])
+        self.market = self.exchange.markets['XBTUSD']
+        registry.reset()
+
+    @staticmethod
+    def bulk(request, context):
+        orders = json.loads(parse_qs(request.body)['orders'][0])
+        return [dict(o, orderID='id{}'.format(i), timestamp='2018-01-01T00:00:00.000Z',
+                     ordStatus='Rejected' if o['orderQty'] > 100 else 'New', ordRejReason='Too big')
+                for i, o in enumerate(orders)]
+
+    def test_place_many(self):
+        self.server.post('https://www.bitmex.com/api/v1/order/bulk', json=self.bulk)
+        orders = ladder([self.market], 60, mid=9000, step=0.5, quantity=10)
+        orders[3] = (self.market, 'sell', 9100, 1000)
+        with self.assertLogs(level='WARNING'):
+            placed = self.exchange.place_many(orders)
+        self.assertEqual(len(placed), 120)
+        self.assertIsNone(placed[3])
+        self.assertEqual((placed[0].side, placed[0].rate, placed[119].side), ('buy', 8999.5, 'sell'))
+        self.assertEqual(requests_to('_order_bulk'), 2)  # 100 orders per request
+
+    def test_failed_batch(self):
+        self.server.post('https://www.bitmex.com/api/v1/order/bulk', status_code=400,
+                         json={'error': {'message': 'Invalid orders', 'name': 'HTTPError'}})
+        with self.assertLogs(level='ERROR'):
+            self.assertEqual(self.exchange.place_many(ladder([self.market], 2)), [None] * 4)
+
+    def test_cancel_many(self):
+        def cancel(request, context):
+            ids = json.loads(parse_qs(request.body)['orderID'][0])
+            return [{'orderID': i, 'symbol': 'XBTUSD', 'side': 'Buy', 'price': 9000, 'orderQty': 1,
+                     'timestamp': '2018-01-01T00:00:00.000Z', 'error': 'Not Found' if i == 'gone' else None}
+                    for i in reversed(ids)]
+        self.server.delete('https://www.bitmex.com/api/v1/order', json=cancel)
+        with self.assertLogs(level='WARNING'):
+            cancelled = self.exchange.cancel_many(['a', 'gone', 'b'])
+        self.assertEqual([o and o.order_id for o in cancelled], ['a', None, 'b'])
+        self.assertEqual(requests_to('_cancel'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import json
+import unittest
+from tests import bench
+
+
+class TestBench(unittest.TestCase):
+    def test_suite(self):
+        suite = bench.cases()
+        for name in ['signal.MACD[50]', 'signal.WILLR[500]', 'SignalStrategy.get_input[100]', 'hitbtc._to_order[100]',
+                     'bitmex._to_trade[100]', 'hitbtc._to_candle[100]', 'json.dumps[batch]']:
+            self.assertIn(name, suite)
+        results = bench.run(suite, 'json.dumps[status]', min_time=0.001, repeat=2)
+        results = json.loads(json.dumps(results))  # the file format
+        self.assertEqual(results['format'], bench.FORMAT)
+        self.assertEqual(list(results['results']), ['json.dumps[status]'])
+        self.assertGreater(results['results']['json.dumps[status]']['best'], 0)
+
+        slower = {'results': {'json.dumps[status]': dict(results['results']['json.dumps[status]'])}}
+        slower['results']['json.dumps[status]']['best'] *= 2
+        self.assertEqual([r[0] for r in bench.compare(results, slower)], ['json.dumps[status]'])
+        self.assertAlmostEqual(bench.compare(results, slower)[0][3], 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
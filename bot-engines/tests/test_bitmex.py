@@ -22,7 +22,7 @@ class TestBid(unittest.TestCase):
     def test_bid(self):
         mk = Market('USD', 'BTC', 'XBTUSD', 1, 0, 0)
         order = self.e.bid(mk, rate=100, quantity=1)
-        # print(vars(order))
+        # print(order.as_dict())
         self.assertTrue(isinstance(order, Order))
         self.e._cancel_all()
 
@@ -35,7 +35,7 @@ class TestAsk(unittest.TestCase):
     def test_ask(self):
         mk = Market('USD', 'BTC', 'XBTUSD', 1, 0, 0)
         order = self.e.ask(mk, rate=1000000, quantity=1)
-        # print(vars(order))
+        # print(order.as_dict())
         self.assertTrue(isinstance(order, Order))
         self.e._cancel_all()
 
@@ -49,7 +49,7 @@ class TestCancel(unittest.TestCase):
         try:
             mk = Market('USD', 'BTC', 'XBTUSD', 1, 0, 0)
             order = self.e.bid(mk, rate=100, quantity=1)
-            # print(vars(order))
+            # print(order.as_dict())
             cancelled = self.e.cancel(order_id=order.order_id)
             self.assertTrue(isinstance(cancelled, list))
             self.assertTrue(isinstance(cancelled[0], Order))
@@ -106,7 +106,7 @@ class TestOrderBook(unittest.TestCase):
     def test_balance(self):
         mk = Market('USD', 'BTC', 'XBTUSD', 1, 0, 0)
         orderbook = self.e.order_book(mk)
-        # print(vars(orderbook.asks[0]))
+        # print(orderbook.asks[0].as_dict())
         self.assertTrue(isinstance(orderbook, OrderBook))
 
 
@@ -0,0 +1,110 @@
+import unittest
+import json
+from crypto.book import BookSide
+from crypto.bitmex.orderbook import L2Book
+from crypto.bitmex.stream import BitMEXStream
+from tests.helpers import StandInServer, wait_until
+
+partial = [
+    {"symbol": "XBTUSD", "id": 8799198850, "side": "Sell", "size": 2000, "price": 8011.5},
+    {"symbol": "XBTUSD", "id": 8799198900, "side": "Sell", "size": 150, "price": 8011},
+    {"symbol": "XBTUSD", "id": 8799199000, "side": "Sell", "size": 25, "price": 8010},
+    {"symbol": "XBTUSD", "id": 8799199050, "side": "Buy", "size": 1200, "price": 8009.5},
+    {"symbol": "XBTUSD", "id": 8799199100, "side": "Buy", "size": 300, "price": 8009},
+]
+
+
+class TestL2Book(unittest.TestCase):
+    def setUp(self):
+        self.book = L2Book('XBTUSD')
+        self.book.apply('partial', partial)
+
+    def test_partial(self):
+        self.assertEqual(self.book.best_ask(), (8010, 25))
+        self.assertEqual(self.book.best_bid(), (8009.5, 1200))
+        asks, bids = self.book.depth(2)
+        self.assertEqual(asks, [(8010, 25), (8011, 150)])
+        self.assertEqual(bids, [(8009.5, 1200), (8009, 300)])
+
+    def test_insert_update_delete(self):
+        self.book.apply('insert', [{"symbol": "XBTUSD", "id": 8799199020, "side": "Sell", "size": 5, "price": 8009.8}])
+        self.assertEqual(self.book.best_ask(), (8009.8, 5))
+        self.book.apply('update', [{"symbol": "XBTUSD", "id": 8799199050, "side": "Buy", "size": 10}])
+        self.assertEqual(self.book.best_bid(), (8009.5, 10))
+        self.book.apply('delete', [{"symbol": "XBTUSD", "id": 8799199020, "side": "Sell"},
+                                   {"symbol": "XBTUSD", "id": 8799199050, "side": "Buy"}])
+        self.assertEqual(self.book.best_ask(), (8010, 25))
+        self.assertEqual(self.book.best_bid(), (8009, 300))
+
+    def test_snapshot(self):
+        snapshot = self.book.snapshot(depth=1)
+        self.assertEqual([(e.rate, e.quantity) for e in snapshot.asks], [(8010, 25)])
+        self.assertEqual([(e.rate, e.quantity) for e in snapshot.bids], [(8009.5, 1200)])
+
+    def test_partial_resets(self):
+        self.book.apply('partial', partial[:1])
+        self.assertEqual(len(self.book.asks), 1)
+        self.assertIsNone(self.book.best_bid())
+
+
+class TestBookSide(unittest.TestCase):
+    def test_levels(self):
+        bids = BookSide(descending=True)
+        for price, size in [(3, 1), (5, 2), (1, 3), (4, 4)]:
+            bids.set(price, size)
+        bids.set(5, 0)
+        self.assertEqual(bids.best(), (4, 4))
+        self.assertEqual(list(bids.levels(2)), [(4, 4), (3, 1)])
+        self.assertEqual(list(bids.levels()), [(4, 4), (3, 1), (1, 3)])
+        bids.set(5, 6)
+        self.assertEqual(bids.best(), (5, 6))
+        self.assertEqual(len(bids), 4)
+
+    def test_removed_levels_are_compacted(self):
+        asks = BookSide()
+        for i in range(1000):
+            asks.set(100 + i % 10, 1)
+            asks.remove(100 + i % 10)
+        self.assertIsNone(asks.best())
+        self.assertLessEqual(len(asks.heap), 64)
+
+
+def table(action, data, **extra):
+    return json.dumps(dict({'table': 'orderBookL2_25', 'action': action, 'data': data}, **extra))
+
+
+class TestBitMEXStream(unittest.TestCase):
+    def start(self, messages, symbols=('XBTUSD',)):
+        self.server = StandInServer([json.dumps({'info': 'Welcome to the BitMEX Realtime API.'})] + messages)
+        self.stream = BitMEXStream(self.server.url, list(symbols), reconnect_delay=60)
+        self.stream.start()
+
+    def test_partial_and_deltas(self):
+        self.start([table('partial', partial), table('update', [{"symbol": "XBTUSD", "id": 8799199000,
+                                                                 "side": "Sell", "size": 40}]),
+                    table('delete', [{"symbol": "XBTUSD", "id": 8799199050, "side": "Buy"}])])
+        self.assertTrue(wait_until(lambda: len(self.stream.books['XBTUSD'].snapshot().bids) == 1))
+        book = self.stream.order_book('XBTUSD', depth=2)
+        self.assertEqual([(e.rate, e.quantity) for e in book.asks], [(8010, 40), (8011, 150)])
+        self.assertEqual([(e.rate, e.quantity) for e in book.bids], [(8009, 300)])
+
+    def test_deltas_before_partial_are_ignored(self):
+        # the ETHUSD partial only marks when the XBTUSD delta before it has been handled
+        self.start([table('insert', partial[:1]), table('partial', [], filter={'symbol': 'ETHUSD'})],
+                   symbols=('XBTUSD', 'ETHUSD'))
+        self.assertTrue(wait_until(lambda: self.stream.books['ETHUSD'].live))
+        self.assertIsNone(self.stream.order_book('XBTUSD'))
+        self.assertEqual(len(self.stream.books['XBTUSD'].snapshot().asks), 0)
+        self.assertEqual(self.server.received,
+                         [{'op': 'subscribe', 'args': ['orderBookL2_25:XBTUSD', 'orderBookL2_25:ETHUSD']}])
+
+    def test_stale_book(self):
+        self.start([table('partial', [], filter={'symbol': 'XBTUSD'})])
+        self.assertTrue(self.stream.wait_ready(5))
+        self.assertEqual(self.stream.order_book('XBTUSD').asks, [])
+        self.stream.max_age = 0
+        self.assertIsNone(self.stream.order_book('XBTUSD'))
+
+    def tearDown(self):
+        self.stream.stop()
+        self.server.close()
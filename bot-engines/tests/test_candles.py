@@ -0,0 +1,48 @@
+import unittest
+import datetime as dt
+import numpy as np
+from talib import abstract
+from crypto.structs import Market, Candle
+from crypto.strategies.candles import CandleBuffer
+
+mk = Market('ETH', 'BTC', 'ETHBTC', .001, 0, 0)
+start = dt.datetime(2018, 1, 1, tzinfo=dt.timezone.utc)
+
+
+def candle(i):
+    return Candle(mk, open=i, high=i + 1, low=i - 1, close=i + .5, volume=10 + i, time=start + dt.timedelta(minutes=i))
+
+
+class TestCandleBuffer(unittest.TestCase):
+    def test_partial_fill(self):
+        buf = CandleBuffer(10)
+        buf.extend(candle(i) for i in range(1, 4))
+        self.assertEqual(len(buf), 3)
+        self.assertEqual(list(buf.column('open')), [1, 2, 3])
+        self.assertEqual(buf.last_time(), (start + dt.timedelta(minutes=3)).timestamp())
+
+    def test_wraparound_keeps_newest(self):
+        buf = CandleBuffer(10)
+        buf.extend(candle(i) for i in range(1, 26))
+        self.assertEqual(len(buf), 10)
+        self.assertEqual(list(buf.column('open')), list(range(16, 26)))
+        self.assertEqual(list(buf.column('volume')), [10 + i for i in range(16, 26)])
+
+    def test_views_are_contiguous(self):
+        buf = CandleBuffer(10)
+        buf.extend(candle(i) for i in range(1, 18))
+        for name, values in buf.inputs().items():
+            self.assertTrue(values.flags['C_CONTIGUOUS'])
+            self.assertIsNotNone(values.base)  # a view, not a copy
+
+    def test_talib_input(self):
+        buf = CandleBuffer(50)
+        buf.extend(candle(i) for i in range(1, 80))
+        sma = abstract.Function('SMA')(buf.inputs(), timeperiod=5)
+        self.assertAlmostEqual(sma[-1], np.mean([i + .5 for i in range(75, 80)]))
+
+    def test_missing_values(self):
+        buf = CandleBuffer(5)
+        buf.append(Candle(mk, open=None, high=None, low=None, close=None, volume=None, time=start))
+        self.assertTrue(np.isnan(buf.column('close')[-1]))
+        self.assertEqual(buf.column('volume')[-1], 0)
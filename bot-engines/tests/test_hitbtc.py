@@ -247,7 +247,6 @@ class TestBid(unittest.TestCase):
     def test_bid(self):
         mk = Market('ETC', 'BTC', 'ETCBTC', .001, 0, 0)
         order = self.e.bid(mk, rate=.0001, quantity=.001)
-        print(vars(order))
         self.assertTrue(isinstance(order, Order))
         self.e._orders_cancel('ETCBTC')
 
@@ -262,7 +261,7 @@ class TestAsk(unittest.TestCase):
     def test_ask(self):
         mk = Market('ETC', 'BTC', 'ETCBTC', .001, 0, 0)
         order = self.e.ask(mk, rate=100, quantity=.001)
-        # print(vars(order))
+        # print(order.as_dict())
         self.assertTrue(isinstance(order, Order))
         self.e._orders_cancel('ETCBTC')
 
@@ -345,7 +344,7 @@ class TestOrderBook(unittest.TestCase):
     def test_balance(self):
         mk = Market('ETC', 'BTC', 'ETCBTC', .001, 0, 0)
         orderbook = self.e.order_book(mk)
-        # print(vars(orderbook.asks[0]))
+        # print(orderbook.asks[0].as_dict())
         self.assertTrue(isinstance(orderbook, OrderBook))
 
     def tearDown(self):
@@ -0,0 +1,55 @@
+import unittest
+import json
+import crypto.hitbtc.sample_responses as responses
+from crypto.hitbtc.stream import HitBTCStream
+from tests.helpers import StandInServer, wait_until
+
+class TestHitBTCStream(unittest.TestCase):
+    def start(self, messages):
+        self.server = StandInServer(messages)
+        self.stream = HitBTCStream(self.server.url, ['ETHBTC'], reconnect_delay=60)
+        self.stream.start()
+
+    def subscriptions(self):
+        return [m['method'] for m in self.server.received]
+
+    def test_snapshot_and_update(self):
+        update = json.loads(responses.ws_update_orderbook_res)['params']['sequence']
+        self.start([responses.ws_snapshot_orderbook_res, responses.ws_update_orderbook_res])
+        self.assertTrue(wait_until(lambda: self.stream.sequences['ETHBTC'] == update))
+        book = self.stream.order_book('ETHBTC', depth=2)
+        self.assertEqual([e.rate for e in book.asks], [0.054589, 0.05459])
+        self.assertEqual([e.rate for e in book.bids], [0.054559, 0.054558])
+        self.assertEqual(book.bids[0].quantity, 0.3)
+
+    def test_ticker_and_trades(self):
+        self.start([responses.ws_snapshot_orderbook_res, responses.ws_ticker_res, responses.ws_snapshot_trades_res])
+        self.assertTrue(wait_until(lambda: self.stream.public_trades('ETHBTC')))
+        self.assertEqual(self.stream.ticker('ETHBTC')['bid'], '0.054463')
+        self.assertEqual(len(self.stream.public_trades('ETHBTC')), 2)
+
+    def test_channels_go_stale_separately(self):
+        self.start([])
+        self.stream.handle(responses.ws_ticker_res)
+        self.stream.handle(responses.ws_snapshot_orderbook_res)
+        self.stream.updated[('ticker', 'ETHBTC')] -= 60
+        self.stream.handle(responses.ws_update_orderbook_res)
+        self.assertIsNotNone(self.stream.order_book('ETHBTC'))
+        self.assertIsNone(self.stream.ticker('ETHBTC'))
+        self.assertIsNone(self.stream.public_trades('ETHBTC'))  # nothing received yet
+
+    def test_sequence_gap_resubscribes(self):
+        gap = json.loads(responses.ws_update_orderbook_res)
+        gap['params']['sequence'] += 5
+        self.start([responses.ws_snapshot_orderbook_res, json.dumps(gap)])
+        self.assertTrue(wait_until(lambda: self.subscriptions().count('subscribeOrderbook') == 2))
+        self.assertIsNone(self.stream.order_book('ETHBTC'))
+
+    def test_subscriptions(self):
+        self.start([responses.ws_snapshot_orderbook_res])
+        self.assertTrue(wait_until(lambda: len(self.subscriptions()) == 3))
+        self.assertSetEqual(set(self.subscriptions()), {'subscribeOrderbook', 'subscribeTrades', 'subscribeTicker'})
+
+    def tearDown(self):
+        self.stream.stop()
+        self.server.close()
@@ -0,0 +1,68 @@
+import unittest
+import numpy as np
+import talib
+from crypto.strategies.indicators import IndicatorEngine
+from crypto.strategies.signal import MACD, RSI, STOCHRSI, AROON_OSCILLATOR, MFI, CCI, CMO, MACD_HIST, WILLR
+
+
+def random_inputs(n, seed=1):
+    rng = np.random.RandomState(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return {
+        'open': close + rng.normal(0, .5, n),
+        'high': close + rng.uniform(0, 2, n),
+        'low': close - rng.uniform(0, 2, n),
+        'close': close,
+        'volume': rng.uniform(1, 100, n),
+    }
+
+
+class TestIndicatorEngine(unittest.TestCase):
+    def assertMatches(self, value, expected):
+        if np.isnan(expected):
+            return self.assertTrue(np.isnan(value))
+        self.assertAlmostEqual(value, expected, delta=1e-6 * max(1, abs(expected)))
+
+    def test_matches_talib(self):
+        for n in [40, 100, 500]:
+            i = random_inputs(n)
+            h, l, c, v = i['high'], i['low'], i['close'], i['volume']
+            r = IndicatorEngine().replay(i)
+            macd, signal, hist = talib.MACD(c)
+            self.assertMatches(r['sma'], talib.SMA(c)[-1])
+            self.assertMatches(r['sma_10'], talib.SMA(c, 10)[-1])
+            self.assertMatches(r['volume_sma_50'], talib.SMA(v, 50)[-1])
+            self.assertMatches(r['macd'], macd[-1])
+            self.assertMatches(r['macd_last'], macd[-2])
+            self.assertMatches(r['macd_signal'], signal[-1])
+            self.assertMatches(r['macd_hist'], hist[-1])
+            self.assertMatches(r['rsi'], talib.RSI(c)[-1])
+            self.assertMatches(r['stoch_rsi'], talib.STOCHRSI(c)[1][-1])
+            self.assertMatches(r['aroon'], talib.AROONOSC(h, l)[-1])
+            self.assertMatches(r['mfi'], talib.MFI(h, l, c, v)[-1])
+            self.assertMatches(r['cci'], talib.CCI(h, l, c, 20)[-1])
+            self.assertMatches(r['cmo'], talib.CMO(c, 20)[-1])
+            self.assertMatches(r['willr'], talib.WILLR(h, l, c)[-1])
+            self.assertMatches(r['willr_20_ago'], talib.WILLR(h[:-20], l[:-20], c[:-20])[-1])
+
+    def test_warmup_is_nan(self):
+        r = IndicatorEngine().replay(random_inputs(20))
+        self.assertTrue(np.isnan(r['sma']))
+        self.assertTrue(np.isnan(r['macd']))
+
+    def test_incremental_equals_replay(self):
+        i = random_inputs(300)
+        engine = IndicatorEngine()
+        engine.replay({k: v[:200] for k, v in i.items()})
+        engine.replay({k: v[200:] for k, v in i.items()})
+        replayed = IndicatorEngine().replay(i)
+        for k, v in replayed.items():
+            self.assertMatches(engine.values[k], v)
+
+    def test_indicators_accept_arrays_and_readings(self):
+        for seed in range(20):
+            i = random_inputs(150, seed)
+            readings = IndicatorEngine().replay(i)
+            for indicator in [MACD, RSI, STOCHRSI, AROON_OSCILLATOR, MFI, CCI, CMO, MACD_HIST, WILLR]:
+                self.assertIn(indicator(readings), (-1, 0, 1))
+                self.assertEqual(indicator(readings), indicator(i))
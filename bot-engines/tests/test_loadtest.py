@@ -0,0 +1,43 @@
+import json
+import unittest
+from crypto.hitbtc.mock import mocker
+from crypto.loadtest import LoadTest, Sink, percentiles
+from crypto.telemetry import Publisher
+
+
+class TestLoadTest(unittest.TestCase):
+    def test_percentiles(self):
+        stats = percentiles([i / 100 for i in range(100, 0, -1)])
+        self.assertEqual((stats['count'], stats['p50'], stats['p90'], stats['p99'], stats['max']),
+                         (100, 0.5, 0.9, 0.99, 1.0))
+        self.assertEqual(percentiles([]), {'count': 0})
+
+    def test_sink(self):
+        sink = Sink()
+        self.addCleanup(sink.close)
+        publisher = Publisher(sink.url, 'test', batch_interval=0)
+        publisher.publish({'a': 1}, 'status')
+        publisher.publish([], 'error')
+        publisher.close()
+        stats = sink.stats()
+        self.assertEqual(stats['messages'], 2)
+        self.assertEqual(stats['types'], {'error': 1, 'status': 1})
+
+    def test_run(self):
+        with self.assertLogs(level='INFO'):
+            report = LoadTest(bots=2, markets=2, latency=0.001, duration=1.5, interval=0.25).run()
+        json.dumps(report)
+        self.assertEqual(report['failures'], [])
+        self.assertGreater(report['loop_seconds']['count'], 4)
+        self.assertEqual([s['count'] > 0 for s in report['loop_seconds_per_bot']], [True, True])
+        self.assertGreater(report['api']['calls_per_second'], 0)
+        self.assertIn('_order_create', report['api']['endpoints'])
+        self.assertGreater(report['sink']['messages'], 0)
+        self.assertGreater(report['memory']['peak'], 0)
+        # the mock is back to its own markets
+        self.assertEqual(sorted(mocker.specs), ['ETCBTC', 'ETHBTC', 'LTCBTC'])
+        self.assertEqual(mocker.latency.seconds, 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import unittest
+from crypto import BitMEXExchange
+from crypto.matching import MatchingEngine, Spec, Rejected
+from crypto.bitmex.mock import mocker as bitmex
+
+
+class Clock(object):
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def spot(seed=0):
+    specs = [Spec('ETHBTC', 'ETH', 'BTC', 0.07, lot=0.001, tick=0.000001, maker_fee=-0.0001, taker_fee=0.001)]
+    return MatchingEngine(specs, seed, balances={'BTC': 10, 'ETH': 100}, clock=Clock())
+
+
+class TestMatching(unittest.TestCase):
+    def setUp(self):
+        self.engine = spot()
+
+    def test_price_time_priority(self):
+        first = self.engine.place('a', 'ETHBTC', 'buy', 1, 0.069)
+        second = self.engine.place('b', 'ETHBTC', 'buy', 1, 0.069)
+        better = self.engine.place('c', 'ETHBTC', 'buy', 1, 0.0695)
+        self.assertEqual(self.engine.book('ETHBTC')[1], [(0.0695, 1), (0.069, 2)])
+        taker = self.engine.place('d', 'ETHBTC', 'sell', 1.5, 0.068)
+        self.assertEqual((better.status, first.status, second.status), ('filled', 'partiallyFilled', 'new'))
+        self.assertEqual(first.remaining, 0.5)
+        self.assertEqual(taker.status, 'filled')
+        self.assertEqual([(f.price, f.quantity) for f in self.engine.fills('d', 'ETHBTC')], [(0.0695, 1), (0.069, 0.5)])
+        self.assertEqual(self.engine.book('ETHBTC')[1], [(0.069, 1.5)])
+
+    def test_cancel_keeps_queue(self):
+        orders = [self.engine.place(name, 'ETHBTC', 'sell', 1, 0.071) for name in 'abc']
+        self.engine.cancel('b', orders[1].id)
+        with self.assertRaises(Rejected):
+            self.engine.cancel('a', orders[2].id)  # someone else's order
+        self.engine.place('d', 'ETHBTC', 'buy', 2, 0.071)
+        self.assertEqual([o.status for o in orders], ['filled', 'canceled', 'filled'])
+        self.assertEqual(self.engine.book('ETHBTC'), ([], []))
+
+    def test_trade_and_fill_ids(self):
+        self.engine.place('a', 'ETHBTC', 'sell', 1, 0.071)
+        self.engine.place('a', 'ETHBTC', 'sell', 1, 0.072)
+        self.engine.place('b', 'ETHBTC', 'buy', 2, 0.072)
+        self.assertEqual([t[0] for t in self.engine.tape('ETHBTC')], [2, 1])
+        fills = self.engine.fills('a', 'ETHBTC') + self.engine.fills('b', 'ETHBTC')
+        self.assertEqual(sorted(f.id for f in fills), [1, 2, 3, 4])
+
+    def test_market_order(self):
+        self.engine.place('a', 'ETHBTC', 'sell', 1, 0.071)
+        self.engine.place('a', 'ETHBTC', 'sell', 1, 0.072)
+        order = self.engine.place('b', 'ETHBTC', 'buy', 3)
+        self.assertEqual((order.type, order.status, order.filled), ('market', 'canceled', 2))
+        with self.assertRaises(Rejected):
+            self.engine.place('b', 'ETHBTC', 'buy', 1)
+
+    def test_balances_and_fees(self):
+        self.engine.place('maker', 'ETHBTC', 'sell', 10, 0.07)
+        self.assertEqual(self.engine.balances('maker')['ETH'], (90, 10))
+        self.engine.place('taker', 'ETHBTC', 'buy', 10, 0.08)
+        btc, eth = self.engine.balances('taker')['BTC'], self.engine.balances('taker')['ETH']
+        self.assertEqual(eth, (110, 0))
+        self.assertAlmostEqual(btc[0], 10 - 0.7 - 0.0007)  # taker fee; the unused reserve is released
+        self.assertEqual(btc[1], 0)
+        self.assertAlmostEqual(self.engine.balances('maker')['BTC'][0], 10 + 0.7 + 0.00007)  # maker rebate
+        self.assertEqual(self.engine.fills('maker', 'ETHBTC')[0].liquidity, 'maker')
+
+        with self.assertRaises(Rejected):
+            self.engine.place('poor', 'ETHBTC', 'buy', 200, 0.06)
+        order = self.engine.place('poor', 'ETHBTC', 'buy', 100, 0.06)
+        self.assertAlmostEqual(self.engine.balances('poor')['BTC'][1], 6.006)
+        self.engine.cancel('poor', order.id)
+        self.assertEqual(self.engine.balances('poor')['BTC'], (10, 0))
+
+    def test_replace(self):
+        order = self.engine.place('a', 'ETHBTC', 'buy', 1, 0.069, client_id='one')
+        new = self.engine.replace('a', client_id='one', price=0.0691, new_client_id='two')
+        self.assertEqual((order.status, new.price, new.quantity), ('canceled', 0.0691, 1))
+        self.assertEqual([o.client_id for o in self.engine.open_orders('a')], ['two'])
+
+    def test_deterministic(self):
+        def run(seed):
+            engine = spot(seed)
+            engine.place('a', 'ETHBTC', 'buy', 1, 0.0699)
+            engine.place('a', 'ETHBTC', 'sell', 1, 0.0701)
+            engine.step(steps=200)
+            return engine.book('ETHBTC'), [(f.side, f.price, f.quantity) for f in engine.fills('a', 'ETHBTC')]
+        self.assertEqual(run(7), run(7))
+        self.assertNotEqual(run(7)[0], run(8)[0])
+        self.assertTrue(run(7)[1])
+
+    def test_many_resting_orders(self):
+        for i in range(20000):
+            self.engine.place('a', 'ETHBTC', 'buy', 0.001, round(0.05 + (i % 1000) * 0.000001, 6))
+        asks, bids = self.engine.book('ETHBTC', 2)
+        self.assertEqual(bids, [(0.050999, 0.02), (0.050998, 0.02)])
+        self.engine.place('b', 'ETHBTC', 'sell', 0.03, 0.050998)
+        self.assertEqual(self.engine.book('ETHBTC', 1)[1], [(0.050998, 0.01)])
+        self.assertEqual(len(self.engine.cancel_all('a')), 19970)
+        self.assertEqual(self.engine.balances('a')['BTC'][1], 0)
+        self.assertEqual(self.engine.book('ETHBTC'), ([], []))
+
+    def test_inverse_position(self):
+        spec = Spec('XBTUSD', 'XBT', 'USD', 10000.0, lot=1, tick=0.5, maker_fee=-0.00025, taker_fee=0.00075,
+                    inverse=True)
+        engine = MatchingEngine([spec], balances={'XBT': 1}, clock=Clock())
+        engine.place('m', 'XBTUSD', 'sell', 1000, 10000)
+        engine.place('a', 'XBTUSD', 'buy', 1000, 10000)
+        engine.place('m', 'XBTUSD', 'buy', 600, 8000)
+        engine.place('a', 'XBTUSD', 'sell', 600, 8000)
+        contracts, entry, realised = engine.position('a', 'XBTUSD')
+        self.assertEqual((contracts, entry), (400, 10000))
+        self.assertAlmostEqual(realised, 600 * (1 / 10000 - 1 / 8000))
+        fees = 1000 / 10000 * 0.00075 + 600 / 8000 * 0.00075
+        self.assertAlmostEqual(engine.balances('a')['XBT'][0], 1 + realised - fees)
+        self.assertEqual(engine.position('m', 'XBTUSD')[0], -400)
+
+
+class TestBitMEXMock(unittest.TestCase):
+    def setUp(self):
+        bitmex.reset(3)
+        self.exchange = BitMEXExchange('https://www.bitmex.com/api/v1', 'k', 's', ['XBTUSD'], True)
+        self.market = self.exchange.markets['XBTUSD']
+
+    def test_trading(self):
+        ticker = self.exchange.ticker(self.market)
+        self.assertLess(ticker.bid, ticker.ask)
+        order = self.exchange.bid(self.market, ticker.bid - 50, 100)
+        amended = self.exchange.amend(order, ticker.bid - 40, 200)
+        self.assertEqual((amended.order_id, amended.rate, amended.quantity), (order.order_id, ticker.bid - 40, 200))
+        self.assertEqual([o.order_id for o in self.exchange.orders()], [order.order_id])
+        self.exchange.ask(self.market, None, 300)  # takes the simulated market's bids
+        self.assertEqual(self.exchange.position(self.market), -300)
+        self.assertLess(self.exchange.balance()['BTC'].available, 1)
+        self.exchange.close_positions()
+        self.assertEqual(self.exchange.position(self.market), 0)
+        self.assertEqual(len(self.exchange.trades(self.market)), 2)
+
+    def test_order_book(self):
+        book = self.exchange.order_book(self.market, depth=3)
+        self.assertEqual([e.rate for e in book.asks], sorted(e.rate for e in book.asks))
+        self.assertEqual([e.rate for e in book.bids], sorted((e.rate for e in book.bids), reverse=True))
+        self.assertLess(book.bids[0].rate, book.asks[0].rate)
+
+
+if __name__ == '__main__':
+    unittest.main()
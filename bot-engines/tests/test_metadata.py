@@ -0,0 +1,96 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from crypto.structs import Market
+from crypto.metadata import MarketCache
+from crypto.hitbtc.hitbtc import HitBTCExchange
+
+URL = 'https://api.hitbtc.com/api/2'
+
+
+def markets(*symbols, fee='0.001'):
+    return {s: Market(s[:3], s[3:], s, '0.001', '-0.0001', fee) for s in symbols}
+
+
+class TestMarketCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, 'markets.json')
+        self.fetches = 0
+
+    def fetch(self, fee='0.001'):
+        self.fetches += 1
+        return markets('ETHBTC', 'LTCBTC', 'ETCBTC', fee=fee)
+
+    def test_fetches_once(self):
+        cache = MarketCache(URL, self.fetch, path=self.path)
+        first = cache.load(['ETHBTC', 'LTCBTC'])
+        second = MarketCache(URL, self.fetch, path=self.path).load(['ETHBTC', 'LTCBTC'])
+        self.assertEqual(self.fetches, 1)
+        self.assertEqual(sorted(second), ['ETHBTC', 'LTCBTC'])
+        self.assertEqual(second['ETHBTC'].as_dict(), first['ETHBTC'].as_dict())
+
+    def test_missing_symbol_or_other_endpoint_refetches(self):
+        MarketCache(URL, self.fetch, path=self.path).load(['ETHBTC'])
+        MarketCache(URL, self.fetch, path=self.path).load(['ETHBTC', 'XMRBTC'])
+        MarketCache('mock://api.hitbtc.com/api/2', self.fetch, path=self.path).load(['ETHBTC'])
+        self.assertEqual(self.fetches, 3)
+
+    def test_version(self):
+        MarketCache(URL, self.fetch, path=self.path).load(['ETHBTC'])
+        with open(self.path) as f:
+            data = json.load(f)
+        data['version'] = MarketCache.VERSION + 1
+        with open(self.path, 'w') as f:
+            json.dump(data, f)
+        MarketCache(URL, self.fetch, path=self.path).load(['ETHBTC'])
+        self.assertEqual(self.fetches, 2)
+
+    def test_stale_cache_refreshes_in_background(self):
+        MarketCache(URL, self.fetch, path=self.path).load(['ETHBTC'])
+        refreshed = []
+        cache = MarketCache(URL, lambda: self.fetch(fee='0.002'), ttl=0, path=self.path)
+        stale = cache.load(['ETHBTC'], refreshed.append)
+        self.assertEqual(stale['ETHBTC'].take_fee, '0.001')
+        cache.refresher.join(5)
+        self.assertEqual(refreshed[0]['ETHBTC'].take_fee, '0.002')
+        self.assertEqual(cache.cached(['ETHBTC'])[0]['ETHBTC'].take_fee, '0.002')
+
+
+    def test_writers_in_threads(self):
+        cache = MarketCache(URL, self.fetch, path=self.path)
+        threads = [threading.Thread(target=cache.refresh) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(os.listdir(self.dir.name), ['markets.json'])
+        self.assertEqual(sorted(cache.cached(['ETHBTC', 'LTCBTC'])[0]), ['ETHBTC', 'LTCBTC'])
+
+
+class TestExchangeStartup(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def test_one_bulk_request_then_none(self):
+        symbols = ['ETHBTC', 'LTCBTC', 'ETCBTC']
+        with mock.patch.object(HitBTCExchange, '_symbols', autospec=True, side_effect=HitBTCExchange._symbols) as m:
+            first = HitBTCExchange(URL, 'k', 's', symbols, True, cache_dir=self.dir.name)
+            self.assertEqual(m.call_count, 1)
+            start = time.perf_counter()
+            second = HitBTCExchange(URL, 'k', 's', symbols, True, cache_dir=self.dir.name)
+            elapsed = time.perf_counter() - start
+            self.assertEqual(m.call_count, 1)
+        self.assertEqual(sorted(second.markets), sorted(symbols))
+        self.assertEqual(second.markets['LTCBTC'].as_dict(), first.markets['LTCBTC'].as_dict())
+        self.assertLess(elapsed, 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
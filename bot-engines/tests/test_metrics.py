@@ -0,0 +1,110 @@
+import asyncio
+import unittest
+import requests
+from crypto import TradingBot, HitBTCExchange, BasicStrategy
+from crypto.metrics import Registry, registry, api_call, exposition, serve
+from tests.helpers import Recorder
+
+
+class FakeExchange(object):
+    @api_call
+    def _ok(self):
+        return 200, {}
+
+    @api_call
+    def _rejected(self):
+        return 400, {'error': {'message': 'no'}}
+
+    @api_call
+    def _broken(self):
+        raise ValueError('down')
+
+    @api_call
+    async def _async_ok(self):
+        return 200, {}
+
+
+def series(snapshot, name, **labels):
+    return [s for s in snapshot if s['name'] == name and all(s['labels'].get(k) == v for k, v in labels.items())]
+
+
+class TestRegistry(unittest.TestCase):
+    def test_histogram(self):
+        r = Registry()
+        for v in [0.0002, 0.003, 0.003, 0.2, 50]:
+            r.observe('latency', v, endpoint='_order')
+        r.inc('errors', endpoint='_order')
+        r.inc('errors', 2, endpoint='_order')
+        h, c = r.snapshot()
+        self.assertEqual((h['count'], h['labels']), (5, {'endpoint': '_order'}))
+        self.assertAlmostEqual(h['sum'], 50.2062)
+        self.assertEqual(dict(h['buckets'])[0.0005], 1)
+        self.assertEqual(dict(h['buckets'])[0.005], 3)
+        self.assertEqual(dict(h['buckets'])[30.0], 4)
+        self.assertEqual((h['p50'], h['p99']), (0.005, float('inf')))
+        self.assertEqual(c['value'], 3)
+
+    def test_exposition(self):
+        r = Registry()
+        r.observe('api_request_seconds', 0.004, endpoint='_order', exchange='X')
+        r.inc('api_errors_total', endpoint='say "hi"')
+        text = exposition(r.snapshot())
+        self.assertIn('# TYPE api_request_seconds histogram\n', text)
+        self.assertIn('api_request_seconds_bucket{endpoint="_order",exchange="X",le="0.005"} 1\n', text)
+        self.assertIn('api_request_seconds_bucket{endpoint="_order",exchange="X",le="+Inf"} 1\n', text)
+        self.assertIn('api_request_seconds_count{endpoint="_order",exchange="X"} 1\n', text)
+        self.assertIn('api_errors_total{endpoint="say \\"hi\\""} 1\n', text)
+
+    def test_api_call(self):
+        registry.reset()
+        e = FakeExchange()
+        e._ok()
+        e._rejected()
+        with self.assertRaises(ValueError):
+            e._broken()
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(e._async_ok())
+        loop.close()
+        snapshot = registry.snapshot()
+        for endpoint in ['_ok', '_rejected', '_broken', '_async_ok']:
+            self.assertEqual(series(snapshot, 'api_request_seconds', endpoint=endpoint)[0]['count'], 1)
+        errors = {s['labels']['endpoint']: s['value'] for s in series(snapshot, 'api_errors_total')}
+        self.assertEqual(errors, {'_rejected': 1, '_broken': 1})
+
+    def test_serve(self):
+        r = Registry()
+        r.inc('report_skipped_total', type='trades')
+        server = serve(0, r.snapshot)
+        try:
+            url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+            self.assertIn('report_skipped_total{type="trades"} 1', requests.get(url + '/metrics').text)
+            self.assertEqual(requests.get(url + '/other').status_code, 404)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestBotMetrics(unittest.TestCase):
+    def test_report_pushes_metrics(self):
+        registry.reset()
+        symbols = ['ETHBTC', 'LTCBTC']
+        exchange = HitBTCExchange('https://api.hitbtc.com/api/2', 'k', 's', symbols, True)
+        strategy = BasicStrategy(exchange, {s: ['0.01'] for s in symbols})
+        publisher = Recorder()
+        bot = TradingBot('hitbtc', exchange, strategy, publisher=publisher)
+        bot.metrics_interval = 0
+        bot.execute_strategy()
+        bot.report()
+        bot.executor.shutdown()
+
+        pushed = [d for t, d in publisher.messages if t == 'metrics'][-1]
+        endpoints = {s['labels']['endpoint'] for s in series(pushed, 'api_request_seconds', exchange='HitBTCExchange')}
+        self.assertTrue({'_orderbook', '_trading_balance', '_orders_active'} <= endpoints)
+        self.assertEqual(len(series(pushed, 'strategy_trade_seconds')), 2)
+        self.assertTrue(series(pushed, 'report_fetch_seconds', type='orderbooks'))
+        stages = {s['labels']['stage'] for s in series(registry.snapshot(), 'bot_stage_seconds')}
+        self.assertEqual(stages, {'strategy', 'report'})
+
+
+if __name__ == '__main__':
+    unittest.main()
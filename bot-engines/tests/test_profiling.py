@@ -0,0 +1,85 @@
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+import unittest
+from crypto import TradingBot, HitBTCExchange, BasicStrategy
+from crypto.profiling import Profiler, SamplingProfiler
+from tests.helpers import Recorder
+
+KEEP = []
+
+
+def spin(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        sum(i * i for i in range(1000))
+
+
+def grow(n):
+    KEEP.extend(bytearray(1000) for _ in range(n))
+
+
+class TestSamplingProfiler(unittest.TestCase):
+    def test_samples_other_threads(self):
+        profiler = SamplingProfiler(interval=0.002)
+        worker = threading.Thread(target=spin, args=(0.3,), name='worker')
+        profiler.start()
+        worker.start()
+        worker.join()
+        profiler.stop()
+        self.assertGreater(profiler.samples, 20)
+        worker_stacks = [l for l in profiler.collapsed().splitlines() if l.startswith('worker;')]
+        self.assertTrue(worker_stacks)
+        self.assertTrue(any(';spin (test_profiling.py' in l for l in worker_stacks))
+        functions = [f for f, n in profiler.top(limit=100)['total']]
+        self.assertTrue(any(f.startswith('spin (test_profiling.py') for f in functions))
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def test_session(self):
+        profiler = Profiler('test', self.dir.name)
+        self.assertEqual(profiler.handle('start')['status'], 'started')
+        with self.assertRaises(Exception):
+            profiler.start()
+        worker = threading.Thread(target=spin, args=(0.2,))
+        worker.start()
+        grow(2000)
+        worker.join()
+        summary = profiler.handle({'action': 'stop'})
+        del KEEP[:]
+
+        self.assertFalse(profiler.running)
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertEqual(len(summary['files']), 3)
+        self.assertTrue(all(os.path.exists(f) for f in summary['files']))
+        self.assertGreater(summary['cpu']['samples'], 0)
+        top = summary['memory']['growth'][0]
+        self.assertIn('test_profiling.py', top['where'])
+        self.assertGreater(top['size_diff'], 1000000)
+
+    def test_bot_control_messages(self):
+        exchange = HitBTCExchange('https://api.hitbtc.com/api/2', 'k', 's', ['ETHBTC'], True)
+        publisher = Recorder()
+        bot = TradingBot('hitbtc', exchange, BasicStrategy(exchange, {'ETHBTC': ['0.01']}), publisher=publisher)
+        bot.profiler.directory = self.dir.name
+        bot.process_msg({'type': 'profile', 'data': {'action': 'start', 'memory': False}})
+        bot.execute_strategy()
+        bot.process_msg({'type': 'profile', 'data': 'stop'})
+        bot.process_msg({'type': 'profile', 'data': 'stop'})  # not running: reported, not raised
+        bot.executor.shutdown()
+
+        types = publisher.types()
+        self.assertEqual(types, ['profile', 'profile', 'error'])
+        stopped = publisher.messages[1][1]
+        self.assertEqual(stopped['status'], 'stopped')
+        self.assertNotIn('memory', stopped)
+
+
+if __name__ == '__main__':
+    unittest.main()
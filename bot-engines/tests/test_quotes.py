@@ -0,0 +1,127 @@
+import unittest
+from crypto import HitBTCExchange, BasicStrategy
+from crypto.hitbtc.mock import mocker
+from crypto.strategies.quotes import QuoteManager
+from crypto.structs import Order, Ticker
+
+
+class Clock(object):
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class CountingExchange(object):
+    # forwards to the mock exchange and counts the calls the quote manager makes
+    def __init__(self, exchange):
+        self.exchange = exchange
+        self.calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self.exchange, name)
+
+        def call(*args, **kwargs):
+            self.calls.append(name)
+            return method(*args, **kwargs)
+        return call
+
+
+class TestQuoteManager(unittest.TestCase):
+    def setUp(self):
+        mocker.reset()
+        self.hitbtc = HitBTCExchange('https://api.hitbtc.com/api/2', 'k', 's', ['ETHBTC'], True)
+        self.exchange = CountingExchange(self.hitbtc)
+        self.market = self.hitbtc.markets['ETHBTC']
+        self.clock = Clock()
+        self.quotes = QuoteManager(self.exchange, sync_interval=10, clock=self.clock)
+
+    def test_keeps_quotes_within_tolerance(self):
+        first = self.quotes.quote(self.market, 'buy', 0.05, 0.001, tolerance=0.0005)
+        self.quotes.synced = self.clock.now
+        self.assertIsNone(self.quotes.quote(self.market, 'buy', 0.0504, 0.001, tolerance=0.0005))
+        self.assertIsNone(self.quotes.quote(self.market, 'buy', 0.0496, 0.001, tolerance=0.0005))
+        self.assertEqual(self.exchange.calls, ['bid'])
+        self.assertEqual(self.quotes.quotes[('ETHBTC', 'buy')].order.order_id, first.order_id)
+
+    def test_amends_when_moved(self):
+        first = self.quotes.quote(self.market, 'sell', 0.05, 0.001)
+        self.quotes.synced = self.clock.now
+        amended = self.quotes.quote(self.market, 'sell', 0.06, 0.001)
+        self.assertEqual(self.exchange.calls, ['ask', 'amend'])
+        self.assertEqual(amended.rate, 0.06)
+        self.assertNotEqual(amended.order_id, first.order_id)
+        self.assertEqual([o.price for o in mocker.engine.open_orders('k')], [0.06])
+        self.assertEqual(self.quotes.counts, {'placed': 1, 'amended': 1, 'kept': 0})
+
+    def test_places_again_when_gone(self):
+        self.quotes.quote(self.market, 'buy', 0.05, 0.001)
+        mocker.engine.cancel_all('k')  # filled
+        self.clock.now += 10
+        self.quotes.quote(self.market, 'buy', 0.05, 0.001)
+        self.assertEqual(self.exchange.calls, ['bid', 'orders', 'bid'])
+
+        mocker.engine.cancel_all('k')  # filled between syncs: the amend is rejected
+        self.quotes.quote(self.market, 'buy', 0.07, 0.001)
+        self.assertEqual(self.exchange.calls[3:], ['amend', 'bid'])
+        self.assertEqual(self.quotes.counts['placed'], 3)
+
+    def test_cancel(self):
+        self.quotes.quote(self.market, 'buy', 0.05, 0.001)
+        self.quotes.quote(self.market, 'sell', 0.06, 0.001)
+        self.quotes.cancel(self.market)
+        self.assertEqual((self.quotes.quotes, mocker.engine.open_orders('k')), ({}, []))
+
+
+class Quoting(object):
+    # exchange double with a fixed ticker that acknowledges every order
+    def __init__(self):
+        self.mid = 1.0
+        self.calls = []
+        self.open = {}
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def ticker(self, market):
+        return Ticker(market, ask=self.mid + 0.001, bid=self.mid - 0.001, low=self.mid, high=self.mid, last=self.mid,
+                      base_volume=0, quote_volume=0, time=0)
+
+    def place(self, market, side, rate, quantity, order_id=None):
+        order = Order(order_id or len(self.calls), market, side, rate, quantity, 0)
+        self.open[order.order_id] = order
+        return order
+
+    def bid(self, market, rate, quantity):
+        self.calls.append('bid')
+        return self.place(market, 'buy', rate, quantity)
+
+    def ask(self, market, rate, quantity):
+        self.calls.append('ask')
+        return self.place(market, 'sell', rate, quantity)
+
+    def amend(self, order, rate, quantity=None):
+        self.calls.append('amend')
+        return self.place(order.market, order.side, rate, quantity, order.order_id)
+
+    def orders(self, market=None):
+        return list(self.open.values())
+
+
+class TestBasicStrategyQuotes(unittest.TestCase):
+    def test_requests_per_loop(self):
+        exchange = Quoting()
+        market = HitBTCExchange('https://api.hitbtc.com/api/2', 'k', 's', ['ETHBTC'], True).markets['ETHBTC']
+        strategy = BasicStrategy(exchange, {'ETHBTC': ['0.02', '0.25']})
+        self.assertEqual(len(strategy.trade(market)), 2)
+        exchange.mid = 1.004  # moved less than a quarter of the 0.02 spread
+        self.assertEqual(strategy.trade(market), [])
+        exchange.mid = 1.01
+        self.assertEqual([o.rate for o in strategy.trade(market)], [0.9999, 1.0201])
+        self.assertEqual(exchange.calls, ['bid', 'ask', 'amend', 'amend'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import email.utils
+import unittest
+import time
+import threading
+from crypto.ratelimit import RateLimiter, retry_after
+
+
+class FakeResponse(object):
+    def __init__(self, headers, status_code=200):
+        self.headers = headers
+        self.status_code = status_code
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_no_wait_with_budget(self):
+        limiter = RateLimiter(limit=10, window=1)
+        waits = [limiter.acquire() for _ in range(10)]
+        self.assertEqual(sum(waits), 0)
+        self.assertEqual(limiter.stats()['waits'], 0)
+
+    def test_blocks_when_empty(self):
+        limiter = RateLimiter(limit=2, window=0.1)
+        for _ in range(2):
+            limiter.acquire()
+        start = time.monotonic()
+        wait = limiter.acquire()
+        self.assertGreater(wait, 0)
+        self.assertGreaterEqual(time.monotonic() - start, wait * 0.9)
+        self.assertEqual(limiter.stats()['waits'], 1)
+
+    def test_headers_resync(self):
+        limiter = RateLimiter(limit=300, window=300)
+        reset = time.time() + 10
+        limiter.update(FakeResponse({'x-ratelimit-limit': '300', 'x-ratelimit-remaining': '100',
+                                     'x-ratelimit-reset': str(reset)}))
+        stats = limiter.stats()
+        self.assertEqual(stats['capacity'], 300)
+        self.assertLessEqual(stats['tokens'], 101)
+        self.assertAlmostEqual(stats['rate'], 20, delta=1)
+
+    def test_missing_headers_ignored(self):
+        limiter = RateLimiter(limit=5, window=5)
+        limiter.update(FakeResponse({}))
+        self.assertAlmostEqual(limiter.stats()['tokens'], 5)
+
+    def test_retry_after(self):
+        limiter = RateLimiter(limit=100, window=1)
+        limiter.update(FakeResponse({'retry-after': '0.2'}, status_code=429))
+        self.assertGreater(limiter.acquire(), 0.1)
+
+    def test_retry_after_forms(self):
+        date = email.utils.formatdate(time.time() + 30, usegmt=True)
+        self.assertAlmostEqual(retry_after(date), 30, delta=1.5)
+        self.assertEqual(retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0)  # already passed
+        self.assertEqual(retry_after('soon'), 1.0)
+        self.assertEqual(retry_after(None), 1.0)
+        limiter = RateLimiter(limit=100, window=1)
+        limiter.update(FakeResponse({'retry-after': 'soon'}, status_code=429))
+        self.assertGreater(limiter.reserve(), 0.5)
+
+    def test_shared_between_threads(self):
+        limiter = RateLimiter(limit=5, window=0.25)
+        threads = [threading.Thread(target=limiter.acquire) for _ in range(10)]
+        start = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertEqual(limiter.stats()['waits'], 5)
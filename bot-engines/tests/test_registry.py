@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+import unittest
+import crypto
+from crypto.helpers import str_to_class
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestRegistry(unittest.TestCase):
+    def test_every_name_resolves(self):
+        for name in crypto.REGISTRY:
+            self.assertIs(str_to_class(name), getattr(crypto, name))
+        self.assertIn('HitBTCExchange', dir(crypto))
+
+    def test_unknown_name(self):
+        with self.assertRaises(AttributeError):
+            crypto.NoSuchExchange
+        with self.assertRaises(ImportError):
+            from crypto import NoSuchStrategy
+
+    def test_only_configured_classes_are_imported(self):
+        code = ('import sys, crypto\n'
+                'crypto.HitBTCExchange, crypto.BasicStrategy, crypto.create_bot\n'
+                'print(",".join(m for m in ("aiohttp", "numpy", "requests_mock", "dateutil", "crypto.bitmex.bitmex",\n'
+                '                           "crypto.strategies.signal") if m in sys.modules))\n')
+        out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, stdout=subprocess.PIPE, check=True)
+        self.assertEqual(out.stdout.decode().strip(), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
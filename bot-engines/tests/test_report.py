@@ -0,0 +1,90 @@
+import threading
+import time
+import unittest
+from crypto import TradingBot
+from crypto.structs import Market, Balance, OrderBook
+from tests.helpers import Recorder
+
+
+class Exchange(object):
+    # answers every report fetch at once, except the ones in `slow` which wait for `release`
+    def __init__(self):
+        self.symbols = ['ETHBTC']
+        self.market = Market('ETH', 'BTC', 'ETHBTC', 0.001, 0, 0.001)
+        self.slow = set()
+        self.release = threading.Event()
+        self.calls = {}
+        self.btc = 1.0
+
+    def fetch(self, name, value):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if name in self.slow:
+            self.release.wait(5)
+        return value
+
+    def to_market(self, symbol):
+        return self.market
+
+    def balance(self):
+        return self.fetch('balance', {'BTC': Balance(self.btc, 0)})
+
+    def orders(self, market=None):
+        return self.fetch('orders', [])
+
+    def order_book(self, market):
+        return self.fetch('order_book', OrderBook([], []))
+
+    def trades(self, market):
+        return self.fetch('trades', [])
+
+    def cancel(self, order_id=None, market=None, all=False):
+        return []
+
+
+class TestReport(unittest.TestCase):
+    def setUp(self):
+        self.exchange = Exchange()
+        self.publisher = Recorder()
+        self.bot = TradingBot('test', self.exchange, None, publisher=self.publisher)
+        self.bot.report_deadline = 0.2
+        self.addCleanup(self.bot.executor.shutdown)
+        self.addCleanup(self.exchange.release.set)
+
+    def test_publishes_everything(self):
+        self.assertEqual(self.bot.report(), [])
+        self.assertEqual(self.publisher.types(), ['balance', 'active_orders', 'status', 'orderbooks', 'trades'])
+        self.assertEqual(self.publisher.latest('balance')['BTC'].available, 1.0)
+
+    def test_deadline(self):
+        self.exchange.slow.add('balance')
+        start = time.time()
+        skipped = self.bot.report()
+        self.assertGreaterEqual(time.time() - start, 0.2)
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(skipped, ['balance'])
+        self.assertEqual(self.publisher.types(), ['active_orders', 'status', 'orderbooks', 'trades'])
+        self.assertEqual(self.publisher.latest('status')['skipped'], ['balance'])
+
+    def test_last_value_while_slow(self):
+        self.bot.report()
+        self.exchange.slow.add('balance')
+        self.exchange.btc = 2.0
+        self.assertEqual(self.bot.report(), ['balance'])
+        self.assertEqual(self.publisher.latest('balance')['BTC'].available, 1.0)  # the last value it had
+        self.assertEqual(self.bot.report(), ['balance'])
+        self.assertEqual(self.exchange.calls['balance'], 2)  # the slow fetch is not requested again meanwhile
+        self.exchange.release.set()
+        self.assertEqual(self.bot.report(), [])
+        self.assertEqual(self.publisher.latest('balance')['BTC'].available, 2.0)
+
+    def test_groups_dont_wait_for_each_other(self):
+        # the scheduler runs one report() per interval group; a fetch still pending from another group is not waited on
+        self.exchange.slow.add('balance')
+        self.assertEqual(self.bot.report(['balance']), ['balance'])
+        self.bot.report_deadline = 2
+        start = time.time()
+        self.assertEqual(self.bot.report(['orderbooks', 'active_orders']), [])
+        self.assertLess(time.time() - start, 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import threading
+import time
+import unittest
+from crypto import TradingBot, HitBTCExchange, BasicStrategy
+from crypto.scheduler import Scheduler
+from tests.helpers import Recorder
+
+
+class Clock(object):
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.scheduler = Scheduler(clock=self.clock)
+        self.calls = []
+
+    def task(self, name, duration=0.0):
+        def fn():
+            self.calls.append((name, self.clock.now))
+            self.clock.now += duration
+        return fn
+
+    def test_no_drift(self):
+        task = self.scheduler.add('fast', self.task('fast', duration=0.3), 1)
+        for _ in range(5):
+            self.scheduler.run_pending()
+            self.clock.now = self.scheduler.next_due() + 0.05  # woke up a little late
+        self.assertEqual([round(t - 1000, 2) for _, t in self.calls], [0, 1.05, 2.05, 3.05, 4.05])
+        self.assertEqual(task.next_run, 1005)
+        self.assertEqual(task.overruns, 0)
+
+    def test_cadences(self):
+        self.scheduler.add('fast', self.task('fast'), 1)
+        self.scheduler.add('slow', self.task('slow'), 5)
+        while self.clock.now < 1010:
+            self.scheduler.run_pending()
+            self.clock.now = self.scheduler.next_due()
+        names = [n for n, _ in self.calls]
+        self.assertEqual((names.count('fast'), names.count('slow')), (10, 2))
+
+    def test_alignment(self):
+        self.clock.now = 1001.0
+        task = self.scheduler.add('candles', self.task('candles'), 60, align=60, offset=5)
+        self.assertEqual(task.next_run, 1025)  # 17 * 60 + 5
+        self.assertEqual(self.scheduler.run_pending(), [])
+        self.clock.now = 1025.2
+        self.scheduler.run_pending()
+        self.assertEqual(task.next_run, 1085)
+
+    def test_overrun(self):
+        task = self.scheduler.add('slow', self.task('slow', duration=2.5), 1)
+        with self.assertLogs(level='WARNING'):
+            self.scheduler.run_pending()
+        self.assertEqual((task.overruns, task.skipped, task.next_run), (1, 2, 1003))
+        self.assertEqual(self.scheduler.stats()['slow']['overruns'], 1)
+
+    def test_run_until_stopped(self):
+        scheduler = Scheduler()
+        stop = threading.Event()
+        counts = {'a': 0, 'b': 0}
+
+        def count(name):
+            counts[name] += 1
+        scheduler.add('a', lambda: count('a'), 0.01)
+        scheduler.add('b', lambda: count('b'), 0.1)
+        threading.Timer(0.35, stop.set).start()
+        start = time.time()
+        scheduler.run(stop)
+        self.assertLess(time.time() - start, 1)
+        self.assertGreater(counts['a'], 3 * counts['b'])
+
+
+class TestBotSchedule(unittest.TestCase):
+    def setUp(self):
+        exchange = HitBTCExchange('https://api.hitbtc.com/api/2', 'k', 's', ['ETHBTC', 'LTCBTC'], True)
+        self.publisher = Recorder()
+        self.bot = TradingBot('hitbtc', exchange, BasicStrategy(exchange, {'ETHBTC': ['0.01'], 'LTCBTC': ['0.01']}),
+                              publisher=self.publisher, intervals={'trades': 30})
+        self.addCleanup(self.bot.executor.shutdown)
+
+    def test_tasks(self):
+        stats = self.bot.schedule().stats()
+        self.assertEqual({k: v['interval'] for k, v in stats.items()},
+                         {'messages': 0.25, 'strategy': 2, 'report:active_orders,orderbooks': 2,
+                          'report:balance,trades': 30})
+
+    def test_partial_report(self):
+        self.bot.report(['balance'])
+        self.assertEqual(self.publisher.types(), ['balance', 'status'])
+        self.bot.report(['orderbooks', 'trades'])
+        self.assertEqual(self.publisher.types()[2:], ['status', 'orderbooks', 'trades'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import datetime as dt
+import json
+import math
+import unittest
+import numpy as np
+from crypto.structs import Market, Order, Trade, Ticker, Balance, OrderBook, Entry, Candle
+from crypto.helpers import serialize_obj
+from crypto.serialization import Serializer
+
+MARKET = Market('ETH', 'BTC', 'ETHBTC', .001, 0, .001)
+TIME = dt.datetime(2018, 1, 1, 12, 30, tzinfo=dt.timezone.utc)
+
+
+def payload():
+    return {
+        'exchange': 'hitbtc', 'type': 'batch', 'nonce': '0123456789',
+        'data': [
+            {'type': 'orderbooks', 'data': {'ETH_BTC': OrderBook([Entry(0.046002, 0.088), Entry(1e-05, 3)],
+                                                                 [Entry(0.045, 12.5)])}},
+            {'type': 'trades', 'data': {'ETH_BTC': [Trade(1, 2, MARKET, 'buy', 0.05, 1, TIME)]}},
+            {'type': 'active_orders', 'data': [Order('a"b', MARKET, 'sell', 0.1, 2, TIME.replace(tzinfo=None))]},
+            {'type': 'balance', 'data': {'BTC': Balance(1.5, 0), 'ETH': Balance('30.85', '0')}},
+            {'type': 'status', 'data': {'strategy': 'Signal', 'markets': {'ETH_BTC': True, 'LTC_BTC': False},
+                                        'skipped': []}},
+            {'type': 'signals', 'data': {'ETH_BTC': {'MACD': 1, 'RSI': -1, 'CCI': np.float64(0.5), 'n': None}}},
+            {'type': 'ticker', 'data': Ticker(MARKET, 2, None, 0.5, 3, 1.5, 10, 15, '2018-01-01T00:00:00.000Z')},
+            {'type': 'candles', 'data': [Candle(MARKET, 1, 2, 0.5, 1.5, None, TIME), dt.date(2018, 1, 2)]},
+            {'type': 'error', 'data': ValueError('bad é value')},
+            {'type': 'misc', 'data': {1: (1, 2.5), 2.5: [], None: True, 'x': {}}},
+        ]
+    }
+
+
+class TestSerializer(unittest.TestCase):
+    def test_same_json_as_serialize_obj(self):
+        serializer = Serializer()
+        for _ in range(2):  # compiled encoders and caches are used the second time
+            data = serializer.dumps(payload())
+            self.assertIsInstance(data, bytes)
+            self.assertEqual(json.loads(data), json.loads(json.dumps(payload(), default=serialize_obj)))
+
+    def test_non_finite_numbers(self):
+        serializer = Serializer()
+        for value in [float('nan'), float('inf'), float('-inf')]:
+            expected = json.dumps(Entry(value, 1), default=serialize_obj).replace(' ', '')
+            self.assertEqual(serializer.dumps(Entry(value, 1)).decode(), expected)
+        self.assertTrue(math.isnan(json.loads(serializer.dumps([float('nan')]))[0]))
+
+    def test_time_zones_are_not_confused(self):
+        serializer = Serializer()
+        other = TIME.astimezone(dt.timezone(dt.timedelta(hours=2)))
+        self.assertEqual(TIME, other)
+        self.assertEqual(json.loads(serializer.dumps([TIME, other])), [serialize_obj(TIME), serialize_obj(other)])
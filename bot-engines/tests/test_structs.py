@@ -0,0 +1,52 @@
+import datetime as dt
+import json
+import pickle
+import unittest
+import numpy as np
+from crypto.structs import Market, Order, Trade, Ticker, Balance, OrderBook, Entry, Candle
+from crypto.helpers import serialize_obj
+
+MARKET = Market('ETH', 'BTC', 'ETHBTC', .001, 0, .001)
+TIME = dt.datetime(2018, 1, 1, tzinfo=dt.timezone.utc)
+
+
+class TestStructs(unittest.TestCase):
+    def test_json_output_is_unchanged(self):
+        order = Order('7', MARKET, 'buy', '0.05', '2', TIME)
+        self.assertEqual(json.loads(json.dumps(order, default=serialize_obj)),
+                         {'order_id': '7', 'market': 'ETH_BTC', 'side': 'buy', 'rate': 0.05, 'quantity': 2.0,
+                          'time': TIME.strftime('%s')})
+        book = OrderBook([Entry(2, 1)], [Entry(1, 3)])
+        self.assertEqual(json.loads(json.dumps(book, default=serialize_obj)),
+                         {'asks': [{'rate': 2.0, 'quantity': 1.0}], 'bids': [{'rate': 1.0, 'quantity': 3.0}]})
+        ticker = Ticker(MARKET, 2, 1, 0.5, 3, 1.5, 10, 15, '2018-01-01T00:00:00Z')
+        self.assertEqual(list(ticker.as_dict()), ['market', 'ask', 'bid', 'low', 'high', 'last', 'base_volume',
+                                                  'quote_volume', 'time'])
+
+    def test_no_instance_dict(self):
+        for record in [MARKET, Entry(1, 2), Balance(1, 0), Candle(MARKET, 1, 2, 0.5, 1.5, 10, TIME),
+                       Trade('1', '2', MARKET, 'sell', 1, 1, TIME)]:
+            self.assertFalse(hasattr(record, '__dict__'))
+            with self.assertRaises(AttributeError):
+                record.extra = 1
+
+    def test_pickle(self):
+        trade = Trade('1', '2', MARKET, 'sell', 1, 1, TIME)
+        copy = pickle.loads(pickle.dumps(trade))
+        self.assertEqual(copy.as_dict().keys(), trade.as_dict().keys())
+        self.assertEqual(copy.market.symbol, 'ETHBTC')
+        self.assertEqual(copy.time, TIME)
+
+    def test_arrays(self):
+        book = OrderBook.from_arrays(np.array([[2.0, 1.0], [2.5, 4.0]]), [[1.0, 3.0]])
+        self.assertEqual([(e.rate, e.quantity) for e in book.asks], [(2.0, 1.0), (2.5, 4.0)])
+        self.assertIsInstance(book.asks[0].rate, float)
+        asks, bids = book.to_arrays()
+        np.testing.assert_array_equal(asks, [[2.0, 1.0], [2.5, 4.0]])
+        self.assertEqual(Entry.to_array([]).shape, (0, 2))
+
+        candles = [Candle(MARKET, 1, 2, 0.5, 1.5, 10, TIME), Candle(MARKET, None, None, None, None, None, TIME)]
+        columns = Candle.to_arrays(candles)
+        np.testing.assert_array_equal(columns['close'], [1.5, np.nan])
+        np.testing.assert_array_equal(columns['volume'], [10, 0])
+        np.testing.assert_array_equal(Trade.to_array([Trade('1', '2', MARKET, 'sell', 1, 3, TIME)]), [[1, 3]])
@@ -0,0 +1,70 @@
+import time
+import unittest
+from crypto import TradingBot, HitBTCExchange, BasicStrategy, Supervisor
+from tests.helpers import Recorder
+
+
+def mock_bot(name, symbols, publisher, report_account):
+    exchange = HitBTCExchange('https://api.hitbtc.com/api/2', 'k', 's', symbols, True)
+    strategy = BasicStrategy(exchange, {s: ['0.01'] for s in symbols})
+    return TradingBot(name, exchange, strategy, publisher=publisher, report_account=report_account)
+
+
+class FailingBot(TradingBot):
+    def work(self):
+        raise Exception('exchange unreachable')
+
+
+def failing_bot(name, symbols, publisher, report_account):
+    exchange = HitBTCExchange('https://api.hitbtc.com/api/2', 'k', 's', symbols, True)
+    return FailingBot(name, exchange, None, publisher=publisher, report_account=report_account)
+
+
+class TestSupervisor(unittest.TestCase):
+    def setUp(self):
+        exchange = HitBTCExchange('https://api.hitbtc.com/api/2', 'k', 's', ['ETHBTC', 'LTCBTC', 'ETCBTC'], True)
+        self.publisher = Recorder()
+        self.sup = Supervisor('hitbtc', shards=2, factory=mock_bot, exchange=exchange, publisher=self.publisher)
+
+    def tearDown(self):
+        self.sup.stop_shards(timeout=10)
+
+    def wait_for(self, condition, timeout=60):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            self.sup.collect()
+            if condition():
+                return
+        self.fail('timed out')
+
+    def test_assignment(self):
+        self.assertEqual(self.sup.assignment, [['ETHBTC', 'ETCBTC'], ['LTCBTC']])
+        self.assertEqual(self.sup.owners, {'ETH_BTC': 0, 'ETC_BTC': 0, 'LTC_BTC': 1})
+
+    def test_reports_are_merged_and_commands_routed(self):
+        self.sup.start_shards()
+        self.wait_for(lambda: len(self.publisher.latest('orderbooks') or {}) == 3)
+        self.assertEqual(self.sup.ready, {0, 1})
+        self.wait_for(lambda: self.publisher.latest('balance') is not None)  # fetched on its own, slower cadence
+
+        self.sup.process_msg({'type': 'markets', 'data': {'LTC_BTC': 'off'}})
+        self.assertFalse(self.sup.markets_on['LTC_BTC'])
+        self.wait_for(lambda: self.publisher.latest('status')['markets'] ==
+                      {'ETH_BTC': True, 'ETC_BTC': True, 'LTC_BTC': False})
+
+        self.sup.stop_shards()
+        self.assertFalse(any(p.is_alive() for p in self.sup.processes))
+        self.assertEqual(self.sup.ready, set())
+
+    def test_dead_shards_are_restarted_then_the_bot_stops(self):
+        exchange = HitBTCExchange('https://api.hitbtc.com/api/2', 'k', 's', ['ETHBTC'], True)
+        self.sup = Supervisor('hitbtc', shards=1, factory=failing_bot, max_restarts=1, exchange=exchange,
+                              publisher=self.publisher)
+        self.assertIsNone(self.sup.strategy)
+        self.sup.work()  # returns once the shard died again after its restart
+        self.assertTrue(self.sup.turn_off.is_set())
+        self.assertEqual(self.sup.restarts, [1])
+        errors = [d for t, d in self.publisher.messages if t == 'error']
+        self.assertIn('Shard 0 stopped trading', errors)
+        self.assertIn('Shard 0 exited with code 1, restarting it', errors)
+        self.assertIn('Shard 0 exited with code 1 after 1 restarts, stopping', errors)
@@ -0,0 +1,46 @@
+import unittest
+import numpy as np
+from crypto import SignalStrategy, MACD, RSI, CCI, WILLR
+from crypto.backtest import SimulatedExchange, Backtest
+from crypto.sweep import score_matrix, grid, sweep
+from tests.test_backtest import history
+
+INDICATORS = {'MACD': MACD, 'RSI': RSI, 'CCI': CCI, 'WILLR': WILLR}
+
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.h = history(600)
+        self.scores = score_matrix([self.h], INDICATORS)
+
+    def test_grid(self):
+        params = grid(lot_qty=[.1, .2], long_score_threshold=[.1, .2, .3])
+        self.assertEqual(len(params['lot_qty']), 6)
+        self.assertEqual(sorted(set(zip(params['lot_qty'], params['long_score_threshold']))),
+                         [(.1, .1), (.1, .2), (.1, .3), (.2, .1), (.2, .2), (.2, .3)])
+
+    def test_matches_backtest(self):
+        cfg = [1, 1, .1, .2, -.2, 0]
+        params = grid(long_qty_cap=[1, .5], short_qty_cap=[1], lot_qty=[.1, .3], long_score_threshold=[.2, .4],
+                      short_score_threshold=[-.2], min_volume=[0])
+        result = sweep([self.h], self.scores, params)
+
+        e = SimulatedExchange([self.h], balances={'BTC': 1e6})
+        s = SignalStrategy(e, {'ETHBTC': cfg}, INDICATORS)
+        summary = Backtest(e, s, warmup=1).run().summary()
+
+        p = [i for i in range(len(params['lot_qty']))
+             if [params[k][i] for k in ('long_qty_cap', 'lot_qty', 'long_score_threshold')] == [1, .1, .2]][0]
+        self.assertGreater(summary['fills'], 0)
+        self.assertAlmostEqual(result.pnl[0, p], summary['pnl'], places=9)
+        self.assertAlmostEqual(result.max_drawdown[0, p], summary['max_drawdown'], places=9)
+
+    def test_table_is_ranked(self):
+        params = grid(lot_qty=[.1, .5, 1], long_score_threshold=np.linspace(0, .5, 6),
+                      short_score_threshold=-np.linspace(0, .5, 6))
+        rows = sweep([self.h, history(600, seed=1)], score_matrix([self.h, history(600, seed=1)], INDICATORS),
+                     params).table(top=10)
+        self.assertEqual(len(rows), 10)
+        self.assertEqual([r['pnl'] for r in rows], sorted([r['pnl'] for r in rows], reverse=True))
+        self.assertEqual(set(rows[0]), {'lot_qty', 'long_score_threshold', 'short_score_threshold', 'pnl',
+                                        'max_drawdown', 'trades'})
@@ -0,0 +1,94 @@
+import unittest
+import json
+import threading
+import time
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from crypto.structs import Balance
+from crypto.telemetry import Publisher
+
+
+class Sink(HTTPServer):
+    def __init__(self, delay=0):
+        super().__init__(('127.0.0.1', 0), SinkHandler)
+        self.delay = delay
+        self.received = []
+
+
+class SinkHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['content-length']))
+        time.sleep(self.server.delay)
+        self.server.received.append(json.loads(body.decode()))
+        self.send_response(200)
+        self.send_header('content-length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestPublisher(unittest.TestCase):
+    def start(self, delay=0):
+        self.sink = Sink(delay)
+        threading.Thread(target=self.sink.serve_forever, daemon=True).start()
+        url = 'http://127.0.0.1:{}/update'.format(self.sink.server_address[1])
+        self.p = Publisher(url, 'test', max_events=3, batch_interval=0.05)
+
+    def messages(self):
+        msgs = []
+        for payload in self.sink.received:
+            msgs.extend(payload['data'] if payload['type'] == 'batch' else [payload])
+        return msgs
+
+    def test_batches_types(self):
+        self.start()
+        self.p.publish({'BTC': 1}, 'balance')
+        self.p.publish([], 'active_orders')
+        self.p.close()
+        self.assertEqual(len(self.sink.received), 1)
+        self.assertEqual(self.sink.received[0]['type'], 'batch')
+        self.assertEqual([m['type'] for m in self.messages()], ['balance', 'active_orders'])
+
+    def test_coalesces_snapshots(self):
+        self.start()
+        for i in range(5):
+            self.p.publish(i, 'balance')
+        self.p.close()
+        balances = [m['data'] for m in self.messages() if m['type'] == 'balance']
+        self.assertEqual(balances[-1], 4)
+        self.assertLess(len(balances), 5)
+
+    def test_payload_copied_on_publish(self):
+        self.start()
+        book = {'ETH_BTC': [1, 2]}
+        self.p.publish(book, 'orderbooks')
+        book['ETH_BTC'].append(3)  # e.g. the next report() updating the same objects
+        book['LTC_BTC'] = []
+        self.p.close()
+        self.assertEqual(self.messages()[-1]['data'], {'ETH_BTC': [1, 2]})
+
+    def test_unencodable_payload(self):
+        self.start()
+        with self.assertLogs(level='WARNING'):
+            self.p.publish({'BTC': Balance.__new__(Balance)}, 'balance')  # fields never set
+        self.p.publish(1, 'status')
+        self.p.close()
+        self.assertEqual([m['type'] for m in self.messages()], ['status'])
+        self.assertEqual(self.p.stats()['failures'], 1)
+
+    def test_publish_never_blocks(self):
+        self.start(delay=0.5)
+        start = time.time()
+        for i in range(100):
+            self.p.publish(i, 'orderbooks')
+            self.p.publish(Exception(str(i)), 'error')
+        self.assertLess(time.time() - start, 0.25)
+        self.assertGreater(self.p.stats()['dropped'], 0)
+        self.p.close()
+        self.assertEqual(self.messages()[-1]['data'], 99)
+
+    def tearDown(self):
+        self.sink.shutdown()
+        self.sink.server_close()
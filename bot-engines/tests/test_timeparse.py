@@ -0,0 +1,56 @@
+import datetime as dt
+import time
+import unittest
+import dateutil.parser
+from crypto.structs import Trade, Candle, Market
+from crypto.timeparse import parse_ns, to_ns, from_ns, NS
+
+MARKET = Market('ETH', 'BTC', 'ETHBTC', '0.001', '-0.0001', '0.001')
+
+
+class TestTimeParse(unittest.TestCase):
+    def test_exchange_formats(self):
+        for text in ['2017-05-15T17:01:05.092Z', '2017-05-15T17:01:05Z', '2018-01-01T00:00:00.000Z',
+                     '2016-02-29T23:59:59.999999Z', '2017-05-15T17:01:05.092+00:00', '2017-05-15T19:01:05.092+02:00',
+                     '2017-05-15T12:31:05-0430', '2017-05-15 17:01:05.5']:
+            expected = dateutil.parser.parse(text)
+            if expected.tzinfo is None:
+                expected = expected.replace(tzinfo=dt.timezone.utc)
+            self.assertEqual(parse_ns(text), int(expected.timestamp() * 1e6) * 1000, text)
+            self.assertEqual(from_ns(parse_ns(text)), expected)
+
+    def test_nanosecond_fraction(self):
+        self.assertEqual(parse_ns('1970-01-01T00:00:01.123456789Z'), 1123456789)
+        self.assertEqual(parse_ns('1970-01-01T00:00:00.1234567891Z'), 123456789)
+
+    def test_fallback(self):
+        self.assertEqual(parse_ns('Jan 1 2018 00:00 UTC'), to_ns(dt.datetime(2018, 1, 1, tzinfo=dt.timezone.utc)))
+
+    def test_to_ns(self):
+        aware = dt.datetime(2018, 1, 1, 12, tzinfo=dt.timezone(dt.timedelta(hours=2)))
+        self.assertEqual(to_ns(aware), to_ns(dt.datetime(2018, 1, 1, 10)))  # naive is UTC
+        self.assertEqual(to_ns(dt.date(2018, 1, 1)), 1514764800 * NS)
+        self.assertEqual(to_ns(1514764800 * NS), 1514764800 * NS)
+        self.assertIsNone(to_ns(None))
+
+    def test_structs(self):
+        candle = Candle(MARKET, 1, 2, 0.5, 1.5, 10, '2018-01-01T00:01:00.000Z')
+        self.assertEqual(candle.time_ns, (1514764800 + 60) * NS)
+        self.assertEqual(candle.time, dt.datetime(2018, 1, 1, 0, 1, tzinfo=dt.timezone.utc))
+        self.assertEqual(candle.as_dict()['time'], candle.time)
+
+    def test_thousand_trades(self):
+        stamps = ['2018-01-{:02d}T{:02d}:{:02d}:{:02d}.{:03d}Z'.format(1 + i % 28, i % 24, i % 60, (7 * i) % 60, i)
+                  for i in range(1000)]
+        timings = []
+        for _ in range(3):  # best of three, other tests' threads may still be running
+            parse_ns.cache_clear()
+            start = time.perf_counter()
+            trades = [Trade(i, i, MARKET, 'buy', 0.01, 1, parse_ns(s)) for i, s in enumerate(stamps)]
+            timings.append(time.perf_counter() - start)
+        self.assertEqual(len(trades), 1000)
+        self.assertLess(min(timings), 0.02)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import threading
+import concurrent.futures
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from crypto.transport import Transport
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class TestTransport(unittest.TestCase):
+    def setUp(self):
+        self.server = Server(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = 'http://127.0.0.1:{}/'.format(self.server.server_address[1])
+        self.host = '127.0.0.1:{}'.format(self.server.server_address[1])
+        self.t = Transport()
+
+    def test_connection_reuse(self):
+        for _ in range(5):
+            r = self.t.get(self.url)
+            self.assertEqual(r.json(), {'ok': True})
+        stats = self.t.stats()[self.host]
+        self.assertEqual(stats['requests'], 5)
+        self.assertEqual(stats['new_connections'], 1)
+        self.assertEqual(stats['reused'], 4)
+
+    def test_session_per_thread(self):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+            sessions = list(executor.map(lambda _: id(self.t.session), range(3)))
+        self.assertNotIn(id(self.t.session), sessions)
+
+    def test_errors_counted(self):
+        with self.assertRaises(Exception):
+            self.t.get('http://127.0.0.1:1/', timeout=(0.2, 0.2))
+        self.assertEqual(self.t.stats()['127.0.0.1:1']['errors'], 1)
+
+    def tearDown(self):
+        self.t.close()
+        self.server.shutdown()
+        self.server.server_close()
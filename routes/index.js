@@ -28,12 +28,15 @@ router.post('/state', function(req, res, next) {
         .then((data) => res.json(data));
 });
 
-router.post('/update', function(req, res, next) {
-    let message = req.body;
+/* apply a single bot message; batches from the python publisher are unpacked into their messages */
+function processMessage(message) {
     /* TODO: temporary message processing code;
      * its fine after pass-through but switch statement here
      * should be replaced with a function */
     switch (message.type) {
+        case 'batch':
+            message.data.forEach(processMessage);
+            break;
         case 'status':
             bs.daos.exchangeDAO.updateExchange(message.exchange, message.data);
             break;
@@ -56,6 +59,10 @@ router.post('/update', function(req, res, next) {
             bs.daos.exchangeDAO.updateSignals(message.exchange, message.data);
             break;
     }
+}
+
+router.post('/update', function(req, res, next) {
+    processMessage(req.body);
     res.send('');
 });
 